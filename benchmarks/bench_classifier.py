@@ -0,0 +1,59 @@
+"""Measures the throughput of the classification label splitter and the structured parser.
+
+Usage:
+    python benchmarks/bench_classifier.py --items 200000
+"""
+import argparse
+import json
+import random
+import sys
+import os
+import time
+
+# Add the parent directory to the Python path for module imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from everything.classifier import parse_recommendation, split_classification
+
+# Recommendations in the style of the model's answers
+SAMPLES = [
+    "Listen to the Evening Chill playlist on your way home from work.",
+    "Grab a flat white at the coffee shop near the office and take ten minutes off screens.",
+    "You're 500 steps short of your average; a short walk after lunch would close the gap.",
+    "Don't forget to collect your running shoes from the store near work before it closes.",
+    "Your client call starts soon; review the project plan beforehand.",
+    "Try a 5K tempo run this evening to keep your weekly distance on track.",
+    "Call your sister tonight and tell her about the new album you have been playing.",
+    "You need to stretch after sitting through this afternoon's meeting.",
+    "Pick up fresh bread from the bakery near the coffee shop on your way back.",
+    "Your dentist appointment was moved; reschedule it before the end of the week.",
+    "The train home is busy after 18:00, so catch up on a podcast once you get a seat.",
+    "Your prescription is ready and the pharmacy closes at 19:00; collect it today by 18:30.",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=200_000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    texts = [rng.choice(SAMPLES) for _ in range(args.items)]
+    free_text = [f"{text}\nClassification: normal" for text in texts]
+    structured = [json.dumps({"recommendation": text, "classification": "normal"}) for text in texts]
+
+    started = time.perf_counter()
+    for response in free_text:
+        split_classification(response)
+    elapsed = time.perf_counter() - started
+    print(f"label splitter:       {args.items / elapsed:>12,.0f} items/s")
+
+    started = time.perf_counter()
+    for response in structured:
+        parse_recommendation(response)
+    elapsed = time.perf_counter() - started
+    print(f"structured parser:    {args.items / elapsed:>12,.0f} items/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Compares LocationIndex lookups with the original linear scan.
+
+Usage:
+    python benchmarks/bench_location_index.py --sizes 10000 1000000 10000000
+
+The rows are generated up front and kept in memory; 10M rows need several GB.
+"""
+import argparse
+import random
+import sys
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Iterator
+
+# Add the parent directory to the Python path for module imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from user_data.location_index import LocationIndex
+
+START = datetime(2024, 1, 1)
+PLACES = ["Home", "Work", "Coffee Shop", "Gym", "Park", "Supermarket"]
+
+
+def synthetic_rows(count: int, step_seconds: int = 30) -> Iterator[Dict[str, str]]:
+    """Yields location.csv-style rows, one fix every step_seconds."""
+    for i in range(count):
+        yield {
+            "timestamp": (START + timedelta(seconds=i * step_seconds)).strftime("%Y-%m-%d %H:%M:%S"),
+            "latitude": "51.5074",
+            "longitude": "-0.1278",
+            "location": PLACES[(i // 120) % len(PLACES)],
+        }
+
+
+def linear_scan(rows: Iterable[Dict[str, str]], current_time: datetime) -> str:
+    """The pre-index UserData.get_current_location algorithm."""
+    current_location = "Unknown"
+    latest_time = datetime.min
+    for location in rows:
+        loc_time = datetime.strptime(location["timestamp"], "%Y-%m-%d %H:%M:%S")
+        if loc_time <= current_time and loc_time > latest_time:
+            latest_time = loc_time
+            current_location = location["location"]
+    return current_location
+
+
+def run(size: int, lookups: int, linear_lookups: int) -> Dict[str, float]:
+    span = timedelta(seconds=size * 30)
+    rng = random.Random(size)
+    queries = [START + span * rng.random() for _ in range(lookups)]
+
+    # Rows are held in memory like UserData.location_data, so neither timer includes generating them
+    rows = list(synthetic_rows(size))
+
+    started = time.perf_counter()
+    index = LocationIndex.from_rows(rows)
+    build = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for query in queries:
+        index.location_at(query)
+    indexed = (time.perf_counter() - started) / lookups
+
+    # The scan re-parses every row per lookup, so only a few lookups are timed
+    started = time.perf_counter()
+    expected = [linear_scan(rows, query) for query in queries[:linear_lookups]]
+    linear = (time.perf_counter() - started) / max(linear_lookups, 1)
+    assert expected == [index.location_at(query) for query in queries[:linear_lookups]]
+
+    return {"rows": size, "build_s": build, "index_lookup_us": indexed * 1e6, "linear_lookup_us": linear * 1e6}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 1_000_000, 10_000_000])
+    parser.add_argument("--lookups", type=int, default=10_000)
+    parser.add_argument("--linear-lookups", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'build (s)':>10} {'index (us)':>11} {'linear (us)':>14} {'speedup':>10}")
+    for size in args.sizes:
+        result = run(size, args.lookups, args.linear_lookups)
+        speedup = result["linear_lookup_us"] / result["index_lookup_us"]
+        print(
+            f"{result['rows']:>10} {result['build_s']:>10.2f} {result['index_lookup_us']:>11.2f} "
+            f"{result['linear_lookup_us']:>14.0f} {speedup:>9.0f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+"""Times the simulation hot path on a synthetic user, with an offline LLM.
+
+Results are written as JSON (tagged with the git commit) so runs can be
+compared; --compare flags cases that got slower than a previous run.
+--profile writes one cProfile file per case, which snakeviz, flameprof or
+gprof2dot turn into call graphs and flame graphs.
+
+Usage:
+    python benchmarks/bench_simulation.py --json results.json --profile profiles/
+    python benchmarks/bench_simulation.py --compare results.json
+"""
+import argparse
+import asyncio
+import cProfile
+import json
+import logging
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+
+# Add the parent directory to the Python path for module imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import START, make_user
+from device_data.device_data import DeviceData
+from everything.config import Config
+from everything.everything import EVERYTHING
+from everything.fake_llm import MockBackend
+from metrics.metrics import METRICS
+from everything.prompts import PromptBuilder
+from user_data.snapshot import write_snapshot
+from user_data.user_data import UserData
+
+PROMPT_ROUNDS = 300  # Cold prompt builds are slow on large profiles
+
+
+class Case:
+    """A benchmark: setup() builds fresh state, run(state) is the timed part doing `ops` operations.
+
+    teardown(state), if given, releases the state after each run, outside the timer.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        setup: Callable[[], object],
+        run: Callable[[object], None],
+        ops: int = 1,
+        teardown: Optional[Callable[[object], None]] = None,
+    ):
+        self.name = name
+        self.setup = setup
+        self.run = run
+        self.ops = ops
+        self.teardown = teardown
+
+
+def load_all(user: UserData) -> UserData:
+    """Touches every lazily loaded source."""
+    user.profile, user.location_index, user.calendar_index, user.social_media, user.spotify_playlists
+    return user
+
+
+def load_snapshot(data_dir: str, snapshot: str, query: datetime) -> str:
+    """Attaches a snapshot, answers one lookup and unmaps it again."""
+    with load_all(UserData("Synthetic", data_dir, paths={"snapshot": snapshot})) as user:
+        return user.get_current_location(query)
+
+
+def build_cases(data_dir: str, work_dir: str, days: int, lookups: int) -> Dict[str, Case]:
+    rng = random.Random(0)
+    span = timedelta(days=days)
+    queries = [START + span * rng.random() for _ in range(lookups)]
+    user = load_all(UserData("Synthetic", data_dir, use_snapshot=False))
+    snapshot = os.path.join(work_dir, "bench.snapshot")
+    write_snapshot(user, snapshot)
+    config = Config()
+    config.LLM_BACKEND = "mock"
+    config.LLM_CACHE_ENABLED = False  # Every call goes through the scheduler and backend
+    day = (START + span / 2).date()
+    # A day of fixed-interval ticks, for DeviceData on its own
+    ticks = [
+        datetime.combine(day, config.SIMULATION_START_TIME) + timedelta(minutes=minutes)
+        for minutes in range(0, 15 * 60 + 1, config.SIMULATION_INTERVAL)
+    ]
+
+    def prompts(builder: PromptBuilder) -> None:
+        for query in queries[:PROMPT_ROUNDS]:
+            builder = PromptBuilder(builder.user, builder.config)  # Cold prompt context every time
+            builder.event("Team Meeting", "Work", query)
+            builder.tasks(builder.user.calendar[:8], query)
+            builder.recommendation("Work", query)
+
+    def simulate(ai: EVERYTHING) -> None:
+        asyncio.run(ai.simulate_day(day))
+
+    def close(ai: EVERYTHING) -> None:
+        asyncio.run(ai.close())  # Stops its notifier and scheduler threads before the next repetition
+
+    return {
+        case.name: case
+        for case in (
+            Case("user_data_load", lambda: None, lambda _: load_all(UserData("Synthetic", data_dir, use_snapshot=False))),
+            Case(
+                "snapshot_load",
+                lambda: None,
+                lambda _: load_snapshot(data_dir, snapshot, queries[0]),
+            ),
+            Case(
+                "get_current_location",
+                lambda: user,
+                lambda u: [u.get_current_location(query) for query in queries],
+                lookups,
+            ),
+            Case(
+                "get_upcoming_events",
+                lambda: user,
+                lambda u: [u.get_upcoming_events(2, query) for query in queries],
+                lookups,
+            ),
+            Case(
+                "generate_events",
+                lambda: DeviceData(user),
+                lambda devices: [devices.generate_events(tick) for tick in ticks],
+                len(ticks),
+            ),
+            Case("prompt_building", lambda: PromptBuilder(user, config), prompts, 3 * min(lookups, PROMPT_ROUNDS)),
+            Case(
+                "simulate_day",
+                lambda: EVERYTHING(user, DeviceData(user), config, backend=MockBackend(seed=0)),
+                simulate,
+                teardown=close,
+            ),
+        )
+    }
+
+
+def time_case(case: Case, repeat: int) -> Dict[str, float]:
+    samples = []
+    for _ in range(repeat):
+        state = case.setup()
+        started = time.perf_counter()
+        case.run(state)
+        samples.append(time.perf_counter() - started)
+        if case.teardown is not None:
+            case.teardown(state)
+    best = min(samples)
+    return {
+        "repeat": repeat,
+        "ops": case.ops,
+        "min_s": best,
+        "median_s": statistics.median(samples),
+        "mean_s": statistics.fmean(samples),
+        "ops_per_s": case.ops / best if best else float("inf"),
+    }
+
+
+def profile_case(case: Case, path: str) -> None:
+    state = case.setup()
+    profiler = cProfile.Profile()
+    profiler.enable()
+    case.run(state)
+    profiler.disable()
+    profiler.dump_stats(path)
+    if case.teardown is not None:
+        case.teardown(state)
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline_path: str, threshold: float) -> bool:
+    """Prints min-time ratios against a previous run; returns True if any case regressed."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nCompared with {baseline.get('commit') or baseline_path}:")
+    regressed = False
+    for name, result in results.items():
+        before = baseline["results"].get(name)
+        if before is None:
+            continue
+        ratio = result["min_s"] / before["min_s"]
+        flag = ""
+        if ratio > 1 + threshold:
+            flag, regressed = "  REGRESSION", True
+        print(f"{name:<22} {before['min_s'] * 1e3:>10.2f} ms -> {result['min_s'] * 1e3:>10.2f} ms  ({ratio:.2f}x){flag}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data-dir", default=None, help="Use this user instead of generating one")
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--fix-minutes", type=int, default=5)
+    parser.add_argument("--events-per-day", type=int, default=8)
+    parser.add_argument("--profile-scale", type=int, default=50)
+    parser.add_argument("--lookups", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--cases", nargs="+", default=None, help="Only run these cases")
+    parser.add_argument("--metrics", action="store_true", help="Run with metrics and spans enabled")
+    parser.add_argument("--json", dest="json_path", default=None, help="Write results to this file")
+    parser.add_argument("--profile", dest="profile_dir", default=None, help="Write <case>.prof files here")
+    parser.add_argument("--compare", dest="baseline", default=None, help="Previous --json output to compare with")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Slowdown counted as a regression")
+    args = parser.parse_args()
+
+    # Per-notification logging would dominate the timings
+    logging.basicConfig(format='%(levelname)s - %(message)s')
+    logging.getLogger().setLevel(logging.WARNING)
+    METRICS.enabled = args.metrics
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = args.data_dir
+        dimensions = {"data_dir": data_dir}
+        if data_dir is None:
+            data_dir = tmp
+            dimensions = make_user(tmp, "Synthetic", args.days, args.fix_minutes, args.events_per_day, args.profile_scale)
+        cases = build_cases(data_dir, tmp, args.days, args.lookups)
+        selected = args.cases or list(cases)
+
+        results = {}
+        print(f"{'case':<22} {'min (ms)':>10} {'median (ms)':>12} {'ops/s':>14}")
+        for name in selected:
+            result = time_case(cases[name], args.repeat)
+            results[name] = result
+            print(f"{name:<22} {result['min_s'] * 1e3:>10.2f} {result['median_s'] * 1e3:>12.2f} {result['ops_per_s']:>14,.0f}")
+            if args.profile_dir:
+                os.makedirs(args.profile_dir, exist_ok=True)
+                profile_case(cases[name], os.path.join(args.profile_dir, f"{name}.prof"))
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "metrics": args.metrics,
+        "dataset": dimensions,
+        "results": results,
+    }
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.baseline and compare(results, args.baseline, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""Generates synthetic users laid out like data/, at any scale.
+
+Usage:
+    python benchmarks/synthetic.py out_dir --days 365 --fix-minutes 5 --events-per-day 8
+"""
+import argparse
+import csv
+import json
+import random
+import os
+from datetime import datetime, timedelta
+
+START = datetime(2024, 1, 1)
+# (name, latitude, longitude)
+PLACES = [
+    ("Home", 51.5074, -0.1278),
+    ("Work", 51.5144, -0.0931),
+    ("Coffee Shop", 51.5136, -0.0984),
+    ("Gym", 51.5101, -0.1340),
+    ("Park", 51.5073, -0.1657),
+    ("Supermarket", 51.5033, -0.1195),
+]
+EVENTS = ["Team Meeting", "Project Planning", "Client Call", "Code Review", "1:1", "Lunch", "Dentist", "Standup"]
+TRACKS = ["TOTO - Africa", "a-ha - Take on Me", "Dua Lipa - Don't Start Now", "The Weeknd - Blinding Lights"]
+
+
+def daily_place(minute_of_day: int) -> int:
+    """Index into PLACES for a typical weekday routine."""
+    hour = minute_of_day // 60
+    if hour < 8 or hour >= 21:
+        return 0
+    if hour < 9:
+        return 2
+    if hour < 18:
+        return 1
+    if hour < 19:
+        return 3
+    return 5 if hour < 20 else 4
+
+
+def write_locations(path: str, days: int, fix_minutes: int) -> int:
+    rows = 0
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["timestamp", "latitude", "longitude", "location"])
+        for minute in range(0, days * 24 * 60, fix_minutes):
+            name, latitude, longitude = PLACES[daily_place(minute % (24 * 60))]
+            timestamp = START + timedelta(minutes=minute)
+            writer.writerow([timestamp.strftime("%Y-%m-%d %H:%M:%S"), latitude, longitude, name])
+            rows += 1
+    return rows
+
+
+def write_calendar(path: str, days: int, events_per_day: int, rng: random.Random) -> int:
+    rows = 0
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["date", "time", "event", "duration"])
+        for day in range(days):
+            date = START + timedelta(days=day)
+            # Events start on the half hour between 08:00 and 19:30
+            for slot in sorted(rng.sample(range(16, 40), min(events_per_day, 24))):
+                duration = rng.choice(["0.5", "1", "1.5", "2"])
+                writer.writerow([date.strftime("%Y-%m-%d"), f"{slot // 2:02d}:{slot % 2 * 30:02d}", rng.choice(EVENTS), duration])
+                rows += 1
+    return rows
+
+
+def write_user_data(user_dir: str, name: str, profile_scale: int, template_dir: str, rng: random.Random) -> None:
+    """Profile, social media and playlists from template_dir, with their lists grown profile_scale times."""
+    with open(os.path.join(template_dir, "user_profile.json")) as f:
+        profile = json.load(f)
+    with open(os.path.join(template_dir, "social_media.json")) as f:
+        social_media = json.load(f)
+    with open(os.path.join(template_dir, "spotify_playlists.json")) as f:
+        spotify = json.load(f)
+
+    profile["name"] = name
+    profile["previous_notifications"] = [
+        dict(note, message=f"{note['message']} ({i})")
+        for i in range(profile_scale)
+        for note in profile.get("previous_notifications", [])
+    ]
+    profile["purchases"] = [
+        dict(purchase, item=f"{purchase['item']} #{i}")
+        for i in range(profile_scale)
+        for purchase in profile.get("purchases", [])
+    ]
+    social_media["twitter"]["recent_posts"] = [
+        f"{post} #{i}" for i in range(profile_scale) for post in social_media["twitter"]["recent_posts"]
+    ]
+    spotify["playlists"] = [
+        {"name": f"{playlist['name']} {i}", "tracks": rng.sample(TRACKS, 3) + playlist["tracks"]}
+        for i in range(profile_scale)
+        for playlist in spotify["playlists"]
+    ]
+
+    for filename, data in (
+        ("user_profile.json", profile),
+        ("social_media.json", social_media),
+        ("spotify_playlists.json", spotify),
+    ):
+        with open(os.path.join(user_dir, filename), "w") as f:
+            json.dump(data, f)
+
+
+def make_user(
+    data_dir: str,
+    name: str = "Synthetic",
+    days: int = 365,
+    fix_minutes: int = 5,
+    events_per_day: int = 8,
+    profile_scale: int = 50,
+    seed: int = 0,
+    template_dir: str = None,
+) -> dict:
+    """Writes one synthetic user under data_dir and returns its dimensions.
+
+    The data starts on 2024-01-01: a location fix every fix_minutes,
+    events_per_day calendar events, and the template profile (data/ by
+    default) with its lists repeated profile_scale times.
+    """
+    template_dir = template_dir or os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "user_data")
+    rng = random.Random(seed)
+    os.makedirs(os.path.join(data_dir, "device_data"), exist_ok=True)
+    os.makedirs(os.path.join(data_dir, "user_data"), exist_ok=True)
+    locations = write_locations(os.path.join(data_dir, "device_data", "location.csv"), days, fix_minutes)
+    events = write_calendar(os.path.join(data_dir, "device_data", "calendar.csv"), days, events_per_day, rng)
+    write_user_data(os.path.join(data_dir, "user_data"), name, profile_scale, template_dir, rng)
+    return {"name": name, "days": days, "location_rows": locations, "calendar_rows": events, "profile_scale": profile_scale}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("out_dir")
+    parser.add_argument("--users", type=int, default=1, help="Write this many users under out_dir/user_<i>")
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--fix-minutes", type=int, default=5)
+    parser.add_argument("--events-per-day", type=int, default=8)
+    parser.add_argument("--profile-scale", type=int, default=50)
+    args = parser.parse_args()
+
+    for i in range(args.users):
+        data_dir = args.out_dir if args.users == 1 else os.path.join(args.out_dir, f"user_{i}")
+        print(make_user(data_dir, f"User {i}", args.days, args.fix_minutes, args.events_per_day, args.profile_scale, seed=i))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,39 +1,135 @@
-from typing import List, Dict
+from typing import Any, List, Dict, Optional, Sequence, Tuple
 from user_data.user_data import UserData
+from user_data.calendar_index import CalendarEvent
 from datetime import datetime, timedelta
 import logging
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+from metrics.metrics import METRICS
+
+logger = logging.getLogger(__name__)  # Handlers are configured by the scripts
+
+GENERATE_SECONDS = METRICS.histogram("device_generate_events_seconds", "Time spent in DeviceData.generate_events")
+DEVICE_EVENTS = METRICS.counter("device_events", "Events emitted by DeviceData", ("kind",))
+_LOCATION_EVENTS = DEVICE_EVENTS.labels("location")
+_CALENDAR_EVENTS = DEVICE_EVENTS.labels("calendar")
 
 class DeviceData:
-    """Manages device-related data and generates events."""
+    """Manages device-related data and generates events.
+
+    DeviceData is stateful: generate_events only returns what is new since the
+    previous call (a delta stream), so the same calendar entry or location is
+    not reported on every tick.
+    """
 
-    def __init__(self, user: UserData):
+    def __init__(
+        self,
+        user: UserData,
+        lookahead_hours: float = 2,
+        renotify_minutes: Sequence[int] = (60, 10),
+    ):
         self.user = user
+        # Upcoming events are reported this many hours ahead. The default 2-hour
+        # window shows soon-to-happen events without listing too many future ones.
+        self.lookahead_hours = lookahead_hours
+        # An event already reported is reported again once it gets this close
+        self.renotify_minutes = sorted(renotify_minutes, reverse=True)
+
+        self._last_location: Optional[str] = None  # Last location reported
+        self._notified: Dict[Tuple[datetime, str], int] = {}  # Event -> renotify stage reported
 
     def generate_events(self, current_time: datetime) -> List[str]:
-        """Generates events based on the user's location and upcoming events."""
+        """Generates new or materially changed events based on the user's location and upcoming events.
+
+        The location is reported when it changes. An upcoming event is reported
+        when it first enters the lookahead window and again each time it
+        crosses one of the renotify thresholds.
+        """
+        with GENERATE_SECONDS.time():
+            return self._generate_events(current_time)
+
+    def _generate_events(self, current_time: datetime) -> List[str]:
         current_location = self.user.get_current_location(current_time)
-        
-        # Retrieve upcoming events within the next 2 hours
-        upcoming_events = self.user.get_upcoming_events(hours=2, current_time=current_time)
 
-        # Start the events list with the current location message
-        events = [f"{self.user.name} is currently at {current_location}"]
+        # Retrieve upcoming events within the lookahead window
+        upcoming_events = self.user.get_upcoming_calendar_events(
+            hours=self.lookahead_hours, current_time=current_time
+        )
+
+        events = []
+        if current_location != self._last_location:
+            events.append(f"{self.user.name} is currently at {current_location}")
+            self._last_location = current_location
+            _LOCATION_EVENTS.inc()
 
         for event in upcoming_events:
-            # Parse event date and time from the event dictionary
-            event_time = datetime.strptime(f"{event['date']} {event['time']}", "%Y-%m-%d %H:%M")
-            
+            # Event times are parsed once by the calendar index
+            event_time = event.start
+
             # Calculate the time difference between the event time and current time
             time_diff = event_time - current_time
-            
+
             # Convert the time difference to minutes
             minutes_until = int(time_diff.total_seconds() / 60)
-            
+
+            # A moved or renamed event has a new key, so it counts as new
+            key = (event.start, event.title)
+            stage = self._stage(minutes_until)
+            if key in self._notified and stage <= self._notified[key]:
+                continue  # Nothing new since the last report
+            self._notified[key] = stage
+
             # Append the upcoming event message to the events list
-            events.append(f"Upcoming event in {minutes_until} minutes: {event['event']}")
-            logging.info(f"[Event Notification] Upcoming event in {minutes_until} minutes: {event['event']}")
-        
-        # Return the complete list of events
+            events.append(f"Upcoming event in {minutes_until} minutes: {event.title}")
+            _CALENDAR_EVENTS.inc()
+            logger.debug("[Event Notification] Upcoming event in %d minutes: %s", minutes_until, event.title)
+
+        # Forget events that have started; they can no longer be upcoming
+        for key in [key for key in self._notified if key[0] < current_time]:
+            del self._notified[key]
+
+        # Return the list of new events
         return events
+
+    def state(self) -> Dict[str, Any]:
+        """What has been reported so far, as JSON-serialisable data (for checkpoints)."""
+        return {
+            "last_location": self._last_location,
+            "notified": [[start.isoformat(), title, stage] for (start, title), stage in self._notified.items()],
+        }
+
+    def restore(self, state: Dict[str, Any]) -> None:
+        """Picks up the delta stream where the state() it is given left off."""
+        self._last_location = state["last_location"]
+        self._notified = {
+            (datetime.fromisoformat(start), title): stage for start, title, stage in state["notified"]
+        }
+
+    def _stage(self, minutes_until: int) -> int:
+        """Number of renotify thresholds the event has crossed."""
+        return sum(1 for threshold in self.renotify_minutes if minutes_until <= threshold)
+
+    def schedule_wakeups(self, clock, start: datetime, end: datetime) -> None:
+        """Tells an event-driven clock when generate_events can produce something new.
+
+        That is the start (to report the initial location), every instant at
+        which a calendar event enters the lookahead window or crosses a
+        renotify threshold, and every change of location.
+        """
+        clock.schedule(start)
+
+        lookahead = timedelta(hours=self.lookahead_hours)
+        for event in self.user.calendar_index.starting_between(start, end + lookahead):
+            self.schedule_event_wakeups(clock, event)
+
+        previous = self.user.get_current_location(start)
+        for fix in self.user.location_index.between(start, end):
+            if fix.location != previous:
+                clock.schedule(fix.timestamp)
+                previous = fix.location
+
+    def schedule_event_wakeups(self, clock, event: CalendarEvent) -> None:
+        """Schedules the instants at which event is reported as upcoming."""
+        clock.schedule(event.start - timedelta(hours=self.lookahead_hours))
+        for threshold in self.renotify_minutes:
+            if threshold < self.lookahead_hours * 60:
+                clock.schedule(event.start - timedelta(minutes=threshold))
@@ -0,0 +1,310 @@
+import asyncio
+import json
+import math
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from metrics.metrics import METRICS
+from user_data.calendar_index import CalendarEvent
+from user_data.timestamps import parse_timestamp
+
+from .device_data import DeviceData
+
+EARTH_RADIUS_M = 6_371_000
+
+INGESTED = METRICS.counter("ingest_records", "Feed records by kind and outcome", ("kind", "outcome"))
+BATCH_SIZE = METRICS.histogram("ingest_batch_size", "Records applied per ingestion batch", buckets=(1, 5, 10, 50, 100, 500, 1000))
+QUEUE_DEPTH = METRICS.gauge("ingest_queue_depth", "Feed records waiting to be applied")
+
+_STOP = object()
+
+Record = Union[str, bytes, Dict[str, Any]]
+
+CALENDAR_ACTIONS = ("upsert", "delete")
+
+
+def haversine_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance in metres between two latitude/longitude points."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+def parse_record(record: Record) -> Optional[Dict[str, str]]:
+    """Decodes one feed record (a JSON object, as text or already decoded).
+
+    Location fixes are location.csv-style rows (timestamp, latitude,
+    longitude, location); calendar changes are calendar.csv-style rows
+    (date, time, event, duration), optionally with an "id" and an "action"
+    ("upsert", the default, or "delete"; a delete by id needs no other
+    fields). "kind" may be given explicitly, otherwise it is inferred from
+    the fields. Returns None for anything unusable.
+    """
+    if isinstance(record, (str, bytes)):
+        try:
+            record = json.loads(record)
+        except ValueError:
+            return None
+    if not isinstance(record, dict):
+        return None
+    row = {key: str(value) for key, value in record.items() if value is not None}
+    kind = row.pop("kind", None) or (
+        "location" if "timestamp" in row else "calendar" if "event" in row or "id" in row else None
+    )
+    if kind == "calendar":
+        row.setdefault("action", "upsert")
+        if row["action"] not in CALENDAR_ACTIONS:
+            return None
+        by_id = row["action"] == "delete" and row.get("id")
+        required = () if by_id else ("date", "time", "event")
+    else:
+        required = ("timestamp", "location") if kind == "location" else None
+    if required is None or any(not row.get(field) for field in required):
+        return None
+    try:
+        # Reject rows the stores would fail to parse
+        if kind == "location":
+            parse_timestamp(row["timestamp"])
+            float(row.get("latitude") or "nan"), float(row.get("longitude") or "nan")
+        elif required:
+            parse_timestamp(f"{row['date']} {row['time']}")
+            float(row.get("duration") or 0)
+    except ValueError:
+        return None
+    row["kind"] = kind
+    return row
+
+
+class FeedIngestor:
+    """Applies live location fixes and calendar changes to a user's stores.
+
+    Producers put records on a bounded queue (put() waits while it is full,
+    so a fast feed is slowed down rather than buffered without limit). run()
+    takes records off in batches of up to batch_size, waiting at most
+    batch_interval for a batch to fill, and appends them to the user's
+    location and calendar indexes; apply_pending() applies what is queued
+    right now (EVERYTHING calls it around every tick). A fix at the same
+    named place as the fix it follows, and within coalesce_metres of it, is
+    dropped: it would not change anything DeviceData reports. DeviceData
+    queries the indexes on every call, so generate_events sees the changes
+    without a reload.
+
+    A calendar change replaces the event it is keyed on: its feed "id" if
+    it has one (so an event can be moved or renamed), otherwise its start
+    and title. A "delete" removes that event.
+
+    on_calendar, if given, is called with each added or changed
+    CalendarEvent, and on_location with the time of each applied fix (e.g.
+    to schedule clock wake-ups for them).
+    """
+
+    def __init__(
+        self,
+        devices: DeviceData,
+        max_queue: int = 1000,
+        batch_size: int = 100,
+        batch_interval: float = 0.05,
+        coalesce_metres: float = 50.0,
+        on_calendar: Optional[Callable[[CalendarEvent], None]] = None,
+        on_location: Optional[Callable[[datetime], None]] = None,
+    ):
+        self.devices = devices
+        self.user = devices.user
+        self.max_queue = max_queue
+        self._queue: Optional[asyncio.Queue] = None  # Created inside the running loop
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.coalesce_metres = coalesce_metres
+        self.on_calendar = on_calendar
+        self.on_location = on_location
+        self._ids: Dict[str, Tuple[datetime, str]] = {}  # Feed id -> (start, title) of its event
+        self.stats: Dict[str, int] = {
+            "locations": 0, "coalesced": 0, "events": 0, "deleted": 0, "malformed": 0, "batches": 0,
+        }
+
+    @property
+    def queue(self) -> asyncio.Queue:
+        # Before Python 3.10 a queue binds to the event loop current when it is
+        # created, so it is only created once a coroutine needs it
+        if self._queue is None:
+            self._queue = asyncio.Queue(self.max_queue)
+        return self._queue
+
+    async def put(self, record: Record) -> None:
+        """Queues one record, waiting while the queue is full."""
+        await self.queue.put(record)
+        QUEUE_DEPTH.set(self.queue.qsize())
+
+    async def consume(self, source: Union[AsyncIterator[Record], Iterable[Record]]) -> None:
+        """Queues every record from source (e.g. tail_file) until it ends."""
+        if hasattr(source, "__aiter__"):
+            async for record in source:
+                await self.put(record)
+        else:
+            for record in source:
+                await self.put(record)
+
+    async def run(self) -> None:
+        """Applies queued records until close() is called."""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.batch_interval
+            while batch[-1] is not _STOP and len(batch) < self.batch_size:
+                if not self.queue.empty():
+                    batch.append(self.queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            stopping = batch[-1] is _STOP
+            records = batch[:-1] if stopping else batch
+            if records:
+                self.apply(records)
+            for _ in batch:
+                self.queue.task_done()
+            QUEUE_DEPTH.set(self.queue.qsize())
+            if stopping:
+                return
+
+    def apply_pending(self) -> None:
+        """Applies the records queued right now, without waiting for more."""
+        if self._queue is None:
+            return
+        records = []
+        while not self._queue.empty():  # Nothing can be queued meanwhile: this does not yield
+            record = self._queue.get_nowait()
+            self._queue.task_done()
+            if record is _STOP:
+                self._queue.put_nowait(_STOP)  # Still for run(), after the records before it
+                break
+            records.append(record)
+        if records:
+            self.apply(records)
+        QUEUE_DEPTH.set(self._queue.qsize())
+
+    async def drain(self) -> None:
+        """Waits until everything queued so far has been applied."""
+        await self.queue.join()
+
+    async def close(self) -> None:
+        """Stops run() once the records queued before this call are applied."""
+        await self.queue.put(_STOP)
+
+    def apply(self, records: List[Record]) -> None:
+        """Applies one batch to the user's stores."""
+        self.stats["batches"] += 1
+        BATCH_SIZE.observe(len(records))
+        fixes = []
+        for record in records:
+            row = parse_record(record)
+            if row is None:
+                self.stats["malformed"] += 1
+                INGESTED.labels("unknown", "malformed").inc()
+            elif row.pop("kind") == "location":
+                fixes.append(row)
+            else:
+                self._apply_calendar(row)
+        # Fixes mostly arrive in order; sorting the batch keeps appends O(1)
+        fixes.sort(key=lambda row: row["timestamp"])
+        for row in fixes:
+            if self._redundant(row):
+                self.stats["coalesced"] += 1
+                INGESTED.labels("location", "coalesced").inc()
+                continue
+            self.user.add_location(row)
+            self.stats["locations"] += 1
+            INGESTED.labels("location", "applied").inc()
+            if self.on_location is not None:
+                self.on_location(parse_timestamp(row["timestamp"]))
+
+    def _apply_calendar(self, row: Dict[str, str]) -> None:
+        feed_id, action = row.pop("id", None), row.pop("action")
+        if feed_id is not None and feed_id in self._ids:
+            previous: Optional[Tuple[datetime, str]] = self._ids.pop(feed_id)
+        elif action == "delete" and feed_id is not None:
+            previous = None  # Never seen; nothing to delete
+        else:
+            previous = (parse_timestamp(f"{row['date']} {row['time']}"), row["event"])
+        if previous is not None and self.user.remove_event(*previous) is not None and action == "delete":
+            self.stats["deleted"] += 1
+            INGESTED.labels("calendar", "deleted").inc()
+        if action == "delete":
+            return
+        event = self.user.add_event(row)
+        if feed_id is not None:
+            self._ids[feed_id] = (event.start, event.title)
+        self.stats["events"] += 1
+        INGESTED.labels("calendar", "applied").inc()
+        if self.on_calendar is not None:
+            self.on_calendar(event)
+
+    def _redundant(self, row: Dict[str, str]) -> bool:
+        try:
+            timestamp = parse_timestamp(row["timestamp"])
+            latitude, longitude = float(row["latitude"]), float(row["longitude"])
+        except (KeyError, ValueError):
+            return False
+        previous = self.user.location_index.latest_at(timestamp)
+        if previous is None or previous.location != row["location"]:
+            return False
+        # NaN coordinates compare False, so fixes without a position are kept
+        return haversine_m(previous.latitude, previous.longitude, latitude, longitude) <= self.coalesce_metres
+
+
+async def tail_file(path: str, poll_interval: float = 0.2, from_start: bool = True) -> AsyncIterator[str]:
+    """Yields complete lines appended to path, like tail -f, until cancelled."""
+    with open(path, "r") as f:
+        if not from_start:
+            f.seek(0, 2)
+        partial = ""
+        while True:
+            line = f.readline()
+            if not line:
+                await asyncio.sleep(poll_interval)
+                continue
+            partial += line
+            if partial.endswith("\n"):  # A writer may be half-way through a line
+                if partial.strip():
+                    yield partial
+                partial = ""
+
+
+class FeedServer:
+    """Accepts newline-delimited JSON records on a local TCP socket.
+
+    Each connection is read one line at a time and only as fast as the
+    ingestor's queue accepts records, so backpressure reaches the sender.
+    """
+
+    def __init__(self, ingestor: FeedIngestor, host: str = "127.0.0.1", port: int = 0):
+        self.ingestor = ingestor
+        self.host = host
+        self.port = port
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self) -> "FeedServer":
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self) -> None:
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if line.strip():
+                    await self.ingestor.put(line)
+        finally:
+            writer.close()
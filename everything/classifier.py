@@ -0,0 +1,70 @@
+import json
+import re
+from typing import Any, NamedTuple, Optional, Tuple
+
+CLASSIFICATIONS = ("urgent", "important", "normal")
+
+_TIME = re.compile(r"^([01]\d|2[0-3]):[0-5]\d$")
+_LABEL = re.compile(
+    r"[^\w.!?]*classification\W*(urgent|important|normal)\W*$", re.IGNORECASE
+)
+
+
+class Recommendation(NamedTuple):
+    """A recommendation with its urgency classification."""
+
+    text: str
+    classification: str  # One of CLASSIFICATIONS
+    suggested_time: Optional[str] = None  # "HH:MM" if the model suggested one
+    duration_hours: float = 1.0
+
+    @property
+    def needs_calendar_event(self) -> bool:
+        return self.classification in ("urgent", "important")
+
+
+def recommendation_from_dict(item: Any) -> Optional[Recommendation]:
+    """Validates a decoded {"recommendation", "classification", "suggested_time", "duration_hours"} object.
+
+    Returns None if a required field is missing or invalid; bad optional
+    fields fall back to their defaults.
+    """
+    if not isinstance(item, dict):
+        return None
+    text = item.get("recommendation")
+    classification = item.get("classification")
+    if not isinstance(text, str) or not text.strip() or not isinstance(classification, str):
+        return None
+    classification = classification.strip().lower()
+    if classification not in CLASSIFICATIONS:
+        return None
+
+    suggested_time = item.get("suggested_time")
+    if not isinstance(suggested_time, str) or not _TIME.match(suggested_time.strip()):
+        suggested_time = None
+    else:
+        suggested_time = suggested_time.strip()
+    duration = item.get("duration_hours")
+    if isinstance(duration, bool) or not isinstance(duration, (int, float)) or not 0 < duration <= 24:
+        duration = 1.0
+    return Recommendation(text.strip(), classification, suggested_time, float(duration))
+
+
+def parse_recommendation(response: str) -> Optional[Recommendation]:
+    """Parses a structured (JSON object) recommendation answer, or returns None."""
+    start, end = response.find("{"), response.rfind("}")
+    if start == -1 or end < start:
+        return None
+    try:
+        item = json.loads(response[start : end + 1])
+    except ValueError:
+        return None
+    return recommendation_from_dict(item)
+
+
+def split_classification(response: str) -> Tuple[str, Optional[str]]:
+    """Splits a trailing "Classification: <label>" off a free-text answer."""
+    match = _LABEL.search(response)
+    if match is None:
+        return response.strip(), None
+    return response[: match.start()].strip(), match.group(1).lower()
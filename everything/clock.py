@@ -0,0 +1,69 @@
+import heapq
+from datetime import datetime, timedelta
+from typing import Iterator, List, Optional
+
+
+class FixedStepClock:
+    """Visits every interval from start to end, inclusive."""
+
+    def __init__(self, start: datetime, interval: timedelta):
+        self.start = start
+        self.interval = interval
+
+    def schedule(self, when: datetime) -> None:
+        """Every grid instant is visited anyway, so wake-ups are ignored."""
+
+    def ticks(self, end: datetime) -> Iterator[datetime]:
+        current_time = self.start
+        while current_time <= end:
+            yield current_time
+            current_time += self.interval
+
+
+class EventDrivenClock:
+    """Jumps straight to the next instant at which something can happen.
+
+    Wake-ups are kept in a priority queue and snapped up to the same
+    start + k * interval grid the fixed-step clock uses, so a tick is only
+    processed at instants the fixed-step clock would also visit. Wake-ups
+    can be added while iterating (e.g. when an event is added to the
+    calendar); ones that fall before the current tick are dropped.
+    """
+
+    def __init__(self, start: datetime, interval: timedelta):
+        self.start = start
+        self.interval = interval
+        self._queue: List[datetime] = []
+        self._current: Optional[datetime] = None
+
+    def schedule(self, when: datetime) -> None:
+        """Wakes up at the first grid instant at or after when."""
+        heapq.heappush(self._queue, self._snap(when))
+
+    def ticks(self, end: datetime) -> Iterator[datetime]:
+        while self._queue:
+            tick = heapq.heappop(self._queue)
+            if tick > end:
+                # The queue is ordered, so everything left is after the end too
+                self._queue.clear()
+                return
+            if self._current is not None and tick <= self._current:
+                continue  # Already visited (or in the past)
+            self._current = tick
+            yield tick
+
+    def _snap(self, when: datetime) -> datetime:
+        """Rounds when up to the next grid instant (never before start)."""
+        if when <= self.start:
+            return self.start
+        steps = -((self.start - when) // self.interval)  # Ceiling division
+        return self.start + steps * self.interval
+
+
+def make_clock(mode: str, start: datetime, interval: timedelta):
+    """Returns the clock for Config.SIMULATION_MODE ("fixed" or "event")."""
+    if mode == "fixed":
+        return FixedStepClock(start, interval)
+    if mode == "event":
+        return EventDrivenClock(start, interval)
+    raise ValueError(f"Unknown simulation mode: {mode}")
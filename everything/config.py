@@ -8,12 +8,78 @@ class Config:
     SIMULATION_START_TIME = time(7, 0)  # 7:00 AM
     SIMULATION_END_TIME = time(22, 0)  # 10:00 PM
     SIMULATION_INTERVAL = 30  # minutes
+    SIMULATION_MODE = "fixed"  # "fixed" steps every interval; "event" jumps to the next interesting instant
 
     # Recommendation times
-    # TODO: Implment time choosing logic instead of hardcoding (based on user's live activity)
+    # "fixed" uses RECOMMENDATION_HOURS; "adaptive" decides at each free half-hour
+    # whether to recommend (calendar gaps, location transitions, fitness data; see everything.timing)
+    RECOMMENDATION_TIMING = "fixed"
     RECOMMENDATION_HOURS = [9, 12, 15, 18]
+    RECOMMENDATION_DAILY_BUDGET = 4  # Adaptive slots per day, each costing at most one recommendation call
+    RECOMMENDATION_MIN_SCORE = 0.4  # Slots scoring lower (0..1) are passed over; free time alone scores 0.35
+    RECOMMENDATION_MIN_GAP_HOURS = 2  # Between adaptive slots, and after the start-of-day recommendation
+    # "per_slot" asks the LLM at each slot; "batched" plans every slot of the day
+    # in one call at start_day and only re-asks for slots whose context changed
+    RECOMMENDATION_MODE = "per_slot"
+    LLM_PLAN_MAX_TOKENS = 600  # Completion size for a batched day plan
+    # Recommendations already shown are remembered: a near-duplicate of one
+    # shown within RECOMMENDATION_REPEAT_HOURS is suppressed, and a slot whose
+    # context matches an earlier one reuses its recommendation without an LLM call
+    RECOMMENDATION_MEMORY = False  # Off by default: a suppressed duplicate has already cost its LLM call
+    RECOMMENDATION_MEMORY_SIZE = 256  # Entries per user; the least recently shown is evicted
+    RECOMMENDATION_SIMILARITY = 0.8  # Cosine similarity of hashed n-gram vectors that counts as "the same"
+    RECOMMENDATION_REPEAT_HOURS = 12
+    RECOMMENDATION_REUSE_LIMIT = 3  # Times a remembered recommendation is reused before the LLM is asked again
+    RECOMMENDATION_MEMORY_PATH = None  # File name (e.g. "recommendations.npz") to persist it in each user's data directory
 
     # LLM settings
     LLM_MODEL = "gpt-3.5-turbo"
     LLM_MAX_TOKENS = 150
-    LLM_TEMPERATURE = 0.7
\ No newline at end of file
+    LLM_TEMPERATURE = 0.7
+    LLM_CONTEXT_TOKENS = 4096  # Model context window; prompts get what is left after LLM_MAX_TOKENS
+    LLM_STREAMING = False  # Stream answers and notify greeting, tasks and event suggestions as they arrive
+
+    # LLM backend
+    LLM_BACKEND = "openai"  # "openai", or "mock" for the local stand-in (no network or API key needed)
+    LLM_API_BASE = None  # Override the OpenAI endpoint, e.g. a MockLLMServer url
+    MOCK_LLM_LATENCY = 0.0  # Median seconds before the first token
+    MOCK_LLM_LATENCY_SIGMA = 0.0  # Log-normal spread of the latency; 0 keeps it fixed
+    MOCK_LLM_ERROR_RATE = 0.0  # Fraction of requests failing with ServiceUnavailableError
+    MOCK_LLM_RATE_LIMIT_RATE = 0.0  # Fraction of requests failing with RateLimitError
+    MOCK_LLM_REQUESTS_PER_MINUTE = None  # Requests beyond this are rate limited
+    MOCK_LLM_SEED = 0
+
+    # LLM request scheduling
+    LLM_MAX_CONCURRENCY = 8  # Calls in flight at once
+    LLM_REQUESTS_PER_MINUTE = 3500
+    LLM_TOKENS_PER_MINUTE = 90_000
+    LLM_REQUEST_TIMEOUT = 30  # seconds, per attempt
+    LLM_MAX_RETRIES = 3
+    LLM_BACKOFF_BASE = 0.5  # seconds, doubled on each retry (with jitter)
+    LLM_BACKOFF_MAX = 20  # seconds
+
+    # Notifications (written by a background thread; console output is always one of the sinks)
+    NOTIFICATION_PATH = None  # Also append them as JSON lines to this file, e.g. "notifications.jsonl"
+    NOTIFICATION_QUEUE_SIZE = 10_000
+    NOTIFICATION_BATCH_SIZE = 256  # Notifications per write at most
+    # When the queue is full: "drop_oldest", "drop_newest", or "block" (waits for room, stalling the
+    # event loop it is called from; only for callers off the loop)
+    NOTIFICATION_DROP_POLICY = "drop_oldest"
+    NOTIFICATION_LAZY_FORMAT = True  # Format text in the writer thread, and only if a sink needs it
+
+    # Metrics
+    METRICS_ENABLED = False  # Record metrics and spans (near-zero overhead when off)
+    METRICS_PORT = None  # Serve Prometheus text on this local port, e.g. 9464
+
+    # State store (calendar additions, tasks, recommendations and mid-day checkpoints)
+    STATE_DB_PATH = None  # Set to a file path (e.g. "state.sqlite") to persist state; worker processes can share it
+    STATE_DB_POOL_SIZE = 4  # Read connections
+    STATE_DB_BATCH_SIZE = 256  # Writes committed per transaction at most
+    STATE_CHECKPOINT_TICKS = 1  # Checkpoint every this many ticks
+
+    # LLM response cache
+    LLM_CACHE_ENABLED = False  # Reuse answers to identical prompts; at LLM_TEMPERATURE > 0 that replays one sample
+    LLM_CACHE_MAX_ENTRIES = 1024  # In-memory LRU size
+    LLM_CACHE_TTL = 24 * 3600  # seconds
+    LLM_CACHE_PATH = None  # Set to a file path (e.g. ".llm_cache.sqlite") to enable the on-disk tier
+    LLM_CACHE_DISK_MAX_ENTRIES = 100_000
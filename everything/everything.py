@@ -1,18 +1,58 @@
-import os
 import asyncio
 import logging
+import os
+import statistics
 
-from datetime import datetime, timedelta
-from typing import List, Dict
-from dotenv import load_dotenv
+from datetime import date, datetime, time, timedelta
+from time import perf_counter
+from typing import Any, AsyncIterator, Callable, List, Dict, Optional, Tuple
 
-import openai
 from openai.error import OpenAIError
 
 from user_data.user_data import UserData
+from user_data.calendar_index import CalendarEvent
 from device_data.device_data import DeviceData
-
+from device_data.ingest import FeedIngestor
+from metrics.metrics import COUNT_BUCKETS, METRICS
+
+from .classifier import (
+    Recommendation,
+    parse_recommendation,
+    split_classification,
+)
+from .clock import make_clock
 from .config import Config
+from .llm_backend import RETRYABLE_ERRORS, LLMBackend, make_backend
+from .llm_cache import LLMCache, cache_key
+from .llm_scheduler import LLMScheduler, Priority, estimate_tokens
+from .memory import RecommendationMemory
+from .notifications import Notification, Notifier
+from .planner import DayPlan, SlotState, parse_day_plan
+from .prompts import PromptBuilder
+from .state_store import StateStore
+from .streaming import LINE_END, PrefetchedStream, split_stream
+from .timing import RecommendationTimer
+
+TICK_SECONDS = METRICS.histogram("tick_seconds", "Time to process one simulation tick")
+EVENTS_PER_TICK = METRICS.histogram("events_per_tick", "Device events handled per tick", buckets=COUNT_BUCKETS)
+LLM_SECONDS = METRICS.histogram("llm_request_seconds", "LLM call latency, cache misses only", ("call_type",))
+LLM_FIRST_TOKEN_SECONDS = METRICS.histogram(
+    "llm_time_to_first_token_seconds", "Time to the first streamed token (whole answer when not streaming)", ("call_type",)
+)
+LLM_TOKENS = METRICS.counter("llm_tokens", "Estimated tokens sent and received", ("call_type", "kind"))
+LLM_ERRORS = METRICS.counter("llm_errors", "LLM calls that failed after retries", ("call_type",))
+
+
+def _chain(callback: Optional[Callable[[Any], None]], then: Callable[[Any], None]) -> Callable[[Any], None]:
+    """Calls callback (if set) and then then, with the same argument."""
+    if callback is None:
+        return then
+
+    def both(value: Any) -> None:
+        callback(value)
+        then(value)
+
+    return both
 
 
 class EVERYTHING:
@@ -21,67 +61,308 @@ class EVERYTHING:
     Manages user interactions, generates recommendations, and simulates a day.
     """
 
-    def __init__(self, user: UserData, devices: DeviceData, config: Config):
+    def __init__(
+        self,
+        user: UserData,
+        devices: DeviceData,
+        config: Config,
+        cache: Optional[LLMCache] = None,
+        scheduler: Optional[LLMScheduler] = None,
+        backend: Optional[LLMBackend] = None,
+        store: Optional[StateStore] = None,
+        notifier: Optional[Notifier] = None,
+        feed: Optional[FeedIngestor] = None,
+    ):
         self.user = user
         self.devices = devices
         self.config = config
+        self.backend = backend or make_backend(config)  # Raises if the OpenAI API key is missing
+        self.cache = cache if cache is not None else LLMCache.from_config(config)
+        self._owns_cache = cache is None
+        # Pass a shared scheduler to cap in-flight calls across several users
+        self.scheduler = scheduler or LLMScheduler.from_config(config, retry_on=RETRYABLE_ERRORS)
+        self._owns_scheduler = scheduler is None
+        # Persists calendar additions, tasks, recommendations and checkpoints (None keeps them in memory only)
+        self.store = store if store is not None else StateStore.from_config(config)
+        self._owns_store = store is None
+        # Shown since the last checkpoint; stored with the next one (see _checkpoint)
+        self._unsaved_recommendations: List[Tuple[datetime, Recommendation]] = []
         self.tasks: List[str] = []  # List to hold tasks for the day
+        self.ticks = 0  # Simulation steps processed
+        self.llm_calls = 0  # Requests actually sent to the LLM (cache hits excluded)
+        self.clock = None  # Set for the duration of simulate_day
+        self.prompts = PromptBuilder(user, config)
+        self.plan = DayPlan()  # Batched recommendations for the current day
+        self.timer = RecommendationTimer.from_config(config)  # None for the fixed RECOMMENDATION_HOURS
+        self.recommendation_slots: List[datetime] = []  # When to recommend (or, if adaptive, consider it) today
+        self.recommendation_times: List[datetime] = []  # When today's adaptive recommendations were made
+        # (time to first token, total) in seconds per call type
+        self.latencies: Dict[str, List[Tuple[float, float]]] = {}
         self.recommendations: List[
             str
         ] = []  # List to hold recommendations for the user
-
-        load_dotenv()
-
-        openai.api_key = os.getenv("OPENAI_API_KEY")
-        if not openai.api_key:
-            raise ValueError("OpenAI API key not found in environment variables")
-
-        logging.basicConfig(level=logging.INFO, format='%(levelname)s - %(message)s')
-        self.logger = logging.getLogger(__name__)
+        self.memory: Optional[RecommendationMemory] = None  # Recommendations shown so far, across days
+        if config.RECOMMENDATION_MEMORY:
+            self.memory = RecommendationMemory.from_config(config)
+            if self._memory_path() and os.path.exists(self._memory_path()):
+                self.memory.load(self._memory_path())
+
+        self.logger = logging.getLogger(__name__)  # Handlers are configured by the scripts
+        # Notifications are written by a background thread; pass a shared one to run many users
+        self.notifier = notifier or Notifier.from_config(config, console=self.logger)
+        self._owns_notifier = notifier is None  # Closed by close(); a shared one belongs to the caller
+        # Live location and calendar records, applied between ticks; they wake the event clock too
+        self.feed = feed
+        if feed is not None:
+            feed.on_calendar = _chain(feed.on_calendar, self._schedule_event)  # The caller's callbacks still run
+            feed.on_location = _chain(feed.on_location, self._schedule_location)
         self.llm = None  # Remove LangChain initialization
 
-    async def simulate_day(self) -> None:
-        """Simulates a day in the user's life with EVERYTHING AI."""
-        current_date = datetime.now().date()
+    async def simulate_day(self, current_date: Optional[date] = None, resume: bool = True) -> None:
+        """Simulates a day in the user's life with EVERYTHING AI (today by default).
+
+        With a state store, progress is checkpointed as the day goes; if the
+        day has a checkpoint (and resume is set), the simulation carries on
+        after the last tick it recorded instead of starting over. A day that
+        was finished is not simulated again, but its state is restored so
+        the following days carry on from it (see everything.replay).
+        """
+        if current_date is None:
+            current_date = datetime.now().date()
         start_time = datetime.combine(current_date, self.config.SIMULATION_START_TIME)
         end_time = datetime.combine(current_date, self.config.SIMULATION_END_TIME)
-        current_time = start_time
-
-        await self.start_day(start_time)
 
-        while current_time <= end_time:
-            await self.process_time(current_time)
-            current_time += timedelta(minutes=self.config.SIMULATION_INTERVAL)
-
-        await self.end_day(end_time)
+        self._unsaved_recommendations = []  # Left over if an earlier attempt crashed; the checkpoint wins
+        checkpoint = None
+        if self.store is not None and resume:
+            checkpoint = await self.store.load_checkpoint(self.user.name, current_date)
+        if checkpoint is not None and checkpoint[1]["finished"]:
+            await self._restore(*checkpoint, current_date)
+            self.logger.info(f"{self.user.name}'s {current_date} has already been simulated")
+            return
+        resumed_at = await self._restore(*checkpoint, current_date) if checkpoint is not None else None
+        if checkpoint is None:
+            self.recommendation_slots = self._plan_recommendation_slots(start_time, end_time)
+            self.recommendation_times = [start_time]
+
+        # "fixed" visits every SIMULATION_INTERVAL; "event" only visits the
+        # instants on that grid where an event, location change or
+        # recommendation is due. Both produce the same notifications.
+        self.clock = make_clock(
+            self.config.SIMULATION_MODE, start_time, timedelta(minutes=self.config.SIMULATION_INTERVAL)
+        )
+        self.devices.schedule_wakeups(self.clock, start_time, end_time)
+        for slot in self.recommendation_slots:
+            self.clock.schedule(slot)
+
+        with METRICS.start_span("simulate_day", user=self.user.name, date=current_date):
+            if checkpoint is None:
+                await self.start_day(start_time)
+                self._checkpoint(current_date, start_time, None)
+
+            self._apply_feed()
+            for current_time in self.clock.ticks(end_time):
+                if resumed_at is not None and current_time <= resumed_at:
+                    continue  # Processed before the checkpoint
+                await self.process_time(current_time)
+                # Before the clock picks the next tick, so it can wake up for what arrived
+                self._apply_feed()
+                if self.ticks % self.config.STATE_CHECKPOINT_TICKS == 0:
+                    self._checkpoint(current_date, current_time, current_time)
+
+            await self.end_day(end_time)
+            self._checkpoint(current_date, end_time, end_time, finished=True)
+            if self.store is not None:
+                await self.store.flush()
+            if self._owns_notifier:  # A shared one is flushed when its owner closes it, not at each user's day end
+                await self.notifier.flush()
+        self.clock = None
+
+    def _checkpoint(
+        self, current_date: date, at: datetime, last_tick: Optional[datetime], finished: bool = False
+    ) -> None:
+        """Queues a checkpoint of the day's progress (a no-op without a state store).
+
+        Recommendations shown since the previous checkpoint are written with
+        it, in one transaction: after a crash, the ticks replayed from the
+        checkpoint publish theirs again without duplicating stored rows or
+        finding them in the restored memory. The batched day plan is not
+        saved; after a resume, its slots fall back to per-slot
+        recommendations.
+        """
+        if self.store is None:
+            return
+        state = {
+            "last_tick": last_tick.isoformat() if last_tick is not None else None,
+            "finished": finished,
+            "ticks": self.ticks,
+            "llm_calls": self.llm_calls,
+            "tasks": self.tasks,
+            # Only the count: the texts are stored as they are shown, so the state stays small
+            "recommendations_shown": len(self.recommendations),
+            "recommendation_slots": [slot.isoformat() for slot in self.recommendation_slots],
+            "recommendation_times": [at.isoformat() for at in self.recommendation_times],
+            "devices": self.devices.state(),
+        }
+        self.store.save_checkpoint(self.user.name, current_date, at, state, self._unsaved_recommendations)
+        self._unsaved_recommendations = []
+
+    async def _restore(self, at: datetime, state: Dict, current_date: date) -> Optional[datetime]:
+        """Restores the state checkpointed at at and returns the last tick it had processed."""
+        self.ticks = state["ticks"]
+        self.llm_calls = state["llm_calls"]
+        self.tasks = state["tasks"]
+        # The recommendations were stored with the checkpoints, up to this one
+        stored = await self.store.recommendations(self.user.name, until=at)
+        shown = state["recommendations_shown"]
+        self.recommendations = [recommendation.text for _, recommendation in stored[max(len(stored) - shown, 0):]]
+        # Planned against the calendar as it was at the start of the day
+        self.recommendation_slots = [datetime.fromisoformat(slot) for slot in state["recommendation_slots"]]
+        self.recommendation_times = [datetime.fromisoformat(at) for at in state.get("recommendation_times", [])]
+        self.devices.restore(state["devices"])
+
+        # Events added earlier in the day are only in the store after a restart
+        day_start = datetime.combine(current_date, time.min)
+        day_end = datetime.combine(current_date, time.max)
+        known = {(event.start, event.title) for event in self.user.calendar_index.starting_between(day_start, day_end)}
+        for event in await self.store.events(self.user.name, day_start, day_end):
+            if (event.start, event.title) not in known:
+                self.user.add_event(event.raw)
+        if self.memory is not None:
+            # The memory file is only written at the end of a day
+            for shown_at, recommendation in stored:
+                if shown_at >= day_start:
+                    self.memory.remember(recommendation, "", shown_at)
+        return datetime.fromisoformat(state["last_tick"]) if state["last_tick"] else None
+
+    def _apply_feed(self) -> None:
+        if self.feed is not None:
+            self.feed.apply_pending()
+
+    def _schedule_event(self, event: CalendarEvent) -> None:
+        """Wakes the clock for a calendar event that arrived from the feed."""
+        if self.clock is not None:
+            self.devices.schedule_event_wakeups(self.clock, event)
+
+    def _schedule_location(self, timestamp: datetime) -> None:
+        """Wakes the clock for a location fix that arrived from the feed."""
+        if self.clock is not None:
+            self.clock.schedule(timestamp)
 
     async def process_time(self, current_time: datetime) -> None:
         """Processes events and generates recommendations for the current time."""
-        events = self.devices.generate_events(
-            current_time
-        )  # Generate events for the current time
-        for event in events:
-            await self.handle_event(event, current_time)  # Handle each event
-
-        # Generate recommendations at the start of each recommendation hour
-        if (
-            current_time.hour in self.config.RECOMMENDATION_HOURS
-            and current_time.minute == 0
-        ):
-            await self.generate_recommendations(current_time)
+        self.ticks += 1
+        with TICK_SECONDS.time(), METRICS.start_span("tick", time=current_time):
+            events = self.devices.generate_events(
+                current_time
+            )  # Generate events for the current time
+            EVENTS_PER_TICK.observe(len(events))
+            for event in events:
+                await self.handle_event(event, current_time)  # Handle each event
+
+            # Generate recommendations at each of the day's recommendation slots
+            if current_time in self.recommendation_slots:
+                if self.timer is None:
+                    await self.generate_recommendations(current_time)
+                elif self.timer.should_recommend(
+                    self.user, current_time, timedelta(minutes=self.config.SIMULATION_INTERVAL), self.recommendation_times
+                ):
+                    self.recommendation_times.append(current_time)
+                    await self.generate_recommendations(current_time)
+
+    def _plan_recommendation_slots(self, start_time: datetime, end_time: datetime) -> List[datetime]:
+        """The times after start_time at which to recommend, or to decide whether to (start_day covers start_time itself)."""
+        if self.timer is not None:
+            return self.timer.candidates(
+                self.user, start_time, end_time, timedelta(minutes=self.config.SIMULATION_INTERVAL)
+            )
+        return [datetime.combine(start_time.date(), time(hour)) for hour in self.config.RECOMMENDATION_HOURS]
 
     async def start_day(self, current_time: datetime) -> None:
         """Starts the day simulation."""
-        greeting = await self.generate_personalised_greeting(current_time)
-        self.logger.info(f"\n[{current_time.strftime('%I:%M %p')}] [NOTIFICATION] {greeting}")
-        self.logger.info(
-            f"[{current_time.strftime('%I:%M %p')}] [NOTIFICATION] It's {current_time.strftime('%I:%M %p')}. Here's your day at a glance:"
-        )
-        await self.generate_tasks(current_time)
-        await self.generate_recommendations(current_time)
+        # The greeting, tasks and first recommendation (or the whole day's plan)
+        # are independent, so their LLM calls are issued concurrently and the
+        # results published in order.
+        if self.config.RECOMMENDATION_MODE == "batched":
+            recommendations = self.plan_day(current_time)
+        else:
+            recommendations = self._query_recommendation(current_time)
+        if self.config.LLM_STREAMING:
+            await self._stream_start_day(current_time, recommendations)
+            return
+
+        requests = [
+            asyncio.ensure_future(request)
+            for request in (
+                self.generate_personalised_greeting(current_time),
+                self.query_llm(self._tasks_prompt(current_time), call_type="tasks"),
+                recommendations,
+            )
+        ]
+        try:
+            greeting, tasks_response, recommendation = await asyncio.gather(*requests)
+        finally:
+            for request in requests:
+                request.cancel()  # If one failed, the others are not left running; a no-op once done
+        self.notify(current_time, "greeting", "{text}", section=True, text=greeting)
+        self.notify(current_time, "overview", "It's {time}. Here's your day at a glance:")
+        self._publish_tasks(tasks_response, current_time)
+        await self._publish_first_recommendation(recommendation, current_time)
+
+    async def _stream_start_day(self, current_time: datetime, recommendations) -> None:
+        """Streaming variant of start_day: greeting sentences and task lines are notified as they arrive.
+
+        All three requests start at once; the streams are buffered so the
+        notifications still come out in the usual order. If one of them
+        fails, the others are cancelled rather than left running.
+        """
+        recommendation_task = asyncio.ensure_future(recommendations)
+        greeting = tasks = None
+        try:
+            greeting = PrefetchedStream(split_stream(
+                self.query_llm_stream(self._greeting_prompt(current_time), call_type="greeting")
+            ))
+            tasks = PrefetchedStream(split_stream(
+                self.query_llm_stream(self._tasks_prompt(current_time), call_type="tasks"), LINE_END
+            ))
+
+            first = True
+            async for sentence in greeting:
+                self.notify(current_time, "greeting", "{text}", section=first, text=sentence)
+                first = False
+            self.notify(current_time, "overview", "It's {time}. Here's your day at a glance:")
+            self.notify(current_time, "tasks", "Today's tasks:")
+            self.tasks = []
+            async for task in tasks:
+                self.tasks.append(task)
+                self.notify(current_time, "task", "- {task}", task=task)
+            if self.store is not None:
+                self.store.set_tasks(self.user.name, current_time.date(), self.tasks)
+            recommendation = await recommendation_task
+        finally:
+            for stream in (greeting, tasks):
+                if stream is not None:
+                    stream.cancel()
+            recommendation_task.cancel()  # No-op once it is done
+
+        await self._publish_first_recommendation(recommendation, current_time)
+
+    async def _publish_first_recommendation(
+        self, recommendation: Optional[Recommendation], current_time: datetime
+    ) -> None:
+        if recommendation is None:
+            await self.generate_recommendations(current_time)  # Not covered by the plan
+        else:
+            await self._publish_recommendation(recommendation, current_time)
 
     async def generate_personalised_greeting(self, current_time: datetime) -> str:
         """Generates a personalised greeting for the user."""
+        # Query the language model for the greeting
+        greeting = await self.query_llm(self._greeting_prompt(current_time), call_type="greeting")
+        return greeting.strip()
+
+    def _greeting_prompt(self, current_time: datetime) -> str:
+        """Builds the prompt for the morning greeting."""
         name = self.user.profile["name"]
         sleep_data = self.user.profile["fitness_data"]["sleep"]["last_night"]
 
@@ -91,17 +372,12 @@ class EVERYTHING:
         - Sleep data: {sleep_data}
         - Current time: {current_time.strftime('%I:%M %p')}
         """
-
-        # Query the language model for the greeting
-        greeting = await self.query_llm(prompt)
-        return greeting.strip()
+        return prompt
 
     async def handle_event(self, event: str, current_time: datetime) -> None:
         """Handles an event and generates a proactive action."""
         if "Upcoming event" in event:
-            self.logger.info(
-                f"\n[{current_time.strftime('%I:%M %p')}] [NOTIFICATION] Heads up, {self.user.name}! {event}"
-            )
+            self.notify(current_time, "event", "Heads up, {user}! {event}", section=True, event=event)
 
             event_details = event.split(": ")[1]
             current_location = self.user.get_current_location(
@@ -109,30 +385,30 @@ class EVERYTHING:
             )
 
             # Create a prompt for the language model
-            prompt = f"""Suggest a proactive action for the event: '{event_details}'.
-            User's current location: {current_location}
-            Current time: {current_time.strftime('%I:%M %p')}
-            User's profile: {self.user.profile}
-            Suggestion should be helpful, context-aware, and consider the user's preferences and habits.
-            And, give the response such that you are speaking to the user"""
-
-            action = await self.query_llm(
-                prompt
-            )  # Query the language model for an action suggestion
-            self.logger.info(
-                f"[{current_time.strftime('%I:%M %p')}] [NOTIFICATION] I suggest: {action}"
-            )  # Log suggestion to user
-            self.logger.info(
-                f"[{current_time.strftime('%I:%M %p')}] [NOTIFICATION] Would you like me to take care of anything related to this event?"
-            )
+            prompt = self.prompts.event(event_details, current_location, current_time)
+
+            if self.config.LLM_STREAMING:
+                # Notify sentence by sentence so the first one reaches the user early
+                template = "I suggest: {text}"
+                async for sentence in split_stream(
+                    self.query_llm_stream(prompt, priority=Priority.URGENT, call_type="event")
+                ):
+                    self.notify(current_time, "suggestion", template, text=sentence)
+                    template = "{text}"
+            else:
+                action = await self.query_llm(
+                    prompt, priority=Priority.URGENT, call_type="event"
+                )  # Query the language model for an action suggestion
+                self.notify(current_time, "suggestion", "I suggest: {text}", text=action)  # Suggestion to user
+            self.notify(current_time, "question", "Would you like me to take care of anything related to this event?")
             #
             # TODO: Implement a way to get user's input/prompt and act accordingly
             #
 
     async def end_day(self, current_time: datetime) -> None:
         """Ends the day simulation."""
-        self.logger.info(f"\n[{current_time.strftime('%I:%M %p')}] [NOTIFICATION] --- Good evening, {self.user.name}. ---")
-        self.logger.info(f"[{current_time.strftime('%I:%M %p')}] [NOTIFICATION] Here's a quick summary of your day:")
+        self.notify(current_time, "evening", "--- Good evening, {user}. ---", section=True)
+        self.notify(current_time, "summary", "Here's a quick summary of your day:")
 
         completed_tasks = len(self.tasks)
         steps = self.user.profile["fitness_data"][
@@ -147,113 +423,360 @@ class EVERYTHING:
         if steps > self.user.profile["fitness_data"]["average_daily_steps"]:
             summary += " You exceeded your average daily step count!"
 
-        self.logger.info(f"[{current_time.strftime('%I:%M %p')}] [NOTIFICATION] {summary}")
-        self.logger.info(
-            f"\n[{current_time.strftime('%I:%M %p')}] [NOTIFICATION] Here are some key recommendations for tomorrow:"
-        )
-        for rec in self.recommendations[-3:]:  # Show last three recommendations
-            self.logger.info(f"[{current_time.strftime('%I:%M %p')}] [NOTIFICATION] - {rec}")
-
-        self.logger.info(
-            f"\n[{current_time.strftime('%I:%M %p')}] [NOTIFICATION] Is there anything else you'd like me to help with before you call it a day?"
+        self.notify(current_time, "summary", "{text}", text=summary, tasks=completed_tasks, steps=steps, calories=calories)
+        self.notify(current_time, "summary", "Here are some key recommendations for tomorrow:", section=True)
+        if self.memory is not None:
+            latest = [recommendation.text for recommendation in self.memory.recent(3)]  # Distinct by construction
+        else:
+            latest = self.recommendations[-3:]
+        for rec in latest:  # Show last three recommendations
+            self.notify(current_time, "summary", "- {text}", text=rec)
+        if self.memory is not None and self._memory_path():
+            self.memory.save(self._memory_path())
+
+        self.notify(
+            current_time, "question", "Is there anything else you'd like me to help with before you call it a day?",
+            section=True,
         )
         await self.simulate_user_response(
-            "Is there anything else you'd like me to help with before you call it a day?"
+            "Is there anything else you'd like me to help with before you call it a day?", current_time
         )
+        self.logger.debug(f"Prompt tokens per call type: {self.prompts.savings()}")
+        self.logger.debug(f"LLM latency per call type: {self.latency_summary()}")
 
     async def generate_tasks(self, current_time: datetime) -> None:
         """Generates proactive tasks for the user."""
-        profile = self.user.profile  # Get user profile
+        response = await self.query_llm(self._tasks_prompt(current_time), call_type="tasks")
+        self._publish_tasks(response, current_time)
+
+    def _tasks_prompt(self, current_time: datetime) -> str:
+        """Builds the prompt for the day's proactive tasks."""
         calendar = self.user.get_upcoming_events(
-            hours=24
+            hours=24, current_time=current_time
         )
-        
-        # Create a prompt for the language model to generate tasks
-        prompt = f"""Generate 3 proactive tasks for {self.user.name} based on their profile and calendar:
-        Profile: {profile}
-        Calendar: {calendar}
-        Current time: {current_time.strftime('%I:%M %p')}
-        Tasks should be specific and actionable."""
-
-        response = await self.query_llm(prompt)
+        return self.prompts.tasks(calendar, current_time)
+
+    def _publish_tasks(self, response: str, current_time: datetime) -> None:
+        """Stores the generated tasks and notifies the user."""
         self.tasks = response.split("\n")
-        self.logger.info(f"[{current_time.strftime('%I:%M %p')}] [NOTIFICATION] Today's tasks:")
+        self.notify(current_time, "tasks", "Today's tasks:")
 
         for task in self.tasks:
-            self.logger.info(f"[{current_time.strftime('%I:%M %p')}] [NOTIFICATION] - {task}")
+            self.notify(current_time, "task", "- {task}", task=task)
+        if self.store is not None:
+            self.store.set_tasks(self.user.name, current_time.date(), self.tasks)
 
     async def generate_recommendations(self, current_time: datetime) -> None:
         """Generates personalised recommendations for the user."""
-        profile = self.user.profile  # Get user profile
-        social_media = self.user.social_media  # Get user's social media data
-        spotify = self.user.spotify_playlists  # Get user's Spotify playlists
-        current_location = self.user.get_current_location(
-            current_time
-        )
+        planned = self.plan.release(current_time, self._slot_state(current_time))
+        if planned is not None:
+            await self._publish_recommendation(planned.recommendation, current_time)
+            return
+
+        recommendation = await self._query_recommendation(current_time)
+        await self._publish_recommendation(recommendation, current_time)
 
-        # Create a prompt for the language model to generate recommendations
-        prompt = f"""Generate a personalised recommendation for {self.user.name} based on their profile, social media, music preferences, current location, and time of day. Additionally, classify the recommendation as 'urgent', 'important', or 'normal':
-        Profile: {profile}
-        Social Media: {social_media}
-        Spotify Playlists: {spotify}
-        Current location: {current_location}
-        Current time: {current_time.strftime('%I:%M %p')}
-        Recommendation should be specific, tailored to the user's interests, current location, and the time of day. Please include a classification at the end of the response."""
+    async def _query_recommendation(self, current_time: datetime) -> Recommendation:
+        """Asks the LLM for a single recommendation and classifies it.
 
+        If an earlier recommendation was made for a matching context and can
+        be shown again (see RecommendationMemory.recall), it is reused
+        instead. The prompt lists what was shown within the repeat window:
+        suppressing a repeat after the call still costs that call.
+        """
+        if self.memory is not None:
+            recalled = self.memory.recall(self._recommendation_context(current_time), current_time)
+            if recalled is not None:
+                return recalled
         response = await self.query_llm(
-            prompt
+            self._recommendation_prompt(current_time), priority=Priority.BACKGROUND, call_type="recommendation"
         )  # Query the language model for recommendations
-        self.recommendations.append(response.strip())  # Add recommendation to the list
-        self.logger.info(
-            f"\n[{current_time.strftime('%I:%M %p')}] [AI's Brain] Generated recommendation: {response.strip()}"
+        return self.classify_recommendation(response)
+
+    def classify_recommendation(self, response: str) -> Recommendation:
+        """Turns a model answer into a typed Recommendation.
+
+        Structured (JSON) answers carry their own classification. For free
+        text, a trailing "Classification: ..." label is used if present, and
+        "normal" otherwise; classifying never costs another LLM call.
+        """
+        recommendation = parse_recommendation(response)
+        if recommendation is not None:
+            return recommendation
+
+        text, label = split_classification(response)
+        return Recommendation(text, label or "normal")
+
+    async def plan_day(self, current_time: datetime) -> Optional[Recommendation]:
+        """Plans all of today's recommendation slots in one LLM call.
+
+        Stores the plan in self.plan and returns the start-of-day slot's
+        recommendation, or None if the plan did not cover it.
+        """
+        slots = [current_time] + [slot for slot in self.recommendation_slots if slot > current_time]
+        states = {slot: self._slot_state(slot) for slot in slots}
+        prompt = self.prompts.day_plan(
+            [(slot, state.location, [title for _, title in state.upcoming]) for slot, state in states.items()],
+            current_time,
+        )
+        response = await self.query_llm(
+            prompt, priority=Priority.BACKGROUND, max_tokens=self.config.LLM_PLAN_MAX_TOKENS,
+            call_type="day_plan",
+        )
+        self.plan = parse_day_plan(response, states)
+        self.logger.debug(f"Planned {len(self.plan)} of {len(slots)} recommendation slots")
+
+        first = self.plan.release(current_time, states[current_time])
+        return first.recommendation if first is not None else None
+
+    def _slot_state(self, slot: datetime) -> SlotState:
+        """The location and upcoming events a recommendation at slot depends on."""
+        upcoming = self.user.get_upcoming_calendar_events(
+            hours=self.devices.lookahead_hours, current_time=slot
+        )
+        return SlotState(
+            self.user.get_current_location(slot),
+            tuple((event.start, event.title) for event in upcoming),
         )
 
-        # Check urgency and importance of the recommendation
-        if "urgent" in response.lower() or "important" in response.lower():
-            self.logger.info(f"[{current_time.strftime('%I:%M %p')}] [NOTIFICATION] Important recommendation: {response.strip()}")
-            # Optionally, add an event based on the recommendation
+    def _recommendation_prompt(self, current_time: datetime) -> str:
+        """Builds the prompt for a personalised recommendation."""
+        current_location = self.user.get_current_location(
+            current_time
+        )
+        avoid = []
+        if self.memory is not None:
+            since = current_time - timedelta(hours=self.config.RECOMMENDATION_REPEAT_HOURS)
+            avoid = [recommendation.text for recommendation in self.memory.recent(3, since)]
+        return self.prompts.recommendation(current_location, current_time, avoid)
+
+    def _recommendation_context(self, current_time: datetime) -> str:
+        """What a recommendation at current_time is about, for matching it in memory."""
+        state = self._slot_state(current_time)
+        part_of_day = "morning" if current_time.hour < 12 else "afternoon" if current_time.hour < 17 else "evening"
+        return " ".join([state.location or "unknown", part_of_day] + [title for _, title in state.upcoming])
+
+    def _memory_path(self) -> Optional[str]:
+        if not self.config.RECOMMENDATION_MEMORY_PATH:
+            return None
+        return os.path.join(self.user.data_dir, self.config.RECOMMENDATION_MEMORY_PATH)
+
+    async def _publish_recommendation(self, recommendation: Recommendation, current_time: datetime) -> None:
+        """Stores a generated recommendation, notifies the user and adds urgent/important ones to the calendar.
+
+        Near-duplicates of a recommendation shown recently are dropped.
+        """
+        if self.memory is not None and not self.memory.remember(
+            recommendation, self._recommendation_context(current_time), current_time
+        ):
+            self.logger.debug(f"Suppressed repeated recommendation: {recommendation.text}")
+            return
+        self.recommendations.append(recommendation.text)  # Add recommendation to the list
+        if self.store is not None:
+            self._unsaved_recommendations.append((current_time, recommendation))
+        self.notify(
+            current_time, "brain", "Generated recommendation: {text} ({classification})", section=True,
+            text=recommendation.text, classification=recommendation.classification,
+        )
+
+        # The classification is a typed field, so a recommendation that merely
+        # mentions the word "important" no longer ends up in the calendar
+        if recommendation.needs_calendar_event:
+            self.notify(current_time, "recommendation", "Important recommendation: {text}", text=recommendation.text)
+            # Optionally, add an event based on the recommendation; never earlier
+            # than now (e.g. a recalled recommendation's time may have passed)
+            now = current_time.strftime("%H:%M")
             new_event = {
                 "date": current_time.strftime("%Y-%m-%d"),
-                "time": current_time.strftime("%H:%M"),
-                "event": response.strip(),
-                "duration": "1"  # Default duration, can be adjusted but 1 for now!
+                "time": max(recommendation.suggested_time or now, now),
+                "event": recommendation.text,
+                "duration": str(recommendation.duration_hours),
             }
-            await self.add_event(new_event)  # Add the event to the calendar
+            await self.add_event(new_event, current_time)  # Add the event to the calendar
         else:
-            self.logger.info(f"[{current_time.strftime('%I:%M %p')}] [NOTIFICATION] I have a new suggestion for you, {self.user.name}. Would you like to hear it?")
+            self.notify(current_time, "recommendation", "I have a new suggestion for you, {user}. Would you like to hear it?")
             # TODO: Implement a way to get user's input/prompt and act accordingly
 
-    async def query_llm(self, prompt: str) -> str:
-        """Queries the language model with the given prompt using OpenAI API."""
+    async def query_llm(
+        self,
+        prompt: str,
+        priority: Priority = Priority.NORMAL,
+        max_tokens: Optional[int] = None,
+        call_type: str = "other",
+    ) -> str:
+        """Queries the language model with the given prompt using the configured backend.
+
+        Calls go through the scheduler, which bounds concurrency, applies the
+        rate limits and retries transient errors; priority picks the lane.
+        max_tokens overrides Config.LLM_MAX_TOKENS for this call, and
+        call_type labels its latency record.
+        """
+        max_tokens = max_tokens or self.config.LLM_MAX_TOKENS
+        key = self._cache_key(prompt, max_tokens)
+        if key is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        self.llm_calls += 1
+        LLM_TOKENS.labels(call_type, "prompt").inc(estimate_tokens(prompt))
+        span = METRICS.start_span("llm.query", call_type=call_type, priority=priority)
+        started = perf_counter()
         try:
-            response = await asyncio.get_event_loop().run_in_executor(
-                None,
-                lambda: openai.ChatCompletion.create(
-                    model=self.config.LLM_MODEL,  # Specify the model to use
-                    messages=[
-                        {"role": "user", "content": prompt}
-                    ],  # Prepare the message for the model
-                    max_tokens=self.config.LLM_MAX_TOKENS,  # Set max tokens for the response
-                    n=1,  # Number of responses to generate
-                    temperature=self.config.LLM_TEMPERATURE,  # Set the randomness of the response
+            response = await self.scheduler.submit(
+                lambda: self.backend.complete(
+                    prompt, self.config.LLM_MODEL, max_tokens, self.config.LLM_TEMPERATURE
                 ),
+                priority=priority,
+                tokens=estimate_tokens(prompt) + max_tokens,
+                call_type=call_type,
             )
-            return response.choices[0].message.content.strip()  # Return the generated response
+            content = response.strip()
+            elapsed = perf_counter() - started
+            self._record_latency(call_type, elapsed, elapsed, content)  # No partial output without streaming
+            if key is not None:
+                self.cache.set(key, content)  # Errors below are never cached
+            return content  # Return the generated response
         except OpenAIError as e:
             self.logger.error(f"OpenAI API error: {str(e)}")
+            LLM_ERRORS.labels(call_type).inc()
+            span.record_exception(e)
             return "An error occurred while processing your request."
+        except asyncio.TimeoutError as e:
+            self.logger.error("OpenAI API request timed out")
+            LLM_ERRORS.labels(call_type).inc()
+            span.record_exception(e)
+            return "An error occurred while processing your request."
+        finally:
+            span.end()
+
+    async def query_llm_stream(
+        self,
+        prompt: str,
+        priority: Priority = Priority.NORMAL,
+        max_tokens: Optional[int] = None,
+        call_type: str = "other",
+    ) -> AsyncIterator[str]:
+        """Streams the completion for prompt as text deltas.
+
+        Same scheduling and caching as query_llm; a cached answer is replayed
+        as a single delta. Time to first token and total latency are recorded
+        under call_type (the total includes time the consumer spends between
+        deltas). The assembled text is cached once the stream completes.
+        """
+        max_tokens = max_tokens or self.config.LLM_MAX_TOKENS
+        key = self._cache_key(prompt, max_tokens)
+        if key is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                yield cached
+                return
+
+        self.llm_calls += 1
+        LLM_TOKENS.labels(call_type, "prompt").inc(estimate_tokens(prompt))
+        span = METRICS.start_span("llm.query", call_type=call_type, priority=priority, stream=True)
+        started = perf_counter()
+        first_token = None
+        parts: List[str] = []
+        try:
+            async for delta in self.scheduler.stream(
+                lambda: self.backend.stream(
+                    prompt, self.config.LLM_MODEL, max_tokens, self.config.LLM_TEMPERATURE
+                ),
+                priority=priority,
+                tokens=estimate_tokens(prompt) + max_tokens,
+                call_type=call_type,
+            ):
+                if first_token is None:
+                    first_token = perf_counter() - started
+                    span.add_event("first_token")
+                parts.append(delta)
+                yield delta
+        except (OpenAIError, asyncio.TimeoutError) as e:
+            self.logger.error(f"OpenAI API error: {str(e) or type(e).__name__}")
+            LLM_ERRORS.labels(call_type).inc()
+            span.record_exception(e)
+            if not parts:
+                yield "An error occurred while processing your request."
+            return
+        finally:
+            span.end()  # Also when the consumer stops early
+
+        total = perf_counter() - started
+        self._record_latency(call_type, total if first_token is None else first_token, total, "".join(parts))
+        if key is not None and parts:
+            self.cache.set(key, "".join(parts).strip())
+
+    def _cache_key(self, prompt: str, max_tokens: int) -> Optional[str]:
+        if self.cache is None:
+            return None
+        return cache_key(self.config.LLM_MODEL, self.config.LLM_TEMPERATURE, max_tokens, prompt)
+
+    def _record_latency(self, call_type: str, first_token: float, total: float, content: str) -> None:
+        self.latencies.setdefault(call_type, []).append((first_token, total))
+        LLM_FIRST_TOKEN_SECONDS.labels(call_type).observe(first_token)
+        LLM_SECONDS.labels(call_type).observe(total)
+        LLM_TOKENS.labels(call_type, "completion").inc(estimate_tokens(content))
+
+    def latency_summary(self) -> Dict[str, Dict[str, float]]:
+        """Time-to-first-token and total latency statistics (seconds) per call type."""
+        summary = {}
+        for call_type, samples in self.latencies.items():
+            first_tokens = sorted(sample[0] for sample in samples)
+            totals = sorted(sample[1] for sample in samples)
+            summary[call_type] = {
+                "calls": len(samples),
+                "ttft_mean": statistics.fmean(first_tokens),
+                "ttft_p95": first_tokens[min(len(first_tokens) - 1, int(0.95 * len(first_tokens)))],
+                "total_mean": statistics.fmean(totals),
+                "total_p95": totals[min(len(totals) - 1, int(0.95 * len(totals)))],
+            }
+        return summary
 
-    async def simulate_user_response(self, prompt: str) -> str:
-        """Simulates a user response to the AI assistant's prompt."""
+    async def simulate_user_response(self, prompt: str, current_time: Optional[datetime] = None) -> str:
+        """Simulates a user response to the AI assistant's prompt (at current_time, in simulated time)."""
         user_response_prompt = f"""Given the AI assistant's prompt: '{prompt}', generate a natural, conversational response."""
-        response = await self.query_llm(user_response_prompt)  # Query the model for a simulated user response
+        response = await self.query_llm(user_response_prompt, call_type="user_response")  # Query the model for a simulated user response
 
-        self.logger.info(f"[{datetime.now().strftime('%I:%M %p')}] [NOTIFICATION] Simulated user response: {response}")
+        self.notify(current_time or datetime.now(), "user_response", "Simulated user response: {text}", text=response)
         return response
 
-    async def add_event(self, event: Dict[str, str]) -> None:
+    async def close(self) -> None:
+        """Writes what is pending and releases the components this instance created itself.
+
+        Components passed in (e.g. a fleet's shared notifier) are left to
+        their owner.
+        """
+        if self._owns_notifier:
+            self.notifier.close()
+        if self._owns_scheduler:
+            self.scheduler.close()
+        if self._owns_store and self.store is not None:
+            await self.store.close()
+        if self._owns_cache and self.cache is not None:
+            self.cache.close()
+
+    async def __aenter__(self) -> "EVERYTHING":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    def notify(self, current_time: datetime, kind: str, template: str, section: bool = False, **payload) -> None:
+        """Queues a notification for the user.
+
+        template is formatted with user, time (e.g. "07:30 AM") and payload
+        only when a sink needs the text; generated text belongs in payload.
+        """
+        self.notifier.emit(Notification(self.user.name, current_time, kind, template, payload, section))
+
+    async def add_event(self, event: Dict[str, str], current_time: Optional[datetime] = None) -> None:
         """Adds a new event to the user's calendar, based on the recommendation. Ex: Run, Break, etc"""
-        # Maybe TODO: Add when there is only a free slot in the calendar?
+        # Maybe TODO: Add when there is only a free slot in the calendar? (see CalendarIndex.free_slots)
         # Currently it just adds the event and let user decide what's best for them
-        self.user.calendar.append(event)
-        self.logger.info(f"[Event added] {event}")
+        calendar_event = self.user.add_event(event)  # Inserted into the calendar index at its sorted position
+        if self.store is not None:
+            self.store.add_event(self.user.name, calendar_event)
+        if self.clock is not None:
+            self.devices.schedule_event_wakeups(self.clock, calendar_event)
+        self.notify(current_time or calendar_event.start, "calendar", "{event}", event=event)
@@ -0,0 +1,231 @@
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Deque, Iterator, Optional
+
+import openai
+
+from .llm_backend import LLMBackend
+
+
+_SLOT_TIMES = re.compile(r'"time":"(\d\d:\d\d)"')
+
+
+def default_reply(prompt: str) -> str:
+    """A deterministic, prompt-dependent answer.
+
+    Prompts that ask for a JSON day plan or a JSON recommendation get an
+    answer in that format, so the structured code paths
+    can be exercised offline; anything else gets free text.
+    """
+    digest = hashlib.sha1(prompt.encode("utf-8")).hexdigest()[:8]
+    text = f"This is a simulated answer ({digest})."
+    if "Answer with only a JSON array" in prompt:
+        slots = re.search(r"Slots: (.*)", prompt)
+        times = _SLOT_TIMES.findall(slots.group(1)) if slots else []
+        return json.dumps([
+            {"time": time, "recommendation": f"{text[:-1]} for {time}.", "classification": "normal"}
+            for time in times
+        ])
+    if "Answer with only a JSON object" in prompt:
+        return json.dumps({"recommendation": text, "classification": "normal"})
+    return f"{text} It arrives in pieces.\nClassification: normal"
+
+
+class MockBackend(LLMBackend):
+    """Deterministic local backend for offline tests and benchmarks.
+
+    Each request waits for a latency drawn from a log-normal distribution
+    (median latency, spread latency_sigma; 0 gives a fixed latency) before
+    its first token, then chunk_delay between chunks when streaming. A
+    request fails with probability rate_limit_rate (RateLimitError) or
+    error_rate (ServiceUnavailableError), and with RateLimitError whenever
+    it would exceed requests_per_minute. With a seed, a request's latency
+    and fate depend only on the seed, its prompt and how many times that
+    prompt was sent before, so they do not change with the order in which
+    concurrent requests arrive (the requests_per_minute limit still does).
+    """
+
+    def __init__(
+        self,
+        reply: Callable[[str], str] = default_reply,
+        latency: float = 0.0,
+        latency_sigma: float = 0.0,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        requests_per_minute: Optional[int] = None,
+        chunk_size: int = 8,
+        chunk_delay: float = 0.0,
+        seed: Optional[int] = None,
+    ):
+        self.reply = reply
+        self.latency = latency
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.requests_per_minute = requests_per_minute
+        self.chunk_size = chunk_size
+        self.chunk_delay = chunk_delay
+        self.seed = seed
+        self._random = random.Random()  # Unseeded requests only
+        self._attempts: Counter = Counter()  # Requests so far per prompt digest
+        self._recent: Deque[float] = deque()  # Admission times within the last minute
+        self._lock = threading.Lock()  # Requests arrive from the scheduler's worker threads
+        self.stats = {"requests": 0, "errors": 0, "rate_limited": 0}
+
+    @classmethod
+    def from_config(cls, config) -> "MockBackend":
+        return cls(
+            latency=config.MOCK_LLM_LATENCY,
+            latency_sigma=config.MOCK_LLM_LATENCY_SIGMA,
+            error_rate=config.MOCK_LLM_ERROR_RATE,
+            rate_limit_rate=config.MOCK_LLM_RATE_LIMIT_RATE,
+            requests_per_minute=config.MOCK_LLM_REQUESTS_PER_MINUTE,
+            seed=config.MOCK_LLM_SEED,
+        )
+
+    def complete(self, prompt: str, model: str, max_tokens: int, temperature: float) -> str:
+        time.sleep(self._admit(prompt))
+        return self.reply(prompt)
+
+    def stream(self, prompt: str, model: str, max_tokens: int, temperature: float) -> Iterator[str]:
+        # Admission happens here so failures surface when the stream is opened
+        return self._deltas(self.reply(prompt), self._admit(prompt))
+
+    def _deltas(self, content: str, latency: float) -> Iterator[str]:
+        time.sleep(latency)
+        for i in range(0, len(content), self.chunk_size):
+            if i:
+                time.sleep(self.chunk_delay)
+            yield content[i : i + self.chunk_size]
+
+    def _admit(self, prompt: str) -> float:
+        """Decides the request's fate; returns its latency or raises its error."""
+        with self._lock:
+            self.stats["requests"] += 1
+            now = time.monotonic()
+            while self._recent and now - self._recent[0] >= 60:
+                self._recent.popleft()
+            rng = self._random
+            if self.seed is not None:
+                digest = hashlib.sha1(prompt.encode("utf-8")).hexdigest()
+                rng = random.Random(f"{self.seed}:{digest}:{self._attempts[digest]}")
+                self._attempts[digest] += 1
+            roll = rng.random()
+            latency = self.latency * math.exp(self.latency_sigma * rng.gauss(0, 1)) if self.latency else 0.0
+            if self.requests_per_minute is not None and len(self._recent) >= self.requests_per_minute:
+                self.stats["rate_limited"] += 1
+                raise openai.error.RateLimitError("Rate limit reached for requests (mock)", http_status=429)
+            if roll < self.rate_limit_rate:
+                self.stats["rate_limited"] += 1
+                raise openai.error.RateLimitError("Rate limit reached (mock)", http_status=429)
+            if roll < self.rate_limit_rate + self.error_rate:
+                self.stats["errors"] += 1
+                raise openai.error.ServiceUnavailableError("The server is overloaded (mock)", http_status=503)
+            self._recent.append(now)
+            return latency
+
+
+class MockLLMServer:
+    """Serves a MockBackend over a local OpenAI-compatible HTTP endpoint.
+
+    Lets the real client (OpenAIBackend with api_base=server.url) be load
+    tested without the network: POST {url}/chat/completions answers like
+    the OpenAI API, including server-sent-event streams and 429/503 errors.
+    """
+
+    def __init__(self, backend: MockBackend, host: str = "127.0.0.1", port: int = 0):
+        self.backend = backend
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "MockLLMServer":
+        """Serves requests on a background thread."""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        self._server.serve_forever()
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "MockLLMServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _handler(self):
+        backend = self.backend
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self._send_json(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+                    return
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                args = (
+                    request["messages"][-1]["content"],
+                    request.get("model", ""),
+                    request.get("max_tokens", 0),
+                    request.get("temperature", 1.0),
+                )
+                try:
+                    if request.get("stream"):
+                        deltas = backend.stream(*args)
+                    else:
+                        content = backend.complete(*args)
+                except openai.error.OpenAIError as e:
+                    self._send_json(e.http_status or 500, {"error": {"message": e.user_message, "type": "server_error"}})
+                    return
+                if request.get("stream"):
+                    self._send_stream(request.get("model", ""), deltas)
+                else:
+                    self._send_json(200, {
+                        "object": "chat.completion",
+                        "model": request.get("model", ""),
+                        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                    })
+
+            def _send_json(self, status: int, body: dict) -> None:
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _send_stream(self, model: str, deltas: Iterator[str]) -> None:
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                for delta in deltas:
+                    chunk = {"object": "chat.completion.chunk", "model": model,
+                             "choices": [{"index": 0, "delta": {"content": delta}, "finish_reason": None}]}
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.close_connection = True
+
+            def log_message(self, format, *args):
+                pass  # Keep test and benchmark output clean
+
+        return Handler
@@ -0,0 +1,193 @@
+import asyncio
+import logging
+import math
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from user_data.manifest import UserSpec
+from user_data.user_data import UserData
+from device_data.device_data import DeviceData
+
+from .config import Config
+from .everything import EVERYTHING
+from .llm_backend import RETRYABLE_ERRORS, LLMBackend, make_backend
+from .llm_cache import LLMCache
+from .llm_scheduler import LLMScheduler
+from .notifications import Notifier
+from .replay import DateRange, replay
+from .state_store import StateStore
+
+
+class UserRunResult(NamedTuple):
+    """Timings for one simulated user."""
+
+    name: str
+    wall_time: float  # seconds
+    ticks: int
+    llm_calls: int
+    error: Optional[str] = None
+    days: int = 1  # Days simulated
+
+
+class FleetReport:
+    """Per-user and aggregate results of a fleet run."""
+
+    def __init__(self, results: List[UserRunResult], wall_time: float):
+        self.results = results
+        self.wall_time = wall_time
+
+    @property
+    def ticks(self) -> int:
+        return sum(result.ticks for result in self.results)
+
+    @property
+    def llm_calls(self) -> int:
+        return sum(result.llm_calls for result in self.results)
+
+    @property
+    def days(self) -> int:
+        return sum(result.days for result in self.results)
+
+    def summary(self) -> Dict[str, Any]:
+        """Aggregate throughput over the whole run."""
+        wall = self.wall_time or float("inf")
+        return {
+            "users": len(self.results),
+            "failed_users": sum(1 for result in self.results if result.error),
+            "wall_time_s": self.wall_time,
+            "days": self.days,
+            "ticks": self.ticks,
+            "llm_calls": self.llm_calls,
+            "days_per_s": self.days / wall,
+            "ticks_per_s": self.ticks / wall,
+            "llm_calls_per_s": self.llm_calls / wall,
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"summary": self.summary(), "users": [result._asdict() for result in self.results]}
+
+    def format(self) -> str:
+        """Human-readable table of per-user and aggregate numbers."""
+        lines = [
+            f"{'user':<20} {'wall (s)':>9} {'days':>5} {'days/s':>8} {'ticks':>6} {'ticks/s':>9} {'LLM calls':>10} {'calls/s':>8}"
+        ]
+        for result in self.results:
+            wall = result.wall_time or float("inf")
+            lines.append(
+                f"{result.name:<20} {result.wall_time:>9.2f} {result.days:>5} {result.days / wall:>8.1f} "
+                f"{result.ticks:>6} {result.ticks / wall:>9.1f} "
+                f"{result.llm_calls:>10} {result.llm_calls / wall:>8.2f}" + (f"  ERROR: {result.error}" if result.error else "")
+            )
+        summary = self.summary()
+        lines.append(
+            f"{'TOTAL':<20} {summary['wall_time_s']:>9.2f} {summary['days']:>5} {summary['days_per_s']:>8.1f} "
+            f"{summary['ticks']:>6} {summary['ticks_per_s']:>9.1f} "
+            f"{summary['llm_calls']:>10} {summary['llm_calls_per_s']:>8.2f}"
+        )
+        return "\n".join(lines)
+
+
+async def simulate_user(
+    spec: UserSpec,
+    config: Config,
+    scheduler: LLMScheduler,
+    cache: Optional[LLMCache],
+    backend: Optional[LLMBackend] = None,
+    store: Optional[StateStore] = None,
+    notifier: Optional[Notifier] = None,
+    days: Optional[DateRange] = None,
+) -> UserRunResult:
+    """Simulates one user's day (or replays days) using the fleet's shared scheduler, cache, backend, state store and notifier."""
+    started = time.perf_counter()
+    ai = None
+    user = None
+    simulated = 0
+    try:
+        user = UserData(name=spec.name, data_dir=spec.data_dir)
+        ai = EVERYTHING(
+            user, DeviceData(user), config, cache=cache, scheduler=scheduler, backend=backend, store=store,
+            notifier=notifier,
+        )
+        if days is None:
+            await ai.simulate_day()
+            simulated = 1
+        else:
+            simulated = (await replay(ai, days)).days
+        error = None
+    except Exception as e:
+        # One user's failure should not take the rest of the fleet down
+        error = str(e)
+    if ai is not None:
+        await ai.close()  # Only closes what it did not get from the fleet
+    if user is not None:
+        user.close()
+    return UserRunResult(
+        spec.name,
+        time.perf_counter() - started,
+        ai.ticks if ai else 0,
+        ai.llm_calls if ai else 0,
+        error,
+        simulated,
+    )
+
+
+async def run_fleet(
+    specs: List[UserSpec], config: Config, max_in_flight: Optional[int] = None, days: Optional[DateRange] = None
+) -> FleetReport:
+    """Simulates all users concurrently on the running event loop.
+
+    All users share one scheduler, so max_in_flight (default
+    Config.LLM_MAX_CONCURRENCY) caps LLM calls across the whole fleet.
+    Each user simulates today, or replays days if given.
+    """
+    scheduler = LLMScheduler.from_config(
+        config, retry_on=RETRYABLE_ERRORS, max_concurrency=max_in_flight or config.LLM_MAX_CONCURRENCY
+    )
+    cache = LLMCache.from_config(config)  # Content-addressed, so safe to share between users
+    backend = make_backend(config)
+    store = StateStore.from_config(config)  # One pool per process; shards share the file (WAL)
+    notifier = Notifier.from_config(config, console=logging.getLogger(EVERYTHING.__module__))  # One writer thread
+    started = time.perf_counter()
+    try:
+        results = await asyncio.gather(
+            *(simulate_user(spec, config, scheduler, cache, backend, store, notifier, days) for spec in specs)
+        )
+    finally:
+        scheduler.close()
+        notifier.close()
+        if cache is not None:
+            cache.close()
+        if store is not None:
+            await store.close()
+    return FleetReport(list(results), time.perf_counter() - started)
+
+
+def _run_shard(
+    specs: List[UserSpec], config: Config, max_in_flight: int, days: Optional[DateRange]
+) -> List[UserRunResult]:
+    return asyncio.run(run_fleet(specs, config, max_in_flight, days)).results
+
+
+def run_fleet_sharded(
+    specs: List[UserSpec],
+    config: Config,
+    processes: int,
+    max_in_flight: Optional[int] = None,
+    days: Optional[DateRange] = None,
+) -> FleetReport:
+    """Splits users across a process pool, each shard running its own event loop.
+
+    This spreads the CPU-bound parts (event generation, prompt building)
+    over several cores. The global in-flight cap is divided evenly between
+    the shards.
+    """
+    processes = max(1, min(processes, len(specs)))
+    per_shard = max(1, math.ceil((max_in_flight or config.LLM_MAX_CONCURRENCY) / processes))
+    shards = [specs[i::processes] for i in range(processes)]
+
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        futures = [pool.submit(_run_shard, shard, config, per_shard, days) for shard in shards]
+        results = [result for future in futures for result in future.result()]
+    return FleetReport(results, time.perf_counter() - started)
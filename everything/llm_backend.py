@@ -0,0 +1,79 @@
+import abc
+import os
+from typing import Iterator, Optional
+
+import openai
+from dotenv import load_dotenv
+
+# Transient OpenAI failures that are worth retrying
+RETRYABLE_ERRORS = (
+    openai.error.RateLimitError,
+    openai.error.APIError,
+    openai.error.Timeout,
+    openai.error.APIConnectionError,
+    openai.error.ServiceUnavailableError,
+)
+
+
+class LLMBackend(abc.ABC):
+    """The model behind EVERYTHING.query_llm.
+
+    Both methods block; the scheduler runs them on its thread pool. Failures
+    are raised as openai.error exceptions whatever the backend, so retries
+    (RETRYABLE_ERRORS) and error handling work the same everywhere.
+    """
+
+    @abc.abstractmethod
+    def complete(self, prompt: str, model: str, max_tokens: int, temperature: float) -> str:
+        """Returns the whole answer to prompt."""
+
+    @abc.abstractmethod
+    def stream(self, prompt: str, model: str, max_tokens: int, temperature: float) -> Iterator[str]:
+        """Returns an iterator over the answer's text deltas."""
+
+
+class OpenAIBackend(LLMBackend):
+    """OpenAI chat completions. api_base points the client at another server (e.g. MockLLMServer)."""
+
+    def __init__(self, api_key: Optional[str], api_base: Optional[str] = None):
+        if not api_key:
+            raise ValueError("OpenAI API key not found in environment variables")
+        self.api_key = api_key  # Sent with each request rather than set on the openai module
+        self.api_base = api_base
+
+    def complete(self, prompt: str, model: str, max_tokens: int, temperature: float) -> str:
+        response = openai.ChatCompletion.create(**self._request(prompt, model, max_tokens, temperature))
+        return response.choices[0].message.content
+
+    def stream(self, prompt: str, model: str, max_tokens: int, temperature: float) -> Iterator[str]:
+        chunks = openai.ChatCompletion.create(stream=True, **self._request(prompt, model, max_tokens, temperature))
+        return (
+            chunk["choices"][0]["delta"]["content"]
+            for chunk in chunks
+            if chunk["choices"][0]["delta"].get("content")
+        )
+
+    def _request(self, prompt: str, model: str, max_tokens: int, temperature: float) -> dict:
+        request = dict(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=max_tokens,
+            n=1,
+            temperature=temperature,
+            api_key=self.api_key,
+        )
+        if self.api_base:
+            request["api_base"] = self.api_base
+        return request
+
+
+def make_backend(config) -> LLMBackend:
+    """Returns the backend for Config.LLM_BACKEND ("openai" or "mock")."""
+    if config.LLM_BACKEND == "openai":
+        load_dotenv()
+        return OpenAIBackend(os.getenv("OPENAI_API_KEY"), config.LLM_API_BASE)
+    if config.LLM_BACKEND == "mock":
+        from .fake_llm import MockBackend
+
+        return MockBackend.from_config(config)
+    raise ValueError(f"Unknown LLM backend: {config.LLM_BACKEND}")
@@ -0,0 +1,211 @@
+import hashlib
+import json
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from metrics.metrics import METRICS
+
+CACHE_LOOKUPS = METRICS.counter("llm_cache_lookups", "LLM cache lookups by result and answering tier", ("result", "tier"))
+_MISSES = CACHE_LOOKUPS.labels("miss", "none")
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Collapses whitespace so prompts that only differ in indentation share a key."""
+    return " ".join(prompt.split())
+
+
+def cache_key(model: str, temperature: float, max_tokens: int, prompt: str) -> str:
+    """Content address of a completion request."""
+    payload = json.dumps([model, temperature, max_tokens, normalize_prompt(prompt)])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class MemoryCacheTier:
+    """In-memory LRU tier with per-entry expiry."""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self.lookup(key)
+        return entry[0] if entry is not None else None
+
+    def lookup(self, key: str) -> Optional[Tuple[str, float]]:
+        """(value, expiry time) of a live entry."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)  # Mark as most recently used
+        return value, expires_at
+
+    def set(self, key: str, value: str, ttl: float) -> None:
+        self._entries[key] = (time.time() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)  # Drop the least recently used entry
+            self.evictions += 1
+
+    def close(self) -> None:
+        pass
+
+
+class SQLiteCacheTier:
+    """On-disk tier backed by SQLite, so cached completions survive reruns.
+
+    The entry count is tracked as entries are written, so sets do not count
+    the table; it is only recounted when it looks full (other processes may
+    share the file). Hits do not write: their access times are kept in
+    memory and written with the next set, every touch_batch hits, or on
+    close.
+    """
+
+    def __init__(self, path: str, max_entries: int = 100_000, touch_batch: int = 256):
+        self.max_entries = max_entries
+        self.touch_batch = touch_batch
+        self.evictions = 0
+        self._touched: Dict[str, float] = {}  # key -> access time not yet written
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_accessed ON llm_cache (accessed_at)")
+        self._conn.commit()
+        self._count = len(self)
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self.lookup(key)
+        return entry[0] if entry is not None else None
+
+    def lookup(self, key: str) -> Optional[Tuple[str, float]]:
+        """(value, expiry time) of a live entry."""
+        now = time.time()
+        row = self._conn.execute(
+            "SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        value, expires_at = row
+        if expires_at < now:
+            self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            self._conn.commit()
+            self._count -= 1
+            return None
+        self._touched[key] = now
+        if len(self._touched) >= self.touch_batch:
+            self._write_touches()
+            self._conn.commit()
+        return value, expires_at
+
+    def _write_touches(self) -> None:
+        """Writes the pending access times (without committing); eviction relies on them."""
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE llm_cache SET accessed_at = ? WHERE key = ?",
+                [(accessed_at, key) for key, accessed_at in self._touched.items()],
+            )
+            self._touched.clear()
+
+    def set(self, key: str, value: str, ttl: float) -> None:
+        now = time.time()
+        self._touched.pop(key, None)  # Rewritten below
+        self._write_touches()
+        exists = self._conn.execute("SELECT 1 FROM llm_cache WHERE key = ?", (key,)).fetchone() is not None
+        self._conn.execute(
+            "INSERT OR REPLACE INTO llm_cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+            (key, value, now + ttl, now),
+        )
+        if not exists:
+            self._count += 1
+        if self._count > self.max_entries:
+            self._count = len(self)
+            overflow = self._count - self.max_entries
+            if overflow > 0:
+                # Expired entries go first, then the least recently used ones
+                self._conn.execute(
+                    "DELETE FROM llm_cache WHERE key IN ("
+                    "SELECT key FROM llm_cache ORDER BY expires_at < ? DESC, accessed_at ASC LIMIT ?)",
+                    (now, overflow),
+                )
+                self.evictions += overflow
+                self._count = self.max_entries
+        self._conn.commit()
+
+    def close(self) -> None:
+        self._write_touches()
+        self._conn.commit()
+        self._conn.close()
+
+
+class LLMCache:
+    """Content-addressed cache for LLM completions.
+
+    Lookups go through the tiers in order (memory first); a hit in a slower
+    tier is promoted into the faster ones for the rest of its lifetime.
+    Completions sampled at a temperature above 0 are replayed as they were
+    first drawn, so the cache is off by default (Config.LLM_CACHE_ENABLED).
+    """
+
+    def __init__(self, tiers: List, ttl: float = 24 * 3600):
+        self.tiers = tiers
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_config(cls, config) -> Optional["LLMCache"]:
+        """Builds the cache described by Config, or None if caching is disabled."""
+        if not config.LLM_CACHE_ENABLED:
+            return None
+        tiers = [MemoryCacheTier(config.LLM_CACHE_MAX_ENTRIES)]
+        if config.LLM_CACHE_PATH:
+            tiers.append(SQLiteCacheTier(config.LLM_CACHE_PATH, config.LLM_CACHE_DISK_MAX_ENTRIES))
+        return cls(tiers, ttl=config.LLM_CACHE_TTL)
+
+    def get(self, key: str) -> Optional[str]:
+        for i, tier in enumerate(self.tiers):
+            entry = tier.lookup(key)
+            if entry is not None:
+                value, expires_at = entry
+                for faster in self.tiers[:i]:
+                    faster.set(key, value, expires_at - time.time())
+                self.hits += 1
+                CACHE_LOOKUPS.labels("hit", type(tier).__name__).inc()
+                return value
+        self.misses += 1
+        _MISSES.inc()
+        return None
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        for tier in self.tiers:
+            tier.set(key, value, self.ttl if ttl is None else ttl)
+
+    def close(self) -> None:
+        """Closes the tiers (the SQLite connection of the disk tier)."""
+        for tier in self.tiers:
+            tier.close()
+
+    def stats(self) -> Dict[str, float]:
+        """Hit/miss counters and the hit rate so far."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": sum(tier.evictions for tier in self.tiers),
+        }
@@ -0,0 +1,317 @@
+import asyncio
+import heapq
+import itertools
+import random
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from enum import IntEnum
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple, Type, Union
+
+from metrics.metrics import METRICS
+
+_DONE = object()  # End-of-stream marker
+
+RETRIES = METRICS.counter("llm_retries", "LLM calls retried after a transient error", ("call_type",))
+TIMEOUTS = METRICS.counter("llm_timeouts", "LLM call attempts that timed out", ("call_type",))
+QUEUE_WAIT = METRICS.histogram("llm_queue_wait_seconds", "Time LLM calls wait for a concurrency slot")
+IN_FLIGHT = METRICS.gauge("llm_in_flight", "LLM calls currently holding a concurrency slot")
+ABANDONED = METRICS.gauge("llm_abandoned", "Timed-out blocking LLM calls still running on their thread")
+
+
+class Priority(IntEnum):
+    """Scheduling lanes; lower values are served first."""
+
+    URGENT = 0  # Event handling the user is waiting on
+    NORMAL = 1  # Greeting, tasks
+    BACKGROUND = 2  # Recommendations
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for English text)."""
+    return len(text) // 4 + 1
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at rate_per_minute.
+
+    Waiters are served in priority order (lower values first, FIFO within a
+    priority): only the first in line takes tokens.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate = rate_per_minute / 60.0  # tokens per second
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._waiters: List[Tuple[int, int, asyncio.Event]] = []
+        self._sequence = itertools.count()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, amount: float = 1, priority: int = 0) -> None:
+        """Waits until amount tokens are available and it is first in line, and takes them."""
+        # A request larger than the bucket can never fit; let it through on a full bucket
+        amount = min(amount, self.capacity)
+        entry = (priority, next(self._sequence), asyncio.Event())
+        heapq.heappush(self._waiters, entry)
+        try:
+            while True:
+                if self._waiters[0] is not entry:
+                    entry[2].clear()
+                    await entry[2].wait()  # Set when entry gets to the front
+                    continue
+                self._refill()
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return
+                # A more urgent caller arriving meanwhile goes first
+                await asyncio.sleep((amount - self._tokens) / self.rate)
+        finally:
+            self._waiters.remove(entry)
+            heapq.heapify(self._waiters)
+            if self._waiters:
+                self._waiters[0][2].set()
+
+
+class LLMScheduler:
+    """Bounded, rate-limited, priority-aware runner for LLM calls.
+
+    Each call first takes from the requests-per-minute and tokens-per-minute
+    buckets, then waits for one of max_concurrency slots; both queues are
+    served in priority order (FIFO within a lane). Calls are bounded by a
+    timeout and retried with exponential backoff and full jitter when they
+    raise one of the retry_on exceptions.
+
+    A blocking call that times out cannot be interrupted: it keeps its slot
+    (and pool thread) until it returns, which bounds the threads left behind
+    by hung requests to max_concurrency, and means an admitted call never
+    queues for a thread, so its timeout only covers the request itself.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 8,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        timeout: Optional[float] = 30.0,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 20.0,
+        retry_on: Tuple[Type[BaseException], ...] = (asyncio.TimeoutError,),
+    ):
+        self.max_concurrency = max_concurrency
+        self.request_bucket = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_on = retry_on
+
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="llm")
+        self._active = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self.stats: Dict[str, int] = {
+            "submitted": 0, "completed": 0, "retries": 0, "timeouts": 0, "failures": 0, "abandoned": 0,
+        }
+
+    @classmethod
+    def from_config(
+        cls, config, retry_on: Tuple[Type[BaseException], ...] = (), **overrides: Any
+    ) -> "LLMScheduler":
+        """Builds a scheduler from the LLM_* settings in Config; keyword overrides win."""
+        params = dict(
+            max_concurrency=config.LLM_MAX_CONCURRENCY,
+            requests_per_minute=config.LLM_REQUESTS_PER_MINUTE,
+            tokens_per_minute=config.LLM_TOKENS_PER_MINUTE,
+            timeout=config.LLM_REQUEST_TIMEOUT,
+            max_retries=config.LLM_MAX_RETRIES,
+            backoff_base=config.LLM_BACKOFF_BASE,
+            backoff_max=config.LLM_BACKOFF_MAX,
+            retry_on=(asyncio.TimeoutError,) + tuple(retry_on),
+        )
+        params.update(overrides)
+        return cls(**params)
+
+    async def submit(
+        self,
+        call: Union[Callable[[], Any], Callable[[], Awaitable[Any]]],
+        priority: Priority = Priority.NORMAL,
+        tokens: int = 0,
+        call_type: str = "other",
+    ) -> Any:
+        """Runs call under the scheduler's limits and returns its result.
+
+        call is either a coroutine function or a blocking function, which is
+        run on the scheduler's own thread pool. tokens is the estimated
+        prompt + completion size charged against the tokens-per-minute bucket;
+        call_type labels the retry and timeout metrics.
+        """
+        self.stats["submitted"] += 1
+        attempt = 0
+        while True:
+            await self._take_rate_limits(tokens, priority)
+            slot = await self._acquire(priority)
+            try:
+                result = await self._run(call, slot)
+                self.stats["completed"] += 1
+                return result
+            except self.retry_on as e:
+                if isinstance(e, asyncio.TimeoutError):
+                    self.stats["timeouts"] += 1
+                    TIMEOUTS.labels(call_type).inc()
+                if attempt >= self.max_retries:
+                    self.stats["failures"] += 1
+                    raise
+            except Exception:
+                self.stats["failures"] += 1
+                raise
+            finally:
+                self._release(slot)
+            # Back off outside the slot so other calls can use it meanwhile
+            self.stats["retries"] += 1
+            RETRIES.labels(call_type).inc()
+            await asyncio.sleep(self.backoff_delay(attempt))
+            attempt += 1
+
+    async def stream(
+        self,
+        open_call: Union[Callable[[], Any], Callable[[], Awaitable[Any]]],
+        priority: Priority = Priority.NORMAL,
+        tokens: int = 0,
+        call_type: str = "other",
+    ) -> AsyncIterator[Any]:
+        """Runs a streaming call under the scheduler's limits and yields its items.
+
+        open_call returns an iterator (a blocking one is advanced on the
+        thread pool) or an async iterator. The slot is held until the stream
+        ends. Failures up to and including the first item are retried like
+        submit; the timeout applies to opening the stream and to each item.
+        """
+        self.stats["submitted"] += 1
+        attempt = 0
+        while True:
+            await self._take_rate_limits(tokens, priority)
+            slot = await self._acquire(priority)
+            held = True
+            try:
+                try:
+                    iterator = await self._run(open_call, slot)
+                    item = await self._next(iterator, slot)
+                except self.retry_on as e:
+                    if isinstance(e, asyncio.TimeoutError):
+                        self.stats["timeouts"] += 1
+                        TIMEOUTS.labels(call_type).inc()
+                    if attempt >= self.max_retries:
+                        raise
+                    self._release(slot)
+                    held = False
+                    self.stats["retries"] += 1
+                    RETRIES.labels(call_type).inc()
+                    await asyncio.sleep(self.backoff_delay(attempt))
+                    attempt += 1
+                    continue
+                while item is not _DONE:
+                    yield item
+                    item = await self._next(iterator, slot)
+                self.stats["completed"] += 1
+                return
+            except Exception:
+                self.stats["failures"] += 1
+                raise
+            finally:
+                if held:
+                    self._release(slot)
+
+    def backoff_delay(self, attempt: int) -> float:
+        """Exponential backoff with full jitter."""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def close(self) -> None:
+        """Shuts down the worker threads."""
+        self._executor.shutdown(wait=False)
+
+    async def _run(self, call, slot: "_Slot") -> Any:
+        """Runs call in slot, bounded by the timeout; a blocking call runs on the pool."""
+        if asyncio.iscoroutinefunction(call):
+            return await asyncio.wait_for(call(), self.timeout)
+        slot.running = self._executor.submit(call)
+        return await asyncio.wait_for(asyncio.wrap_future(slot.running), self.timeout)
+
+    async def _take_rate_limits(self, tokens: int, priority: Priority) -> None:
+        if self.request_bucket is not None:
+            await self.request_bucket.acquire(1, int(priority))
+        if self.token_bucket is not None and tokens:
+            await self.token_bucket.acquire(tokens, int(priority))
+
+    async def _next(self, iterator, slot: "_Slot") -> Any:
+        """Next item of a sync or async iterator (or _DONE), bounded by the timeout."""
+        if hasattr(iterator, "__anext__"):
+            try:
+                return await asyncio.wait_for(iterator.__anext__(), self.timeout)
+            except StopAsyncIteration:
+                return _DONE
+        slot.running = self._executor.submit(next, iterator, _DONE)
+        return await asyncio.wait_for(asyncio.wrap_future(slot.running), self.timeout)
+
+    async def _acquire(self, priority: Priority) -> "_Slot":
+        # A free slot implies no live waiters: _hand_over gives slots to waiters first
+        if self._active < self.max_concurrency:
+            self._active += 1
+            IN_FLIGHT.inc()
+            QUEUE_WAIT.observe(0.0)
+            return _Slot()
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (int(priority), next(self._sequence), waiter))
+        try:
+            with QUEUE_WAIT.time():
+                await waiter  # The slot is handed over by _hand_over
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self._hand_over()  # Slot was granted just before cancellation
+            raise
+        return _Slot()
+
+    def _release(self, slot: "_Slot") -> None:
+        """Frees slot, or, while its blocking call still runs after a timeout, once that call returns."""
+        running = slot.running
+        if running is None or running.done():
+            self._hand_over()
+            return
+        self.stats["abandoned"] += 1
+        ABANDONED.inc()
+        loop = asyncio.get_running_loop()
+
+        def finished(_: Future) -> None:
+            try:
+                loop.call_soon_threadsafe(self._release_abandoned)
+            except RuntimeError:
+                pass  # The loop is closed; nothing is waiting for the slot
+
+        running.add_done_callback(finished)
+
+    def _release_abandoned(self) -> None:
+        ABANDONED.dec()
+        self._hand_over()
+
+    def _hand_over(self) -> None:
+        while self._waiters:
+            _, _, waiter = heapq.heappop(self._waiters)
+            if not waiter.done():
+                waiter.set_result(None)  # Hand the slot straight to the next waiter
+                return
+        self._active -= 1
+        IN_FLIGHT.dec()
+
+
+class _Slot:
+    """A concurrency slot and the blocking call (if any) running in it."""
+
+    __slots__ = ("running",)
+
+    def __init__(self):
+        self.running: Optional[Future] = None
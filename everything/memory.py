@@ -0,0 +1,251 @@
+import json
+import os
+import re
+import zlib
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from user_data.timestamps import to_seconds
+from metrics.metrics import METRICS
+
+from .classifier import Recommendation
+
+MEMORY_OUTCOMES = METRICS.counter(
+    "recommendation_memory", "Recommendations by memory outcome (new, repeated, suppressed, recalled)", ("outcome",)
+)
+
+RECALL_CANDIDATES = 8  # Matching contexts considered by recall()
+
+_WORD = re.compile(r"[a-z0-9']+")
+
+
+def embed(text: str, dim: int = 512) -> np.ndarray:
+    """Unit-length hashed vector of the words and character trigrams of text.
+
+    Features are hashed with crc32 (stable across processes, unlike hash())
+    into dim signed buckets, so saved vectors stay comparable between runs.
+    Near-identical wordings get a cosine similarity close to 1.
+    """
+    words = _WORD.findall(text.lower())
+    features = list(words)
+    for word in words:
+        padded = f" {word} "
+        features.extend(padded[i : i + 3] for i in range(len(padded) - 2))
+    vector = np.zeros(dim, dtype=np.float32)
+    if not features:
+        return vector
+    codes = np.fromiter((zlib.crc32(feature.encode("utf-8")) for feature in features), np.uint64, len(features))
+    # The low bit picks the sign, so colliding features tend to cancel out
+    np.add.at(vector, (codes >> 1) % dim, np.where(codes & 1, 1.0, -1.0).astype(np.float32))
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class VectorIndex:
+    """Approximate nearest-neighbour index over unit vectors, in fixed slots.
+
+    Random-hyperplane LSH: each of `tables` hash tables buckets a vector by
+    the signs of its projections on `bits` hyperplanes. A search collects
+    the vectors sharing a bucket with the query in any table and ranks them
+    by exact cosine similarity. With the defaults, a neighbour at similarity
+    0.8 is found with ~97% probability. The caller picks the slot (row) of
+    each vector, so several indexes can share row numbers.
+    """
+
+    def __init__(self, dim: int, capacity: int, tables: int = 12, bits: int = 6, seed: int = 0):
+        self.tables = tables
+        self.bits = bits
+        self.planes = np.random.default_rng(seed).standard_normal((tables * bits, dim)).astype(np.float32)
+        self.vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self.used = np.zeros(capacity, dtype=bool)
+        self._weights = 1 << np.arange(bits)
+        self._keys = np.zeros((capacity, tables), dtype=np.int64)
+        self._buckets: List[Dict[int, Set[int]]] = [{} for _ in range(tables)]
+
+    def __len__(self) -> int:
+        return int(self.used.sum())
+
+    def _hash(self, vectors: np.ndarray) -> np.ndarray:
+        """Bucket key per table for each row of vectors."""
+        signs = (vectors @ self.planes.T > 0).reshape(len(vectors), self.tables, self.bits)
+        return signs @ self._weights
+
+    def set(self, row: int, vector: np.ndarray) -> None:
+        if self.used[row]:
+            self.remove(row)
+        self.vectors[row] = vector
+        self.used[row] = True
+        self._keys[row] = self._hash(vector[None])[0]
+        for table, key in zip(self._buckets, self._keys[row].tolist()):
+            table.setdefault(key, set()).add(row)
+
+    def remove(self, row: int) -> None:
+        if not self.used[row]:
+            return
+        for table, key in zip(self._buckets, self._keys[row].tolist()):
+            bucket = table[key]
+            bucket.discard(row)
+            if not bucket:
+                del table[key]
+        self.used[row] = False
+
+    def search(self, vector: np.ndarray, k: int = 1, min_similarity: float = -1.0) -> List[Tuple[int, float]]:
+        """Up to k (row, similarity) pairs, most similar first."""
+        candidates: Set[int] = set()
+        for table, key in zip(self._buckets, self._hash(vector[None])[0].tolist()):
+            candidates.update(table.get(key, ()))
+        if not candidates:
+            return []
+        rows = np.fromiter(candidates, np.int64, len(candidates))
+        similarities = self.vectors[rows] @ vector
+        best = np.argsort(-similarities)[:k]
+        return [(int(rows[i]), float(similarities[i])) for i in best if similarities[i] >= min_similarity]
+
+
+class RecommendationMemory:
+    """Bounded memory of the recommendations a user has been shown.
+
+    Each entry keeps the recommendation, the context it was made for (see
+    EVERYTHING._recommendation_context) and when it was last shown, with the
+    text and the context indexed separately. remember() turns a candidate
+    that is at least `similarity` alike to one shown in the last
+    repeat_hours into a suppressed repeat; recall() finds an earlier
+    recommendation for a matching context so it can be reused without
+    asking the LLM, as long as it would not be suppressed and has been
+    shown fewer than reuse_limit times. When full, the least recently shown
+    entry is evicted.
+    """
+
+    def __init__(
+        self,
+        capacity: int = 256,
+        similarity: float = 0.8,
+        repeat_hours: float = 12.0,
+        dim: int = 512,
+        seed: int = 0,
+        reuse_limit: int = 3,
+    ):
+        self.capacity = capacity
+        self.reuse_limit = reuse_limit
+        self.similarity = similarity
+        self.repeat_seconds = repeat_hours * 3600
+        self.dim = dim
+        self.texts = VectorIndex(dim, capacity, seed=seed)
+        self.contexts = VectorIndex(dim, capacity, seed=seed + 1)
+        self.recommendations: List[Optional[Recommendation]] = [None] * capacity
+        self.last_shown = np.zeros(capacity, dtype=np.float64)  # Naive epoch seconds (simulated time)
+        self.shown = np.zeros(capacity, dtype=np.int64)
+        self.stats: Dict[str, int] = {"new": 0, "repeated": 0, "suppressed": 0, "recalled": 0, "evictions": 0}
+
+    @classmethod
+    def from_config(cls, config) -> "RecommendationMemory":
+        return cls(
+            capacity=config.RECOMMENDATION_MEMORY_SIZE,
+            similarity=config.RECOMMENDATION_SIMILARITY,
+            repeat_hours=config.RECOMMENDATION_REPEAT_HOURS,
+            reuse_limit=config.RECOMMENDATION_REUSE_LIMIT,
+        )
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def recall(self, context: str, when: datetime) -> Optional[Recommendation]:
+        """A recommendation made for a context like this one that can be shown again at when, if any.
+
+        Entries shown within repeat_hours of when are skipped (remember()
+        would suppress them), and so are entries already shown reuse_limit
+        times, so a context does not get the same text forever.
+        """
+        now = to_seconds(when)
+        for row, _ in self.contexts.search(embed(context, self.dim), RECALL_CANDIDATES, self.similarity):
+            if abs(now - self.last_shown[row]) >= self.repeat_seconds and self.shown[row] < self.reuse_limit:
+                self.stats["recalled"] += 1
+                MEMORY_OUTCOMES.labels("recalled").inc()
+                return self.recommendations[row]
+        return None
+
+    def remember(self, recommendation: Recommendation, context: str, when: datetime) -> bool:
+        """Records recommendation as shown at when.
+
+        Returns False, recording nothing, if it repeats one shown within
+        repeat_hours of when; the caller should not show it. A repeat of an
+        older one refreshes that entry instead of storing a near-copy.
+        """
+        vector = embed(recommendation.text, self.dim)
+        now = to_seconds(when)
+        match = self.texts.search(vector, 1, self.similarity)
+        if match:
+            row = match[0][0]
+            if abs(now - self.last_shown[row]) < self.repeat_seconds:
+                self.stats["suppressed"] += 1
+                MEMORY_OUTCOMES.labels("suppressed").inc()
+                return False
+            outcome = "repeated"
+        else:
+            row = self._free_row()
+            self.texts.set(row, vector)
+            self.recommendations[row] = recommendation
+            self.shown[row] = 0
+            outcome = "new"
+        self.contexts.set(row, embed(context, self.dim))
+        self.last_shown[row] = now
+        self.shown[row] += 1
+        self.stats[outcome] += 1
+        MEMORY_OUTCOMES.labels(outcome).inc()
+        return True
+
+    def recent(self, n: int, since: Optional[datetime] = None) -> List[Recommendation]:
+        """The n most recently shown recommendations (only those shown at or after since), newest last."""
+        rows = np.flatnonzero(self.texts.used)
+        if since is not None:
+            rows = rows[self.last_shown[rows] >= to_seconds(since)]
+        rows = rows[np.argsort(self.last_shown[rows], kind="stable")][-n:] if n > 0 else rows[:0]
+        return [self.recommendations[row] for row in rows.tolist()]
+
+    def _free_row(self) -> int:
+        free = np.flatnonzero(~self.texts.used)
+        if len(free):
+            return int(free[0])
+        row = int(np.argmin(self.last_shown))  # Least recently shown
+        self.texts.remove(row)
+        self.contexts.remove(row)
+        self.stats["evictions"] += 1
+        return row
+
+    def save(self, path: str) -> None:
+        """Writes the entries to path (an .npz file), atomically."""
+        rows = np.flatnonzero(self.texts.used)
+        rows = rows[np.argsort(self.last_shown[rows], kind="stable")]
+        recommendations = [list(self.recommendations[row]) for row in rows.tolist()]
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            np.savez(
+                f,
+                dim=np.array(self.dim),
+                texts=self.texts.vectors[rows],
+                contexts=self.contexts.vectors[rows],
+                last_shown=self.last_shown[rows],
+                shown=self.shown[rows],
+                recommendations=np.array(json.dumps(recommendations)),
+            )
+        os.replace(tmp, path)
+
+    def load(self, path: str) -> None:
+        """Adds the entries saved at path; the most recently shown win if they do not all fit."""
+        with np.load(path, allow_pickle=False) as saved:
+            recommendations = json.loads(str(saved["recommendations"]))
+            same_dim = int(saved["dim"]) == self.dim
+            texts, contexts = saved["texts"], saved["contexts"]
+            last_shown, shown = saved["last_shown"], saved["shown"]
+        start = max(0, len(recommendations) - self.capacity)
+        for i in range(start, len(recommendations)):
+            recommendation = Recommendation(*recommendations[i])
+            row = self._free_row()
+            # Vectors from a memory with another dimension are recomputed (the context text is not kept)
+            self.texts.set(row, texts[i] if same_dim else embed(recommendation.text, self.dim))
+            self.contexts.set(row, contexts[i] if same_dim else np.zeros(self.dim, dtype=np.float32))
+            self.recommendations[row] = recommendation
+            self.last_shown[row] = last_shown[i]
+            self.shown[row] = shown[i]
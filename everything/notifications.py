@@ -0,0 +1,256 @@
+import abc
+import asyncio
+import json
+import logging
+import queue
+import threading
+import time
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence
+
+from metrics.metrics import METRICS
+
+NOTIFICATIONS = METRICS.counter("notifications", "Notifications emitted, by kind", ("kind",))
+DROPPED = METRICS.counter("notifications_dropped", "Notifications dropped because the queue was full", ("kind",))
+BATCH_SIZE = METRICS.histogram("notification_batch_size", "Notifications written per batch", buckets=(1, 5, 10, 50, 100, 500))
+
+DROP_POLICIES = ("block", "drop_oldest", "drop_newest")
+
+# Queue markers: write what has been collected now / and then stop the writer
+_FLUSH = object()
+_STOP = object()
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=4096)
+def clock_label(timestamp: datetime) -> str:
+    """"07:30 AM" for timestamp; a simulated day only has a few dozen distinct ones."""
+    return timestamp.strftime("%I:%M %p")
+
+
+class Notification:
+    """One notification: who it is for, when (simulated time), what kind, and its fields.
+
+    The text is template.format(user=..., **payload). It is rendered on
+    first use, so with lazy formatting the cost moves to the writer thread
+    and is skipped entirely when no sink needs the text. Templates are
+    constants; anything generated (LLM answers, event titles) goes in the
+    payload, so braces in it are never interpreted.
+    """
+
+    __slots__ = ("user", "timestamp", "kind", "template", "payload", "section", "_text")
+
+    def __init__(
+        self,
+        user: str,
+        timestamp: datetime,
+        kind: str,
+        template: str,
+        payload: Optional[Dict[str, Any]] = None,
+        section: bool = False,
+    ):
+        self.user = user
+        self.timestamp = timestamp
+        self.kind = kind
+        self.template = template
+        self.payload = payload or {}
+        self.section = section  # Starts a new block in human-readable output
+        self._text: Optional[str] = None
+
+    @property
+    def text(self) -> str:
+        return self._text if self._text is not None else self.render()
+
+    def render(self) -> str:
+        self._text = self.template.format(user=self.user, time=clock_label(self.timestamp), **self.payload)
+        return self._text
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "user": self.user,
+            "timestamp": self.timestamp.isoformat(),
+            "kind": self.kind,
+            "payload": self.payload,
+            "text": self.text,
+        }
+
+
+class NotificationSink(abc.ABC):
+    """Destination for notifications; write() is called from the writer thread with a batch."""
+
+    @abc.abstractmethod
+    def write(self, batch: Sequence[Notification]) -> None:
+        """Delivers a batch of notifications."""
+
+    def close(self) -> None:
+        pass
+
+
+class ConsoleSink(NotificationSink):
+    """The human-readable "[07:30 AM] [NOTIFICATION] ..." lines, through a logger at INFO."""
+
+    LABELS = {"brain": "AI's Brain", "calendar": "Event added"}
+
+    def __init__(self, logger: logging.Logger):
+        self.logger = logger
+
+    def write(self, batch: Sequence[Notification]) -> None:
+        if not self.logger.isEnabledFor(logging.INFO):
+            return  # Nothing is formatted for a console nobody sees
+        for record in batch:
+            label = self.LABELS.get(record.kind, "NOTIFICATION")
+            prefix = "\n" if record.section else ""
+            self.logger.info(f"{prefix}[{clock_label(record.timestamp)}] [{label}] {record.text}")
+
+
+class JSONLinesSink(NotificationSink):
+    """Appends one JSON object per notification to path, one write per batch."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8")
+
+    def write(self, batch: Sequence[Notification]) -> None:
+        self._file.write("".join(json.dumps(record.to_dict()) + "\n" for record in batch))
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class Notifier:
+    """Delivers notifications to sinks without blocking the event loop on I/O.
+
+    emit() puts a record on a bounded queue; a background thread takes them
+    off in batches of up to batch_size (waiting at most flush_interval for
+    a batch to fill) and hands each batch to every sink. When the queue is
+    full, drop_policy decides: "drop_oldest" discards the oldest queued
+    record, "drop_newest" the new one; either way emit() never waits.
+    "block" waits for room, so nothing is lost, but it blocks the calling
+    thread: on an event loop that stalls every other task, so it is only
+    for callers that do not run on one. With lazy=False, text is rendered
+    in emit() instead of in the writer thread.
+    """
+
+    def __init__(
+        self,
+        sinks: List[NotificationSink],
+        max_queue: int = 10_000,
+        batch_size: int = 256,
+        flush_interval: float = 0.05,
+        drop_policy: str = "drop_oldest",
+        lazy: bool = True,
+    ):
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f"Unknown drop policy: {drop_policy}")
+        self.sinks = sinks
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.drop_policy = drop_policy
+        self.lazy = lazy
+        self.dropped = 0
+        self._queue: "queue.Queue[Any]" = queue.Queue(max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config, console: logging.Logger) -> "Notifier":
+        sinks: List[NotificationSink] = [ConsoleSink(console)]
+        if config.NOTIFICATION_PATH:
+            sinks.append(JSONLinesSink(config.NOTIFICATION_PATH))
+        return cls(
+            sinks,
+            max_queue=config.NOTIFICATION_QUEUE_SIZE,
+            batch_size=config.NOTIFICATION_BATCH_SIZE,
+            drop_policy=config.NOTIFICATION_DROP_POLICY,
+            lazy=config.NOTIFICATION_LAZY_FORMAT,
+        )
+
+    def emit(self, record: Notification) -> None:
+        NOTIFICATIONS.labels(record.kind).inc()
+        if not self.lazy:
+            record.render()
+        if self._thread is None:
+            self._start()
+        if self.drop_policy == "block":
+            self._queue.put(record)
+            return
+        try:
+            self._queue.put_nowait(record)
+            return
+        except queue.Full:
+            pass
+        if self.drop_policy == "drop_oldest":
+            try:
+                oldest = self._queue.get_nowait()
+                self._queue.task_done()
+                if isinstance(oldest, Notification):
+                    self._dropped(oldest)
+            except queue.Empty:
+                pass
+            try:
+                self._queue.put_nowait(record)
+                return
+            except queue.Full:
+                pass
+        self._dropped(record)
+
+    def _dropped(self, record: Notification) -> None:
+        self.dropped += 1
+        DROPPED.labels(record.kind).inc()
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="notifier", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while batch[-1] is not _FLUSH and batch[-1] is not _STOP and len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                try:
+                    batch.append(self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stopping = batch[-1] is _STOP
+            records = [record for record in batch if isinstance(record, Notification)]
+            if records:
+                BATCH_SIZE.observe(len(records))
+                for sink in self.sinks:
+                    try:
+                        sink.write(records)
+                    except Exception:
+                        logger.exception(f"Notification sink {type(sink).__name__} failed")
+            for _ in batch:
+                self._queue.task_done()
+            if stopping:
+                return
+
+    def _request_flush(self) -> bool:
+        """Asks the writer not to wait for the current batch to fill; False if there is nothing to wait for."""
+        if self._thread is None or not self._queue.unfinished_tasks:
+            return False
+        try:
+            self._queue.put_nowait(_FLUSH)
+        except queue.Full:
+            pass  # A full queue is written without waiting anyway
+        return True
+
+    async def flush(self) -> None:
+        """Waits (without blocking the event loop) until everything emitted so far is written."""
+        if self._request_flush():
+            await asyncio.get_running_loop().run_in_executor(None, self._queue.join)
+
+    def close(self) -> None:
+        """Writes what is queued, stops the writer thread and closes the sinks."""
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join()
+            self._thread = None
+        for sink in self.sinks:
+            sink.close()
@@ -0,0 +1,78 @@
+import json
+from datetime import datetime
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from .classifier import Recommendation, recommendation_from_dict
+
+
+class SlotState(NamedTuple):
+    """What the user's context looks like at a recommendation slot."""
+
+    location: str
+    upcoming: Tuple[Tuple[datetime, str], ...]  # (start, title) of events in the lookahead window
+
+
+class PlannedRecommendation(NamedTuple):
+    """A recommendation generated ahead of time for one slot."""
+
+    time: datetime
+    recommendation: Recommendation
+    assumed: SlotState  # Context the plan was made for
+
+
+class DayPlan:
+    """Recommendations for all of a day's slots, generated in one LLM call.
+
+    Each entry remembers the SlotState it was planned for; when the live
+    state differs at release time, the entry is stale and the caller should
+    fall back to a fresh per-slot recommendation.
+    """
+
+    def __init__(self, entries: Iterable[PlannedRecommendation] = ()):
+        self._entries: Dict[datetime, PlannedRecommendation] = {entry.time: entry for entry in entries}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, slot: datetime) -> bool:
+        return slot in self._entries
+
+    def release(self, slot: datetime, state: SlotState) -> Optional[PlannedRecommendation]:
+        """Returns the planned entry for slot if it is still valid for state, or None.
+
+        An entry is released at most once.
+        """
+        entry = self._entries.pop(slot, None)
+        if entry is None or entry.assumed != state:
+            return None
+        return entry
+
+
+def parse_day_plan(response: str, states: Dict[datetime, SlotState]) -> DayPlan:
+    """Builds a DayPlan from the model's JSON answer.
+
+    The answer should be a list of {"time": "HH:MM", "recommendation": ...,
+    "classification": ...} objects, optionally with "suggested_time" and
+    "duration_hours"; anything outside the outermost brackets is ignored.
+    Entries for unknown slots or with invalid fields are dropped, so those
+    slots fall back to per-slot generation.
+    """
+    start, end = response.find("["), response.rfind("]")
+    if start == -1 or end < start:
+        return DayPlan()
+    try:
+        items = json.loads(response[start : end + 1])
+    except ValueError:
+        return DayPlan()
+
+    by_clock = {slot.strftime("%H:%M"): slot for slot in states}
+    entries: List[PlannedRecommendation] = []
+    for item in items if isinstance(items, list) else []:
+        if not isinstance(item, dict):
+            continue
+        slot = by_clock.get(str(item.get("time", "")).strip())
+        recommendation = recommendation_from_dict(item)
+        if slot is None or recommendation is None:
+            continue
+        entries.append(PlannedRecommendation(slot, recommendation, states[slot]))
+    return DayPlan(entries)
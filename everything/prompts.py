@@ -0,0 +1,219 @@
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from user_data.user_data import UserData
+
+from .llm_scheduler import estimate_tokens
+
+# Data each prompt type needs, most important first. Paths are dotted keys
+# into the source ("profile", "social_media" or "spotify"); "*" in a path
+# maps over a list. When a prompt is over budget, fields are dropped from
+# the end of its list.
+PROJECTIONS: Dict[str, List[Tuple[str, str]]] = {
+    "event": [
+        ("profile", "name"),
+        ("profile", "profession"),
+        ("profile", "location"),
+        ("profile", "fitness_data.last_workout"),
+        ("profile", "previous_notifications"),
+    ],
+    "tasks": [
+        ("profile", "name"),
+        ("profile", "profession"),
+        ("profile", "fitness_data"),
+        ("profile", "previous_notifications"),
+        ("profile", "purchases"),
+    ],
+    "recommendation": [
+        ("profile", "name"),
+        ("profile", "age"),
+        ("profile", "profession"),
+        ("profile", "fitness_data"),
+        ("spotify", "playlists.*.name"),
+        ("social_media", "twitter.recent_posts"),
+        ("profile", "app_usage.most_used_apps.*.name"),
+        ("profile", "purchases.*.item"),
+        ("spotify", "playlists.*.tracks"),
+    ],
+}
+PROJECTIONS["day_plan"] = PROJECTIONS["recommendation"]
+
+
+def compact(value: Any) -> str:
+    """Serializes value as JSON without insignificant whitespace."""
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+
+def project(source: Any, path: str) -> Any:
+    """Returns the value at a dotted path ("*" maps over lists), or None if absent."""
+    head, _, rest = path.partition(".")
+    if head == "*":
+        if not isinstance(source, list):
+            return None
+        return [project(item, rest) if rest else item for item in source]
+    if not isinstance(source, dict) or head not in source:
+        return None
+    return project(source[head], rest) if rest else source[head]
+
+
+def _insert(target: Dict[str, Any], path: str, value: Any) -> None:
+    """Stores value in target under path, without the "*" segments."""
+    keys = [key for key in path.split(".") if key != "*"]
+    for key in keys[:-1]:
+        target = target.setdefault(key, {})
+    target[keys[-1]] = value
+
+
+class PromptBuilder:
+    """Builds compact LLM prompts from a user's data.
+
+    Only the fields a prompt type needs are included, serialized as compact
+    JSON. The fields are projected on every call, and the rendered block
+    (with however many fields the budget allows) is reused while they stay
+    the same, so edits to the user's data are picked up even when made in
+    place. Prompts are kept within the budget of LLM_CONTEXT_TOKENS -
+    LLM_MAX_TOKENS by dropping the least important fields first.
+    """
+
+    def __init__(self, user: UserData, config, projections: Optional[Dict[str, List[Tuple[str, str]]]] = None):
+        self.user = user
+        self.config = config
+        self.projections = projections or PROJECTIONS
+        self._contexts: Dict[Tuple[str, int], str] = {}  # (prompt type, fields kept) -> block
+        self._projected: Dict[str, List[Any]] = {}  # Prompt type -> field values the blocks were built from
+        self._baselines: Dict[str, int] = {}  # Tokens of the full str() interpolation per type
+        self.stats: Dict[str, Dict[str, int]] = {}
+
+    def token_budget(self, reserve: Optional[int] = None) -> int:
+        """Prompt tokens available once the completion (default LLM_MAX_TOKENS) has been reserved."""
+        return self.config.LLM_CONTEXT_TOKENS - (reserve or self.config.LLM_MAX_TOKENS)
+
+    def event(self, event_details: str, current_location: str, current_time: datetime) -> str:
+        """Prompt for a proactive action ahead of a calendar event."""
+        return self._build("event", lambda context: f"""Suggest a proactive action for the event: '{event_details}'.
+        User's current location: {current_location}
+        Current time: {current_time.strftime('%I:%M %p')}
+        User's profile: {context}
+        Suggestion should be helpful, context-aware, and consider the user's preferences and habits.
+        And, give the response such that you are speaking to the user""")
+
+    def tasks(self, calendar: Sequence[Dict[str, str]], current_time: datetime) -> str:
+        """Prompt for the day's proactive tasks."""
+        events = compact([[event["date"], event["time"], event["event"], event["duration"]] for event in calendar])
+        # The baseline interpolated the calendar rows with str() too
+        raw_events = str([dict(event) for event in calendar])
+        return self._build("tasks", data=(events, raw_events), render=lambda context: f"""Generate 3 proactive tasks for {self.user.name} based on their profile and calendar:
+        Profile: {context}
+        Calendar (date, time, event, duration in hours): {events}
+        Current time: {current_time.strftime('%I:%M %p')}
+        Tasks should be specific and actionable.""")
+
+    def recommendation(self, current_location: str, current_time: datetime, avoid: Sequence[str] = ()) -> str:
+        """Prompt for a personalised recommendation, answered as a JSON object.
+
+        avoid lists recommendations shown recently, which the answer should not repeat.
+        """
+        recent = f"\n        Do not repeat these recent recommendations: {compact(list(avoid))}" if avoid else ""
+        return self._build("recommendation", lambda context: f"""Generate a personalised recommendation for {self.user.name} based on their profile, social media, music preferences, current location, and time of day. Additionally, classify the recommendation as 'urgent', 'important', or 'normal':
+        User data: {context}
+        Current location: {current_location}
+        Current time: {current_time.strftime('%I:%M %p')}{recent}
+        Recommendation should be specific, tailored to the user's interests, current location, and the time of day. Answer with only a JSON object: {{"recommendation": "...", "classification": "urgent|important|normal", "suggested_time": "HH:MM", "duration_hours": 1}}.""")
+
+    def day_plan(self, slots: Sequence[Tuple[datetime, str, Sequence[str]]], current_time: datetime) -> str:
+        """Prompt for all of a day's recommendations at once.
+
+        slots holds (time, expected location, titles of upcoming events) per slot.
+        """
+        schedule = compact([
+            {"time": slot.strftime("%H:%M"), "location": location, "upcoming": list(upcoming)}
+            for slot, location, upcoming in slots
+        ])
+        reserve = self.config.LLM_PLAN_MAX_TOKENS
+        return self._build("day_plan", lambda context: f"""Plan today's personalised recommendations for {self.user.name}, one per time slot, based on their profile, social media, music preferences, expected location, upcoming events and the time of day. Classify each recommendation as 'urgent', 'important', or 'normal'.
+        User data: {context}
+        Slots: {schedule}
+        Current time: {current_time.strftime('%I:%M %p')}
+        Answer with only a JSON array containing one object per slot: {{"time": "HH:MM", "recommendation": "...", "classification": "urgent|important|normal", "suggested_time": "HH:MM", "duration_hours": 1}}. Each recommendation should be specific and tailored to the user's interests, the location and the time of day.""", reserve)
+
+    def savings(self) -> Dict[str, Dict[str, float]]:
+        """Estimated prompt tokens per call type, compared with interpolating the raw data."""
+        report = {}
+        for prompt_type, stats in self.stats.items():
+            calls = stats["calls"] or 1
+            report[prompt_type] = {
+                "calls": stats["calls"],
+                "avg_tokens": stats["tokens"] / calls,
+                "avg_baseline_tokens": stats["baseline_tokens"] / calls,
+                "avg_tokens_saved": (stats["baseline_tokens"] - stats["tokens"]) / calls,
+            }
+        return report
+
+    def _build(
+        self, prompt_type: str, render, reserve: Optional[int] = None, data: Tuple[str, str] = ("", "")
+    ) -> str:
+        """Renders the prompt within budget; data is (compact, str()) forms of other data it interpolates."""
+        self._check_fields(prompt_type)
+        budget = self.token_budget(reserve)
+        fields = len(self.projections[prompt_type])
+        prompt = render(self._context(prompt_type, fields))
+        # Drop the least important fields until the prompt fits the budget
+        while estimate_tokens(prompt) > budget and fields > 0:
+            fields -= 1
+            prompt = render(self._context(prompt_type, fields))
+        if estimate_tokens(prompt) > budget:
+            prompt = prompt[: budget * 4]  # Last resort: hard truncation
+
+        stats = self.stats.setdefault(prompt_type, {"calls": 0, "tokens": 0, "baseline_tokens": 0})
+        stats["calls"] += 1
+        stats["tokens"] += estimate_tokens(prompt)
+        # Baseline: the same prompt with the raw data interpolated via str()
+        context_tokens = estimate_tokens(self._context(prompt_type, fields)) + estimate_tokens(data[0])
+        stats["baseline_tokens"] += (
+            estimate_tokens(prompt) - context_tokens + self._baseline(prompt_type) + estimate_tokens(data[1])
+        )
+        return prompt
+
+    def _check_fields(self, prompt_type: str) -> None:
+        """Drops the memoized blocks of prompt_type if its fields changed since they were built."""
+        sources = self._sources()
+        values = [project(sources[source], path) for source, path in self.projections[prompt_type]]
+        if self._projected.get(prompt_type) != values:
+            for key in [key for key in self._contexts if key[0] == prompt_type]:
+                del self._contexts[key]
+            self._baselines.pop(prompt_type, None)
+            # A deep copy, so an in-place edit of the user's data still compares unequal
+            self._projected[prompt_type] = json.loads(compact(values))
+
+    def _context(self, prompt_type: str, fields: int) -> str:
+        """Compact user-context block with the first `fields` projected fields, memoized."""
+        key = (prompt_type, fields)
+        block = self._contexts.get(key)
+        if block is None:
+            projected: Dict[str, Any] = {}
+            values = self._projected[prompt_type]
+            for (source, path), value in zip(self.projections[prompt_type][:fields], values):
+                if value is not None:
+                    _insert(projected.setdefault(source, {}), path, value)
+            # A single source does not need to be wrapped
+            block = compact(projected["profile"] if list(projected) == ["profile"] else projected)
+            self._contexts[key] = block
+        return block
+
+    def _baseline(self, prompt_type: str) -> int:
+        """Tokens the raw data took when interpolated with str()."""
+        if prompt_type not in self._baselines:
+            if prompt_type in ("recommendation", "day_plan"):
+                raw = f"{self.user.profile}{self.user.social_media}{self.user.spotify_playlists}"
+            else:
+                raw = str(self.user.profile)
+            self._baselines[prompt_type] = estimate_tokens(raw)
+        return self._baselines[prompt_type]
+
+    def _sources(self) -> Dict[str, Any]:
+        return {
+            "profile": self.user.profile,
+            "social_media": self.user.social_media,
+            "spotify": self.user.spotify_playlists,
+        }
@@ -0,0 +1,85 @@
+import time
+from datetime import date, timedelta
+from typing import Iterator, NamedTuple, Optional, Tuple
+
+from user_data.timestamps import from_seconds
+from user_data.user_data import UserData
+from metrics.metrics import METRICS
+
+from .everything import EVERYTHING
+
+REPLAY_DAYS = METRICS.counter("replay_days", "Days simulated by replays")
+
+
+class DateRange(NamedTuple):
+    """Days to replay, inclusive; a missing bound defaults to the user's stored data."""
+
+    start: Optional[date] = None
+    end: Optional[date] = None
+
+
+class ReplayResult(NamedTuple):
+    """What one user's replay did and how long it took."""
+
+    name: str
+    days: int
+    ticks: int
+    llm_calls: int
+    recommendations: int
+    wall_time: float  # seconds
+
+    @property
+    def days_per_s(self) -> float:
+        return self.days / self.wall_time if self.wall_time else float("inf")
+
+
+def dates(start: date, end: date) -> Iterator[date]:
+    """Every day from start to end, inclusive."""
+    day = start
+    while day <= end:
+        yield day
+        day += timedelta(days=1)
+
+
+def stored_dates(user: UserData) -> Optional[Tuple[date, date]]:
+    """The first and last day with a location fix or calendar event, or None without data."""
+    seconds = []
+    fix_times = user.location_index.columns()[0]
+    if len(fix_times):
+        seconds += [fix_times[0], fix_times[-1]]
+    starts = user.calendar_index.columns()[0]
+    if len(starts):
+        seconds += [starts[0], starts[-1]]
+    if not seconds:
+        return None
+    return from_seconds(min(seconds)).date(), from_seconds(max(seconds)).date()
+
+
+async def replay(ai: EVERYTHING, days: DateRange = DateRange(), resume: bool = True) -> ReplayResult:
+    """Simulates each day in days with the same EVERYTHING, in order.
+
+    Tasks, recommendations (and the memory of them), calendar additions and
+    the device event stream carry over from one day to the next. Time is
+    virtual: a day runs as fast as it can be processed, and with
+    Config.SIMULATION_MODE = "event" idle stretches are skipped entirely.
+    With a state store, days finished in an earlier run are restored rather
+    than simulated again, and their ticks and calls count towards the result.
+    """
+    start, end = days
+    if start is None or end is None:
+        stored = stored_dates(ai.user)
+        if stored is None:
+            raise ValueError(f"No stored data to replay for {ai.user.name}")
+        start, end = start or stored[0], end or stored[1]
+
+    ticks, llm_calls = ai.ticks, ai.llm_calls
+    started = time.perf_counter()
+    simulated = 0
+    for day in dates(start, end):
+        await ai.simulate_day(day, resume=resume)
+        simulated += 1
+        REPLAY_DAYS.inc()
+    return ReplayResult(
+        ai.user.name, simulated, ai.ticks - ticks, ai.llm_calls - llm_calls, len(ai.recommendations),
+        time.perf_counter() - started,
+    )
@@ -0,0 +1,228 @@
+import asyncio
+import json
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from user_data.calendar_index import CalendarEvent
+from user_data.timestamps import from_seconds, to_seconds
+from metrics.metrics import METRICS
+
+from .classifier import Recommendation
+
+COMMIT_SIZE = METRICS.histogram("state_store_commit_size", "Writes per state store transaction", buckets=(1, 5, 10, 50, 100, 500))
+COMMIT_SECONDS = METRICS.histogram("state_store_commit_seconds", "Time to commit one batch of state store writes")
+
+# Times are naive epoch seconds (see user_data.timestamps), like the in-memory indexes
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    user TEXT NOT NULL, start REAL NOT NULL, end REAL NOT NULL, title TEXT NOT NULL, source TEXT NOT NULL,
+    PRIMARY KEY (user, start, title)
+);
+CREATE TABLE IF NOT EXISTS tasks (
+    user TEXT NOT NULL, day TEXT NOT NULL, position INTEGER NOT NULL, text TEXT NOT NULL,
+    PRIMARY KEY (user, day, position)
+);
+CREATE TABLE IF NOT EXISTS recommendations (
+    id INTEGER PRIMARY KEY, user TEXT NOT NULL, shown_at REAL NOT NULL, text TEXT NOT NULL,
+    classification TEXT NOT NULL, suggested_time TEXT, duration_hours REAL NOT NULL,
+    UNIQUE (user, shown_at)
+);
+CREATE TABLE IF NOT EXISTS checkpoints (
+    user TEXT NOT NULL, day TEXT NOT NULL, at REAL NOT NULL, state TEXT NOT NULL,
+    PRIMARY KEY (user, day)
+);
+"""
+
+Statement = Tuple[str, Sequence[Any]]
+
+
+class StateStore:
+    """Persistent calendar additions, tasks, recommendations and checkpoints, in SQLite.
+
+    The database runs in WAL mode, so several worker processes can share
+    one file and readers never block the writer. Queries are coroutines
+    that run on a pool of read connections in worker threads. Writes return
+    immediately: they are queued and a single writer commits them in
+    batches, one transaction per batch (group commit), so the simulation
+    loop never waits for the disk. Reads only see committed writes; flush()
+    waits until everything queued so far is committed.
+    """
+
+    def __init__(self, path: str, pool_size: int = 4, batch_size: int = 256, flush_interval: float = 0.05):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._writer = self._connect()
+        self._writer.executescript(SCHEMA)
+        self._writer.commit()
+        self._readers = [self._connect() for _ in range(pool_size)]
+        # One extra thread for the writer, so commits never wait for a reader
+        self._executor = ThreadPoolExecutor(pool_size + 1, thread_name_prefix="state-store")
+        self._pool: Optional[asyncio.Queue] = None  # Created inside the running loop
+        self._pending: List[List[Statement]] = []  # Queued writes; each is applied atomically
+        self._writer_task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Future] = None  # Resolved to commit before flush_interval is up
+        self._flushing = 0  # flush() calls waiting; the writer commits without waiting while any are
+        self.stats: Dict[str, int] = {"writes": 0, "commits": 0}
+
+    @classmethod
+    def from_config(cls, config) -> Optional["StateStore"]:
+        """The store at Config.STATE_DB_PATH, or None if persistence is off."""
+        if not config.STATE_DB_PATH:
+            return None
+        return cls(config.STATE_DB_PATH, config.STATE_DB_POOL_SIZE, config.STATE_DB_BATCH_SIZE)
+
+    def _connect(self) -> sqlite3.Connection:
+        # Used from the executor threads, one at a time per connection
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")  # Durable at checkpoints; enough for simulation state
+        return conn
+
+    # Writes
+
+    def add_event(self, user: str, event: CalendarEvent, source: str = "recommendation") -> None:
+        self._write([(
+            "INSERT OR REPLACE INTO events (user, start, end, title, source) VALUES (?, ?, ?, ?, ?)",
+            (user, to_seconds(event.start), to_seconds(event.end), event.title, source),
+        )])
+
+    def set_tasks(self, user: str, day: date, tasks: Sequence[str]) -> None:
+        """Replaces the user's task list for day."""
+        self._write(
+            [("DELETE FROM tasks WHERE user = ? AND day = ?", (user, day.isoformat()))]
+            + [
+                ("INSERT INTO tasks (user, day, position, text) VALUES (?, ?, ?, ?)", (user, day.isoformat(), i, task))
+                for i, task in enumerate(tasks)
+            ]
+        )
+
+    def add_recommendation(self, user: str, recommendation: Recommendation, shown_at: datetime) -> None:
+        """Stores a recommendation; one shown at the same time replaces it."""
+        self._write([_recommendation_insert(user, recommendation, shown_at)])
+
+    def save_checkpoint(
+        self, user: str, day: date, at: datetime, state: Dict[str, Any],
+        recommendations: Sequence[Tuple[datetime, Recommendation]] = (),
+    ) -> None:
+        """Records how far the simulation of day has got; state must be JSON-serialisable.
+
+        recommendations, as (shown at, recommendation) pairs, are stored in
+        the same transaction, so the stored ones always match a checkpoint.
+        """
+        self._write(
+            [_recommendation_insert(user, recommendation, shown_at) for shown_at, recommendation in recommendations]
+            + [(
+                "INSERT OR REPLACE INTO checkpoints (user, day, at, state) VALUES (?, ?, ?, ?)",
+                (user, day.isoformat(), to_seconds(at), json.dumps(state)),
+            )]
+        )
+
+    def _write(self, statements: List[Statement]) -> None:
+        self._pending.append(statements)
+        self.stats["writes"] += 1
+        if self._writer_task is None:
+            self._writer_task = asyncio.get_running_loop().create_task(self._write_loop())
+        elif len(self._pending) >= self.batch_size:
+            self._wake()
+
+    async def _write_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            while self._pending:
+                if len(self._pending) < self.batch_size and not self._flushing:
+                    # Let more writes join the transaction
+                    self._wakeup = loop.create_future()
+                    timer = loop.call_later(self.flush_interval, self._wake)
+                    await self._wakeup
+                    timer.cancel()
+                batch, self._pending = self._pending[: self.batch_size], self._pending[self.batch_size :]
+                await loop.run_in_executor(self._executor, self._commit, batch)
+        finally:
+            self._writer_task = None
+
+    def _commit(self, batch: List[List[Statement]]) -> None:
+        with COMMIT_SECONDS.time(), self._writer:  # One transaction for the whole batch
+            for statements in batch:
+                for sql, params in statements:
+                    self._writer.execute(sql, params)
+        self.stats["commits"] += 1
+        COMMIT_SIZE.observe(len(batch))
+
+    def _wake(self) -> None:
+        if self._wakeup is not None and not self._wakeup.done():
+            self._wakeup.set_result(None)
+
+    async def flush(self) -> None:
+        """Waits until every write queued so far is committed (without waiting for a batch to fill)."""
+        self._flushing += 1
+        try:
+            while self._writer_task is not None:
+                self._wake()
+                await asyncio.shield(self._writer_task)
+        finally:
+            self._flushing -= 1
+
+    # Reads
+
+    async def _read(self, sql: str, params: Sequence[Any]) -> List[tuple]:
+        if self._pool is None:
+            self._pool = asyncio.Queue()
+            for conn in self._readers:
+                self._pool.put_nowait(conn)
+        conn = await self._pool.get()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._executor, lambda: conn.execute(sql, params).fetchall()
+            )
+        finally:
+            self._pool.put_nowait(conn)
+
+    async def events(self, user: str, start: datetime, end: datetime) -> List[CalendarEvent]:
+        """Stored events starting in [start, end], in start order."""
+        rows = await self._read(
+            "SELECT start, end, title FROM events WHERE user = ? AND start BETWEEN ? AND ? ORDER BY start",
+            (user, to_seconds(start), to_seconds(end)),
+        )
+        return [CalendarEvent.from_fields(from_seconds(start), from_seconds(end), title) for start, end, title in rows]
+
+    async def tasks(self, user: str, day: date) -> List[str]:
+        rows = await self._read(
+            "SELECT text FROM tasks WHERE user = ? AND day = ? ORDER BY position", (user, day.isoformat())
+        )
+        return [text for (text,) in rows]
+
+    async def recommendations(
+        self, user: str, since: Optional[datetime] = None, until: Optional[datetime] = None
+    ) -> List[Tuple[datetime, Recommendation]]:
+        """(shown at, recommendation) pairs, oldest first."""
+        rows = await self._read(
+            "SELECT shown_at, text, classification, suggested_time, duration_hours FROM recommendations"
+            " WHERE user = ? AND shown_at BETWEEN ? AND ? ORDER BY shown_at, id",
+            (user, to_seconds(since) if since else float("-inf"), to_seconds(until) if until else float("inf")),
+        )
+        return [(from_seconds(shown_at), Recommendation(*fields)) for shown_at, *fields in rows]
+
+    async def load_checkpoint(self, user: str, day: date) -> Optional[Tuple[datetime, Dict[str, Any]]]:
+        """The latest (time, state) checkpoint for the user's day, if any."""
+        rows = await self._read("SELECT at, state FROM checkpoints WHERE user = ? AND day = ?", (user, day.isoformat()))
+        if not rows:
+            return None
+        at, state = rows[0]
+        return from_seconds(at), json.loads(state)
+
+    async def close(self) -> None:
+        await self.flush()
+        self._executor.shutdown()
+        for conn in [self._writer] + self._readers:
+            conn.close()
+
+
+def _recommendation_insert(user: str, recommendation: Recommendation, shown_at: datetime) -> Statement:
+    return (
+        "INSERT OR REPLACE INTO recommendations (user, shown_at, text, classification, suggested_time, duration_hours)"
+        " VALUES (?, ?, ?, ?, ?, ?)",
+        (user, to_seconds(shown_at), *recommendation),
+    )
@@ -0,0 +1,65 @@
+import asyncio
+import re
+from typing import AsyncIterator, Pattern
+
+# Where a streamed answer can be cut into notifications
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+|\n+")
+LINE_END = re.compile(r"\n+")
+
+_END = object()
+
+
+async def split_stream(deltas: AsyncIterator[str], boundary: Pattern = SENTENCE_END) -> AsyncIterator[str]:
+    """Regroups text deltas into complete segments (sentences by default).
+
+    Each segment is yielded as soon as the boundary after it has arrived;
+    the remainder is yielded when the stream ends. Empty segments are skipped.
+    """
+    buffer = ""
+    async for delta in deltas:
+        buffer += delta
+        parts = boundary.split(buffer)
+        # The last part may still be growing
+        for part in parts[:-1]:
+            if part.strip():
+                yield part.strip()
+        buffer = parts[-1]
+    if buffer.strip():
+        yield buffer.strip()
+
+
+class PrefetchedStream:
+    """Starts consuming an async iterator right away and replays its items when iterated.
+
+    Lets several streams be requested concurrently while their output is
+    still delivered one stream after another, in order. Must be created
+    inside a running event loop.
+    """
+
+    def __init__(self, items: AsyncIterator):
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task = asyncio.ensure_future(self._pump(items))
+
+    async def _pump(self, items: AsyncIterator) -> None:
+        try:
+            async for item in items:
+                self._queue.put_nowait(item)
+        except Exception as e:
+            self._queue.put_nowait(e)
+            return
+        self._queue.put_nowait(_END)
+
+    def __aiter__(self) -> "PrefetchedStream":
+        return self
+
+    async def __anext__(self):
+        item = await self._queue.get()
+        if item is _END:
+            raise StopAsyncIteration
+        if isinstance(item, Exception):
+            raise item
+        return item
+
+    def cancel(self) -> None:
+        """Stops consuming the underlying iterator."""
+        self._task.cancel()
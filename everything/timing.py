@@ -0,0 +1,173 @@
+import re
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from user_data.timestamps import to_seconds
+from metrics.metrics import METRICS
+
+
+SLOT_SCORE = METRICS.histogram(
+    "recommendation_slot_score", "Score of each adaptive recommendation slot used", buckets=(0.25, 0.5, 0.75, 1.0)
+)
+SLOTS_SKIPPED = METRICS.counter(
+    "recommendation_slots_skipped", "Candidate slots passed over (busy, too close to another, low score or over budget)"
+)
+
+TIMINGS = ("fixed", "adaptive")
+
+# Weights of (free time, location transition, activity need) in a slot's score. Free
+# time alone stays under Config.RECOMMENDATION_MIN_SCORE: a slot also needs a
+# recent move or enough activity need to be used
+WEIGHTS = (0.35, 0.4, 0.25)
+
+_DURATION = re.compile(r"(?:(\d+(?:\.\d+)?)\s*h)?\s*(?:(\d+)\s*m)?")
+
+
+def parse_hours(text: str) -> Optional[float]:
+    """7.75 for "7h 45m"; None if text is not a duration."""
+    match = _DURATION.fullmatch(str(text).strip())
+    if match is None or not any(match.groups()):
+        return None
+    hours, minutes = match.groups()
+    return float(hours or 0) + int(minutes or 0) / 60
+
+
+def activity_need(fitness: Dict[str, Any]) -> float:
+    """How much the user's fitness data calls for a nudge, in [0, 1].
+
+    The shortfall of today's steps against the daily average plus that of
+    last night's sleep against the usual amount; 0 without the data.
+    """
+    need = 0.0
+    steps, average_steps = fitness.get("steps_today"), fitness.get("average_daily_steps")
+    if steps is not None and average_steps:
+        need += max(0.0, 1 - steps / average_steps)
+    sleep = fitness.get("sleep", {})
+    last_night, usual = parse_hours(sleep.get("last_night", "")), parse_hours(sleep.get("average", ""))
+    if last_night is not None and usual:
+        need += max(0.0, 1 - last_night / usual)
+    return min(need, 1.0)
+
+
+def score_slots(
+    free_minutes: Any,
+    transitions: Any,
+    activity: Any,
+    horizon_minutes: float = 60,
+    weights: Tuple[float, float, float] = WEIGHTS,
+) -> np.ndarray:
+    """Scores recommendation slots in [0, 1]; the arguments broadcast against each other.
+
+    free_minutes is the free calendar time from the slot on (a slot with
+    none scores 0: the user is busy), transitions is 1 where the user has
+    just changed location, and activity is the activity_need.
+    """
+    free = np.clip(np.asarray(free_minutes, dtype=np.float32) / horizon_minutes, 0, 1)
+    score = (
+        weights[0] * free
+        + weights[1] * np.asarray(transitions, dtype=np.float32)
+        + weights[2] * np.asarray(activity, dtype=np.float32)
+    )
+    return np.where(free > 0, score, np.float32(0))
+
+
+def slot_features(user, slots: Sequence[datetime], step: timedelta, horizon: timedelta) -> Tuple[np.ndarray, np.ndarray]:
+    """(free minutes, location transitions) of user at each of the sorted slots.
+
+    Free time is counted up to horizon past the last slot. A transition is
+    a location different from the one a step earlier; only fixes up to each
+    slot are used.
+    """
+    times = np.fromiter((to_seconds(slot) for slot in slots), np.float64, len(slots))
+
+    gaps = user.calendar_index.free_slots(slots[0], slots[-1] + horizon)
+    gap_starts = np.fromiter((to_seconds(start) for start, _ in gaps), np.float64, len(gaps))
+    gap_ends = np.fromiter((to_seconds(end) for _, end in gaps), np.float64, len(gaps))
+    gap = np.searchsorted(gap_starts, times, side="right") - 1
+    ends = gap_ends[np.maximum(gap, 0)] if len(gaps) else np.zeros_like(times)
+    free = np.where((gap >= 0) & (times < ends), ends - times, 0) / 60
+
+    # Only the fixes around the slots are converted, not the whole history
+    fix_times, codes = user.location_index.window(slots[0] - step, slots[-1])
+    fix_times = np.asarray(fix_times, dtype=np.float64)
+    codes = np.asarray(codes, dtype=np.int64)
+
+    def location_at(seconds: np.ndarray) -> np.ndarray:
+        fix = np.searchsorted(fix_times, seconds, side="right") - 1
+        if len(codes):  # The first of the fixes sharing the latest timestamp, as in LocationIndex.latest_at
+            fix = np.where(fix >= 0, np.searchsorted(fix_times, fix_times[np.maximum(fix, 0)], side="left"), -1)
+        return np.where(fix >= 0, codes[np.maximum(fix, 0)] if len(codes) else -1, -1)
+
+    now, before = location_at(times), location_at(times - step.total_seconds())
+    return free, ((before >= 0) & (now != before)).astype(np.float32)
+
+
+class RecommendationTimer:
+    """Chooses when to recommend from the user's day instead of fixed hours.
+
+    The simulation steps after the day's first recommendation that are free
+    in the calendar are candidates. At each one the slot is scored (see
+    score_slots) from the calendar, the location fixes up to that moment
+    and the fitness data, and it is used if it scores at least min_score,
+    is min_gap_hours from the day's other recommendations and the daily
+    budget is not spent. Decisions never look at later location data, so a
+    live feed and a replay of stored days choose alike. Each slot costs at
+    most one recommendation call, so budget caps the LLM calls spent on them.
+    """
+
+    def __init__(
+        self,
+        budget: int = 4,
+        min_score: float = 0.4,
+        min_gap_hours: float = 2,
+        horizon_minutes: float = 60,
+        weights: Tuple[float, float, float] = WEIGHTS,
+    ):
+        self.budget = budget
+        self.min_score = min_score
+        self.min_gap = timedelta(hours=min_gap_hours)
+        self.horizon = timedelta(minutes=horizon_minutes)
+        self.weights = weights
+
+    @classmethod
+    def from_config(cls, config) -> Optional["RecommendationTimer"]:
+        """The timer for Config.RECOMMENDATION_TIMING, or None for the fixed RECOMMENDATION_HOURS."""
+        if config.RECOMMENDATION_TIMING not in TIMINGS:
+            raise ValueError(f"Unknown recommendation timing: {config.RECOMMENDATION_TIMING}")
+        if config.RECOMMENDATION_TIMING == "fixed":
+            return None
+        return cls(config.RECOMMENDATION_DAILY_BUDGET, config.RECOMMENDATION_MIN_SCORE, config.RECOMMENDATION_MIN_GAP_HOURS)
+
+    def candidates(self, user, start: datetime, end: datetime, step: timedelta) -> List[datetime]:
+        """The slots on the step grid strictly between start and end, at least min_gap after start, free in the calendar.
+
+        Only the calendar is consulted: it is known in advance.
+        """
+        slots = []
+        slot = start + step
+        while slot < end:
+            if slot - start >= self.min_gap:
+                slots.append(slot)
+            slot += step
+        if not slots:
+            return []
+        free, _ = slot_features(user, slots, step, self.horizon)
+        return [slot for slot, minutes in zip(slots, free) if minutes > 0]
+
+    def should_recommend(self, user, slot: datetime, step: timedelta, taken: Sequence[datetime]) -> bool:
+        """Whether to recommend at slot, given the day's earlier recommendation times (the first one included)."""
+        if len(taken) > self.budget or any(abs(slot - other) < self.min_gap for other in taken):
+            SLOTS_SKIPPED.inc()
+            return False
+        free, transitions = slot_features(user, [slot], step, self.horizon)
+        score = float(score_slots(
+            free, transitions, activity_need(user.profile.get("fitness_data", {})),
+            self.horizon.total_seconds() / 60, self.weights,
+        )[0])
+        if score < self.min_score:  # Also when the user has become busy since the candidates were listed
+            SLOTS_SKIPPED.inc()
+            return False
+        SLOT_SCORE.observe(score)
+        return True
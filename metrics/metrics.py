@@ -0,0 +1,368 @@
+import abc
+import bisect
+import contextvars
+import itertools
+import math
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence, Tuple
+
+# Seconds; suits both sub-millisecond lookups and multi-second LLM calls
+DEFAULT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50)
+
+
+class _Timer:
+    """Context manager observing its elapsed time on a histogram."""
+
+    __slots__ = ("_histogram", "_started")
+
+    def __init__(self, histogram: "Histogram"):
+        self._histogram = histogram
+
+    def __enter__(self) -> "_Timer":
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._histogram.observe(time.perf_counter() - self._started)
+
+
+class _NullTimer:
+    """What Histogram.time() returns while metrics are disabled."""
+
+    __slots__ = ()
+
+    def __enter__(self) -> "_NullTimer":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Metric(abc.ABC):
+    """A metric family. Without labels it records directly; otherwise use labels() to get a child."""
+
+    kind = ""
+
+    def __init__(self, registry: "MetricsRegistry", name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self._registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], "_Metric"] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: str, **labels: str) -> "_Metric":
+        """The child for these label values, created on first use; keep it to skip the lookup."""
+        key = tuple(str(value) for value in values) or tuple(str(labels[name]) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} takes labels {self.labelnames}, got {key}")
+            with self._lock:
+                child = self._children.setdefault(key, self._child())
+        return child
+
+    def _child(self) -> "_Metric":
+        return type(self)(self._registry, self.name, self.documentation)
+
+    def samples(self) -> List[Tuple[str, Dict[str, str], float]]:
+        """(name suffix, labels, value) for every child."""
+        if not self.labelnames:
+            return self._own_samples({})
+        return [
+            sample
+            for key, child in list(self._children.items())
+            for sample in child._own_samples(dict(zip(self.labelnames, key)))
+        ]
+
+    @abc.abstractmethod
+    def _own_samples(self, labels: Dict[str, str]) -> List[Tuple[str, Dict[str, str], float]]:
+        """This metric's samples (without its children's), with labels added."""
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.value = 0.0
+
+    def inc(self, amount: float = 1) -> None:
+        if self._registry.enabled:
+            self.value += amount
+
+    def _own_samples(self, labels):
+        return [("_total", labels, self.value)]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.value = 0.0
+
+    def set(self, value: float) -> None:
+        if self._registry.enabled:
+            self.value = value
+
+    def inc(self, amount: float = 1) -> None:
+        if self._registry.enabled:
+            self.value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        self.inc(-amount)
+
+    def _own_samples(self, labels):
+        return [("", labels, self.value)]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: Sequence[float] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # The last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def _child(self) -> "Histogram":
+        return Histogram(self._registry, self.name, self.documentation, buckets=self.buckets)
+
+    def observe(self, value: float) -> None:
+        if self._registry.enabled:
+            self.counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.sum += value
+            self.count += 1
+
+    def time(self):
+        """Context manager that observes the time spent inside it."""
+        return _Timer(self) if self._registry.enabled else _NULL_TIMER
+
+    def _own_samples(self, labels):
+        samples = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (math.inf,), self.counts):
+            cumulative += count
+            samples.append(("_bucket", dict(labels, le="+Inf" if bound == math.inf else repr(float(bound))), cumulative))
+        samples.append(("_sum", labels, self.sum))
+        samples.append(("_count", labels, self.count))
+        return samples
+
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+_span_ids = itertools.count(1)
+
+
+class Span:
+    """A timed operation, in the style of an OpenTelemetry span.
+
+    Use as a context manager; spans opened inside it (including in tasks
+    it starts) become its children. Ended spans are handed to the
+    registry's span processors.
+    """
+
+    def __init__(self, registry: "MetricsRegistry", name: str, attributes: Dict[str, Any]):
+        self._registry = registry
+        self.name = name
+        self.attributes = attributes
+        self.span_id = next(_span_ids)
+        parent = _current_span.get()
+        self.parent_id = parent.span_id if parent is not None else None
+        self.trace_id = parent.trace_id if parent is not None else self.span_id
+        self.status = "OK"
+        self.events: List[Tuple[float, str, Dict[str, Any]]] = []
+        self.start_time = time.time()
+        self.duration: Optional[float] = None
+        self._started = time.perf_counter()
+        self._token = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def add_event(self, name: str, **attributes: Any) -> None:
+        self.events.append((time.time(), name, attributes))
+
+    def record_exception(self, exception: BaseException) -> None:
+        self.status = "ERROR"
+        self.add_event("exception", type=type(exception).__name__, message=str(exception))
+
+    def end(self) -> None:
+        if self.duration is None:
+            self.duration = time.perf_counter() - self._started
+            self._registry._finish(self)
+
+    def __enter__(self) -> "Span":
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc is not None:
+            self.record_exception(exc)
+        _current_span.reset(self._token)
+        self.end()
+
+
+class _NullSpan:
+    """What start_span returns while metrics are disabled."""
+
+    __slots__ = ()
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def add_event(self, name: str, **attributes: Any) -> None:
+        pass
+
+    def record_exception(self, exception: BaseException) -> None:
+        pass
+
+    def end(self) -> None:
+        pass
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class MetricsRegistry:
+    """In-process metrics and spans.
+
+    Disabled by default: every recording method then returns after one
+    attribute check, Histogram.time() and start_span() hand out shared
+    no-op context managers, and nothing is allocated. Metrics are
+    registered once at import time and kept by the instrumented modules.
+    """
+
+    def __init__(self, enabled: bool = False, max_spans: int = 1000):
+        self.enabled = enabled
+        self._metrics: Dict[str, _Metric] = {}
+        self.spans: Deque[Span] = deque(maxlen=max_spans)  # Most recent ended spans
+        self._span_processors: List[Callable[[Span], None]] = []
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(self, name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(self, name, documentation, labelnames))
+
+    def histogram(
+        self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(self, name, documentation, labelnames, buckets=buckets))
+
+    def _register(self, metric: _Metric) -> Any:
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            if type(existing) is not type(metric) or existing.labelnames != metric.labelnames:
+                raise ValueError(f"Metric {metric.name} is already registered differently")
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def start_span(self, name: str, **attributes: Any):
+        """Starts a span; use it as a context manager (or call end())."""
+        if not self.enabled:
+            return _NULL_SPAN
+        return Span(self, name, attributes)
+
+    def add_span_processor(self, processor: Callable[[Span], None]) -> None:
+        """Calls processor with every span as it ends (e.g. to forward them to a tracing backend)."""
+        self._span_processors.append(processor)
+
+    def _finish(self, span: Span) -> None:
+        self.spans.append(span)
+        for processor in self._span_processors:
+            processor(span)
+
+    def exposition(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for suffix, labels, value in metric.samples():
+                if labels:
+                    rendered = ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items())
+                    lines.append(f"{metric.name}{suffix}{{{rendered}}} {_number(value)}")
+                else:
+                    lines.append(f"{metric.name}{suffix} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class MetricsServer:
+    """Serves a registry's exposition() at http://host:port/metrics for Prometheus to scrape."""
+
+    def __init__(self, registry: "MetricsRegistry", host: str = "127.0.0.1", port: int = 9464):
+        handler = type("Handler", (_MetricsHandler,), {"registry": registry})
+        self._server = ThreadingHTTPServer((host, port), handler)
+        self._server.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/metrics"
+
+    def start(self) -> "MetricsServer":
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry: MetricsRegistry
+
+    def do_GET(self):
+        if self.path.split("?")[0].rstrip("/") not in ("", "/metrics"):
+            self.send_error(404)
+            return
+        body = self.registry.exposition().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Scrapes are frequent
+
+
+# The process-wide registry the modules record into
+METRICS = MetricsRegistry()
+
+
+def configure(config, registry: MetricsRegistry = METRICS) -> Optional[MetricsServer]:
+    """Applies Config.METRICS_ENABLED and starts the exporter if METRICS_PORT is set."""
+    registry.enabled = config.METRICS_ENABLED
+    if registry.enabled and config.METRICS_PORT is not None:
+        return MetricsServer(registry, port=config.METRICS_PORT).start()
+    return None
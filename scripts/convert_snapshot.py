@@ -0,0 +1,29 @@
+import argparse
+import sys
+import os
+import time
+
+# Add the parent directory to the Python path for module imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from user_data.manifest import load_manifest
+from user_data.snapshot import write_snapshot
+from user_data.user_data import UserData
+
+
+def main():
+    """Converts users' CSV/JSON data into memory-mappable snapshots."""
+    parser = argparse.ArgumentParser(description="Write a binary snapshot next to each user's CSV/JSON data.")
+    parser.add_argument("users", nargs="?", default="data", help="JSON manifest, user data directory, or directory of user data directories")
+    args = parser.parse_args()
+
+    for spec in load_manifest(args.users):
+        started = time.perf_counter()
+        user = UserData(spec.name, spec.data_dir, use_snapshot=False)
+        write_snapshot(user, user.paths["snapshot"])
+        size = os.path.getsize(user.paths["snapshot"])
+        print(f"{spec.name}: {user.paths['snapshot']} ({size / 1024:.0f} KiB, {time.perf_counter() - started:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
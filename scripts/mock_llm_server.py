@@ -0,0 +1,45 @@
+import argparse
+import sys
+import os
+
+# Add the parent directory to the Python path for module imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from everything.fake_llm import MockBackend, MockLLMServer
+
+
+def main():
+    """Serves the mock LLM over an OpenAI-compatible HTTP endpoint until interrupted."""
+    parser = argparse.ArgumentParser(description="Run a local OpenAI-compatible mock LLM server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.5, help="Median seconds before the first token")
+    parser.add_argument("--latency-sigma", type=float, default=0.3, help="Log-normal spread of the latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--requests-per-minute", type=int, default=None, help="Answer 429 beyond this rate")
+    parser.add_argument("--chunk-delay", type=float, default=0.02, help="Seconds between streamed chunks")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    backend = MockBackend(
+        latency=args.latency,
+        latency_sigma=args.latency_sigma,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        requests_per_minute=args.requests_per_minute,
+        chunk_delay=args.chunk_delay,
+        seed=args.seed,
+    )
+    server = MockLLMServer(backend, args.host, args.port)
+    print(f"Mock LLM listening on {server.url} (set Config.LLM_API_BASE to this url)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
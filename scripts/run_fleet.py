@@ -0,0 +1,60 @@
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import os
+from datetime import date
+
+# Add the parent directory to the Python path for module imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from everything.config import Config
+from everything.fleet import run_fleet, run_fleet_sharded
+from user_data.manifest import load_manifest
+from metrics.metrics import configure as configure_metrics
+from everything.replay import DateRange
+
+
+def main():
+    """Simulates a day (or replays a range of days) for every user in a manifest or data directory."""
+    parser = argparse.ArgumentParser(description="Run EVERYTHING for a population of users.")
+    parser.add_argument("users", nargs="?", default="data", help="JSON manifest, user data directory, or directory of user data directories")
+    parser.add_argument("--processes", type=int, default=1, help="Shard users across this many processes")
+    parser.add_argument("--max-in-flight", type=int, default=None, help="Global cap on concurrent LLM calls")
+    parser.add_argument("--mock", action="store_true", help="Use the local mock LLM backend instead of OpenAI")
+    parser.add_argument("--metrics-port", type=int, default=None, help="Serve Prometheus metrics on this port (single process only)")
+    parser.add_argument("--json", dest="json_path", default=None, help="Also write the report as JSON to this path")
+    parser.add_argument("--replay", action="store_true", help="Replay the days covered by each user's stored data instead of today")
+    parser.add_argument("--start", type=date.fromisoformat, default=None, help="First day to replay (YYYY-MM-DD); implies --replay")
+    parser.add_argument("--end", type=date.fromisoformat, default=None, help="Last day to replay (YYYY-MM-DD); implies --replay")
+    parser.add_argument("--every-step", action="store_true", help="When replaying, visit every simulation interval instead of skipping idle periods")
+    args = parser.parse_args()
+
+    config = Config()
+    if args.mock:
+        config.LLM_BACKEND = "mock"
+    if args.metrics_port is not None:
+        config.METRICS_ENABLED = True
+        config.METRICS_PORT = args.metrics_port
+    days = DateRange(args.start, args.end) if args.replay or args.start or args.end else None
+    if days is not None and not args.every_step:
+        config.SIMULATION_MODE = "event"  # Same notifications, without the idle ticks
+    configure_metrics(config)
+    specs = load_manifest(args.users)
+    if args.processes > 1:
+        report = run_fleet_sharded(specs, config, args.processes, args.max_in_flight, days)
+    else:
+        report = asyncio.run(run_fleet(specs, config, args.max_in_flight, days))
+
+    print(report.format())
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(report.to_dict(), f, indent=2)
+
+
+if __name__ == "__main__":
+    # Set up logging configuration; per-notification logs are too noisy for a whole fleet
+    logging.basicConfig(format='%(levelname)s - %(message)s')
+    logging.getLogger().setLevel(logging.WARNING)
+    main()
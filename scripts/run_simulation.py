@@ -11,20 +11,23 @@ from everything.config import Config
 from device_data.device_data import DeviceData
 from user_data.user_data import UserData
 from everything.everything import EVERYTHING
+from metrics.metrics import configure as configure_metrics
 
 async def main():
     """Main function to run the simulation."""
     try:
+        config = Config()             # Load configuration settings
+        configure_metrics(config)     # Enables metrics and their exporter if configured
+
         # Initialise user and device data
         user = UserData(name="Dan")  # Create a UserData instance for Dan
         devices = DeviceData(user)    # Create DeviceData instance linked to the user
-        config = Config()             # Load configuration settings
 
         # Create an instance of EVERYTHING with user, devices, and config
-        ai = EVERYTHING(user, devices, config)
-
-        # Simulate a day in Dan's life with EVERYTHING AI
-        await ai.simulate_day()       # Await the simulation process
+        with user:                    # Unmaps the user's snapshot, if any, on exit
+            async with EVERYTHING(user, devices, config) as ai:  # Closed (notifications written) on exit
+                # Simulate a day in Dan's life with EVERYTHING AI
+                await ai.simulate_day()   # Await the simulation process
     except Exception as e:
         # Log any errors that occur during the simulation
         logging.error(f"An error occurred: {str(e)}")
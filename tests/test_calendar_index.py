@@ -0,0 +1,46 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import unittest
+from datetime import datetime, timedelta
+from user_data.calendar_index import CalendarIndex
+
+ROWS = [
+    {"date": "2024-05-15", "time": "11:00", "event": "Project Planning", "duration": "2"},
+    {"date": "2024-05-15", "time": "09:00", "event": "Team Meeting", "duration": "1"},
+    {"date": "2024-05-15", "time": "16:00", "event": "Code Review", "duration": "1.5"},
+]
+
+class TestCalendarIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = CalendarIndex.from_rows(ROWS)
+
+    def test_starting_between(self):
+        events = self.index.starting_between(datetime(2024, 5, 15, 9, 0), datetime(2024, 5, 15, 11, 0))
+        self.assertEqual([event.title for event in events], ["Team Meeting", "Project Planning"])
+        self.assertEqual(events[1].end, datetime(2024, 5, 15, 13, 0))
+
+    def test_overlapping(self):
+        events = self.index.overlapping(datetime(2024, 5, 15, 12, 30))
+        self.assertEqual([event.title for event in events], ["Project Planning"])
+        self.assertEqual(self.index.overlapping(datetime(2024, 5, 15, 13, 0)), [])
+
+    def test_add(self):
+        self.index.add({"date": "2024-05-15", "time": "10:00", "event": "Run", "duration": "1"})
+        titles = [event.title for event in self.index]
+        self.assertEqual(titles, ["Team Meeting", "Run", "Project Planning", "Code Review"])
+
+    def test_free_slots(self):
+        slots = self.index.free_slots(
+            datetime(2024, 5, 15, 8, 0), datetime(2024, 5, 15, 18, 0), timedelta(hours=1)
+        )
+        self.assertEqual(slots, [
+            (datetime(2024, 5, 15, 8, 0), datetime(2024, 5, 15, 9, 0)),
+            (datetime(2024, 5, 15, 10, 0), datetime(2024, 5, 15, 11, 0)),
+            (datetime(2024, 5, 15, 13, 0), datetime(2024, 5, 15, 16, 0)),
+        ])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import unittest
+from datetime import datetime
+
+from everything.classifier import (
+    Recommendation,
+    parse_recommendation,
+    split_classification,
+)
+from everything.config import Config
+from everything.everything import EVERYTHING
+from everything.fake_llm import MockBackend
+from user_data.user_data import UserData
+from device_data.device_data import DeviceData
+
+class TestClassifier(unittest.TestCase):
+
+    def test_parse_recommendation(self):
+        recommendation = parse_recommendation(
+            '```json\n{"recommendation": "Book a physio slot", "classification": "Important",'
+            ' "suggested_time": "17:30", "duration_hours": 0.5}\n```'
+        )
+        self.assertEqual(recommendation, Recommendation("Book a physio slot", "important", "17:30", 0.5))
+        self.assertTrue(recommendation.needs_calendar_event)
+
+    def test_parse_recommendation_defaults_and_rejects(self):
+        recommendation = parse_recommendation(
+            '{"recommendation": "Walk", "classification": "normal", "suggested_time": "25:00", "duration_hours": "1"}'
+        )
+        self.assertEqual(recommendation, Recommendation("Walk", "normal", None, 1.0))
+        self.assertIsNone(parse_recommendation('{"recommendation": "Walk", "classification": "meh"}'))
+        self.assertIsNone(parse_recommendation("Take a walk. It's important to move."))
+
+    def test_split_classification(self):
+        self.assertEqual(
+            split_classification("Try the new album.\n\nClassification: **Normal**."),
+            ("Try the new album.", "normal"),
+        )
+        self.assertEqual(split_classification("It's important to stretch."), ("It's important to stretch.", None))
+
+class TestClassifyRecommendation(unittest.IsolatedAsyncioTestCase):
+
+    async def test_free_text_costs_no_extra_call(self):
+        user = UserData(name="Dan")
+        backend = MockBackend(reply=lambda prompt: "Don't forget your prescription; the pharmacy closes at 19:00.")
+        async with EVERYTHING(user, DeviceData(user), Config(), backend=backend) as ai:
+            recommendation = await ai._query_recommendation(datetime(2024, 5, 15, 14, 0))
+        self.assertEqual(recommendation.classification, "normal")
+        self.assertEqual(backend.stats["requests"], 1)
+        self.assertEqual(ai.llm_calls, 1)
+
+class TestCalendarTime(unittest.IsolatedAsyncioTestCase):
+
+    async def test_suggested_time_is_not_in_the_past(self):
+        config = Config()
+        config.LLM_BACKEND = "mock"
+        user = UserData(name="Dan")
+        async with EVERYTHING(user, DeviceData(user), config, backend=MockBackend()) as ai:
+            now = datetime(2024, 5, 15, 14, 10)
+            await ai._publish_recommendation(Recommendation("Book the dentist", "important", "09:00", 0.5), now)
+            await ai._publish_recommendation(Recommendation("Go for a run", "important", "18:30"), now)
+        starts = {event.title: event.start for event in user.calendar_index}
+        self.assertEqual(starts["Book the dentist"], now)
+        self.assertEqual(starts["Go for a run"], datetime(2024, 5, 15, 18, 30))
+
+if __name__ == "__main__":
+    unittest.main()
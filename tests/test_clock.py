@@ -0,0 +1,68 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import hashlib
+import unittest
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+from unittest import mock
+
+import openai
+from everything.clock import EventDrivenClock, FixedStepClock
+from everything.config import Config
+from everything.everything import EVERYTHING
+from user_data.user_data import UserData
+from device_data.device_data import DeviceData
+
+START = datetime(2024, 5, 15, 7, 0)
+INTERVAL = timedelta(minutes=30)
+
+def fake_completion(**kwargs):
+    digest = hashlib.sha1(kwargs["messages"][0]["content"].encode()).hexdigest()[:8]
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=f"Reply {digest}"))])
+
+class TestClock(unittest.TestCase):
+
+    def test_fixed_step(self):
+        ticks = list(FixedStepClock(START, INTERVAL).ticks(START + timedelta(hours=1)))
+        self.assertEqual(ticks, [START, START + INTERVAL, START + 2 * INTERVAL])
+
+    def test_event_driven_snaps_to_grid(self):
+        clock = EventDrivenClock(START, INTERVAL)
+        clock.schedule(datetime(2024, 5, 15, 9, 10))
+        clock.schedule(datetime(2024, 5, 15, 9, 20))
+        clock.schedule(datetime(2024, 5, 15, 11, 0))
+        clock.schedule(datetime(2024, 5, 15, 11, 5))
+        clock.schedule(datetime(2024, 5, 15, 11, 30))  # Twice, visited once
+        clock.schedule(datetime(2024, 5, 15, 11, 30))
+        clock.schedule(datetime(2024, 5, 15, 23, 0))  # After the end
+        ticks = list(clock.ticks(datetime(2024, 5, 15, 22, 0)))
+        self.assertEqual(ticks, [
+            datetime(2024, 5, 15, 9, 30),
+            datetime(2024, 5, 15, 11, 0),
+            datetime(2024, 5, 15, 11, 30),
+        ])
+
+class TestSimulationModes(unittest.IsolatedAsyncioTestCase):
+
+    async def simulate(self, mode):
+        config = Config()
+        config.SIMULATION_MODE = mode
+        user = UserData(name="Dan")
+        ai = EVERYTHING(user, DeviceData(user), config)
+        with self.assertLogs("everything.everything", level="INFO") as logs:
+            await ai.simulate_day(date(2024, 5, 15))
+        return logs.output, ai.ticks
+
+    async def test_modes_emit_identical_notifications(self):
+        with mock.patch.dict(os.environ, {"OPENAI_API_KEY": "test"}), \
+                mock.patch.object(openai.ChatCompletion, "create", side_effect=fake_completion):
+            fixed, fixed_ticks = await self.simulate("fixed")
+            event, event_ticks = await self.simulate("event")
+        self.assertEqual(fixed, event)
+        self.assertTrue(any("Upcoming event" in line for line in fixed))
+        self.assertLess(event_ticks, fixed_ticks)
+
+if __name__ == "__main__":
+    unittest.main()
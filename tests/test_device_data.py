@@ -5,7 +5,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import unittest
 from device_data.device_data import DeviceData
 from user_data.user_data import UserData
-from datetime import datetime
+from datetime import datetime, timedelta
 
 class TestDeviceData(unittest.TestCase):
 
@@ -18,5 +18,30 @@ class TestDeviceData(unittest.TestCase):
         events = self.device_data.generate_events(current_time)
         self.assertIsInstance(events, list)
 
+    def test_events_are_deltas(self):
+        # Team Meeting is at 09:00 on 2024-05-15; the user is at Home until 09:00
+        start = datetime(2024, 5, 15, 7, 0)
+        reported = {}
+        for step in range(5):  # 07:00 .. 09:00 every 30 minutes
+            current_time = start + timedelta(minutes=30 * step)
+            reported[current_time.strftime("%H:%M")] = self.device_data.generate_events(current_time)
+
+        self.assertEqual(reported["07:00"], ["Dan is currently at Home", "Upcoming event in 120 minutes: Team Meeting"])
+        self.assertEqual(reported["07:30"], [])  # Nothing changed
+        self.assertEqual(reported["08:00"], ["Upcoming event in 60 minutes: Team Meeting"])  # 60-minute threshold
+        self.assertEqual(reported["08:30"], [])
+        self.assertEqual(reported["09:00"], [
+            "Dan is currently at Work",
+            "Upcoming event in 0 minutes: Team Meeting",  # 10-minute threshold
+            "Upcoming event in 120 minutes: Project Planning",
+        ])
+
+    def test_moved_event_is_reported_again(self):
+        current_time = datetime(2024, 5, 15, 7, 0)
+        self.device_data.generate_events(current_time)
+        self.user.add_event({"date": "2024-05-15", "time": "08:00", "event": "Team Meeting", "duration": "1"})
+        events = self.device_data.generate_events(current_time + timedelta(minutes=1))
+        self.assertEqual(events, ["Upcoming event in 59 minutes: Team Meeting"])
+
 if __name__ == "__main__":
     unittest.main()
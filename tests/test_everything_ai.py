@@ -14,6 +14,7 @@ class TestEverythingAI(unittest.IsolatedAsyncioTestCase):
         self.user = UserData(name="Dan")
         self.devices = DeviceData(user=self.user)
         self.config = Config()
+        self.config.LLM_BACKEND = "mock"  # Runs offline, no API key needed
         self.everything = EVERYTHING(user=self.user, devices=self.devices, config=self.config)
 
     async def test_simulate_day(self):
@@ -0,0 +1,52 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+import shutil
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import openai
+from everything.config import Config
+from everything.fleet import run_fleet
+from user_data.manifest import load_manifest
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+
+def fake_completion(**kwargs):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="Take a short walk. normal"))])
+
+class TestFleet(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        for name in ("dan", "eve"):
+            shutil.copytree(DATA_DIR, os.path.join(self.tmp, name))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_load_manifest(self):
+        self.assertEqual([spec.name for spec in load_manifest(DATA_DIR)], ["Dan"])
+        self.assertEqual([spec.name for spec in load_manifest(self.tmp)], ["dan", "eve"])
+
+        manifest = os.path.join(self.tmp, "users.json")
+        with open(manifest, "w") as f:
+            json.dump([{"name": "Eve", "data_dir": "eve"}], f)
+        self.assertEqual(load_manifest(manifest)[0].data_dir, os.path.join(self.tmp, "eve"))
+
+    async def test_run_fleet(self):
+        with mock.patch.dict(os.environ, {"OPENAI_API_KEY": "test"}), \
+                mock.patch.object(openai.ChatCompletion, "create", side_effect=fake_completion):
+            report = await run_fleet(load_manifest(self.tmp), Config(), max_in_flight=2)
+        summary = report.summary()
+        self.assertEqual(summary["users"], 2)
+        self.assertEqual(summary["failed_users"], 0)
+        self.assertGreater(summary["ticks"], 0)
+        self.assertIn("TOTAL", report.format())
+
+if __name__ == "__main__":
+    unittest.main()
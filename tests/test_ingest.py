@@ -0,0 +1,187 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import json
+import tempfile
+import unittest
+from datetime import date, datetime
+from unittest import mock
+
+import openai
+from everything.config import Config
+from everything.everything import EVERYTHING
+from device_data.device_data import DeviceData
+from device_data.ingest import FeedIngestor, FeedServer, haversine_m, parse_record, tail_file
+from user_data.user_data import UserData
+
+def fix(timestamp, latitude, longitude, location):
+    return {"timestamp": timestamp, "latitude": latitude, "longitude": longitude, "location": location}
+
+class TestParsing(unittest.TestCase):
+
+    def test_haversine(self):
+        self.assertAlmostEqual(haversine_m(51.5074, -0.1278, 48.8566, 2.3522) / 1000, 343.5, delta=1)
+        self.assertEqual(haversine_m(51.5, -0.1, 51.5, -0.1), 0)
+
+    def test_parse_record(self):
+        self.assertEqual(parse_record('{"timestamp": "2024-05-15 22:00:00", "location": "Home"}')["kind"], "location")
+        self.assertEqual(parse_record({"date": "2024-05-15", "time": "21:00", "event": "Gig"})["kind"], "calendar")
+        self.assertIsNone(parse_record("not json"))
+        self.assertIsNone(parse_record({"timestamp": "yesterday", "location": "Home"}))
+        self.assertIsNone(parse_record({"latitude": 1}))
+        self.assertEqual(parse_record({"id": "e1", "action": "delete"})["kind"], "calendar")
+        self.assertIsNone(parse_record({"id": "e1", "action": "cancel"}))
+        self.assertIsNone(parse_record({"event": "Gig", "action": "delete"}))  # Needs an id or its start
+
+    def test_queue_created_in_loop(self):
+        ingestor = FeedIngestor(DeviceData(UserData(name="Dan")))  # No event loop running here
+        self.assertIsNone(ingestor._queue)
+
+class TestFeedIngestor(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.user = UserData(name="Dan")
+        self.devices = DeviceData(self.user)
+
+    async def ingest(self, records, **kwargs):
+        ingestor = FeedIngestor(self.devices, **kwargs)
+        runner = asyncio.create_task(ingestor.run())
+        await ingestor.consume(records)
+        await ingestor.close()
+        await runner
+        return ingestor
+
+    async def test_coalesces_nearby_fixes(self):
+        before = len(self.user.location_index)
+        ingestor = await self.ingest([
+            fix("2024-05-15 18:00:00", 51.5145, -0.0932, "Work"),  # ~13 m from the 17:00 fix
+            fix("2024-05-15 18:05:00", 51.5244, -0.0931, "Work"),  # ~1.1 km away
+            fix("2024-05-15 18:10:00", 51.5244, -0.0931, "Pub"),
+            "garbage",
+        ], coalesce_metres=25)
+        self.assertEqual(ingestor.stats["coalesced"], 1)
+        self.assertEqual(ingestor.stats["locations"], 2)
+        self.assertEqual(ingestor.stats["malformed"], 1)
+        self.assertEqual(len(self.user.location_index), before + 2)
+
+    async def test_generate_events_sees_updates(self):
+        t = datetime(2024, 5, 15, 20, 0)
+        self.devices.generate_events(t)
+        scheduled = []
+        await self.ingest([
+            fix("2024-05-15 20:10:00", 51.51, -0.13, "Cinema"),
+            {"date": "2024-05-15", "time": "21:00", "event": "Film", "duration": "2"},
+        ], on_calendar=scheduled.append)
+        events = self.devices.generate_events(datetime(2024, 5, 15, 20, 15))
+        self.assertIn("Dan is currently at Cinema", events)
+        self.assertIn("Upcoming event in 45 minutes: Film", events)
+        self.assertEqual([event.title for event in scheduled], ["Film"])
+
+    async def test_calendar_changes(self):
+        def titles_at(hour):
+            start = datetime(2024, 5, 15, hour, 0)
+            return [(event.title, event.end.hour) for event in self.user.calendar_index.starting_between(start, start)]
+
+        ingestor = await self.ingest([
+            {"date": "2024-05-15", "time": "20:00", "event": "Film", "duration": "1"},
+            {"date": "2024-05-15", "time": "20:00", "event": "Film", "duration": "2"},  # Same start and title
+            {"id": "e1", "date": "2024-05-15", "time": "18:00", "event": "Gym", "duration": "1"},
+            {"id": "e1", "date": "2024-05-15", "time": "19:00", "event": "Gym", "duration": "1"},  # Moved
+            {"id": "e2", "date": "2024-05-15", "time": "21:00", "event": "Call", "duration": "1"},
+            {"id": "e2", "action": "delete"},
+            {"date": "2024-05-15", "time": "16:00", "event": "Code Review", "action": "delete"},
+        ])
+        self.assertEqual(titles_at(20), [("Film", 22)])
+        self.assertEqual((titles_at(18), titles_at(19)), ([], [("Gym", 20)]))
+        self.assertEqual((titles_at(21), titles_at(16)), ([], []))
+        self.assertEqual(ingestor.stats["deleted"], 2)
+
+    async def test_backpressure(self):
+        ingestor = FeedIngestor(self.devices, max_queue=2)
+        await ingestor.put("{}")
+        await ingestor.put("{}")
+        with self.assertRaises(asyncio.TimeoutError):
+            await asyncio.wait_for(ingestor.put("{}"), 0.05)  # Full until run() takes some off
+
+    async def test_batching(self):
+        records = [fix(f"2024-05-15 23:{i:02d}:00", 0, i, f"Place {i}") for i in range(50)]
+        ingestor = await self.ingest(records, batch_size=20)
+        self.assertEqual(ingestor.stats["locations"], 50)
+        self.assertLessEqual(ingestor.stats["batches"], 4)
+
+    async def test_tail_file(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".jsonl", delete=False) as f:
+            f.write(json.dumps(fix("2024-05-15 22:30:00", 51.5, -0.1, "Bar")) + "\n")
+            path = f.name
+        ingestor = FeedIngestor(self.devices, batch_interval=0.01)
+        runner = asyncio.create_task(ingestor.run())
+        tailer = asyncio.create_task(ingestor.consume(tail_file(path, poll_interval=0.01)))
+        try:
+            with open(path, "a") as f:
+                line = json.dumps(fix("2024-05-15 22:45:00", 51.6, -0.1, "Club"))
+                f.write(line[:10])  # A partial line is not read until it is complete
+                f.flush()
+                await asyncio.sleep(0.05)
+                f.write(line[10:] + "\n")
+            for _ in range(100):
+                if ingestor.stats["locations"] == 2:
+                    break
+                await asyncio.sleep(0.01)
+            self.assertEqual(self.user.get_current_location(datetime(2024, 5, 15, 23, 0)), "Club")
+        finally:
+            tailer.cancel()
+            await ingestor.close()
+            await runner
+            os.remove(path)
+
+    async def test_socket(self):
+        ingestor = FeedIngestor(self.devices, batch_interval=0.01)
+        runner = asyncio.create_task(ingestor.run())
+        server = await FeedServer(ingestor).start()
+        _, writer = await asyncio.open_connection("127.0.0.1", server.port)
+        writer.write((json.dumps(fix("2024-05-15 23:00:00", 51.5, -0.2, "Station")) + "\n").encode())
+        await writer.drain()
+        writer.close()
+        for _ in range(100):
+            if ingestor.stats["locations"]:
+                break
+            await asyncio.sleep(0.01)
+        await server.stop()
+        await ingestor.close()
+        await runner
+        self.assertEqual(self.user.get_current_location(datetime(2024, 5, 15, 23, 0)), "Station")
+
+def fake_completion(**kwargs):
+    return mock.Mock(choices=[mock.Mock(message=mock.Mock(content="Take a short walk. normal"))])
+
+class TestFeedInSimulation(unittest.IsolatedAsyncioTestCase):
+
+    async def simulate(self, mode):
+        config = Config()
+        config.SIMULATION_MODE = mode
+        user = UserData(name="Dan")
+        devices = DeviceData(user)
+        self.applied = []
+        feed = FeedIngestor(devices, on_calendar=self.applied.append, on_location=self.applied.append)
+        await feed.put(fix("2024-05-15 19:10:00", 51.5, -0.1, "Gym"))
+        await feed.put({"date": "2024-05-15", "time": "20:40", "event": "Yoga", "duration": "1"})
+        ai = EVERYTHING(user, devices, config, feed=feed)
+        with self.assertLogs("everything.everything", level="INFO") as logs:
+            await ai.simulate_day(date(2024, 5, 15))
+            await ai.close()
+        return logs.output, ai.ticks
+
+    async def test_event_clock_wakes_for_feed_records(self):
+        with mock.patch.dict(os.environ, {"OPENAI_API_KEY": "test"}), \
+                mock.patch.object(openai.ChatCompletion, "create", side_effect=fake_completion):
+            fixed, fixed_ticks = await self.simulate("fixed")
+            event, event_ticks = await self.simulate("event")
+        self.assertEqual(fixed, event)
+        self.assertTrue(any("Upcoming event in 10 minutes: Yoga" in line for line in event))
+        self.assertLess(event_ticks, fixed_ticks)
+        self.assertEqual(len(self.applied), 2)  # The feed's own callbacks still run
+
+if __name__ == "__main__":
+    unittest.main()
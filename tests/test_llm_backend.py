@@ -0,0 +1,110 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import unittest
+from datetime import date
+from unittest import mock
+
+import openai
+from everything.config import Config
+from everything.everything import EVERYTHING
+from everything.fake_llm import MockBackend, MockLLMServer
+from everything.llm_backend import LLMBackend, OpenAIBackend, make_backend
+from user_data.user_data import UserData
+from device_data.device_data import DeviceData
+
+def outcomes(backend, n):
+    results = []
+    for i in range(n):
+        try:
+            backend.complete(f"prompt {i}", "model", 10, 0.0)
+            results.append("ok")
+        except openai.error.OpenAIError as e:
+            results.append(type(e).__name__)
+    return results
+
+class TestMockBackend(unittest.TestCase):
+
+    def test_reproducible_failures(self):
+        first = outcomes(MockBackend(error_rate=0.2, rate_limit_rate=0.2, seed=7), 200)
+        self.assertEqual(first, outcomes(MockBackend(error_rate=0.2, rate_limit_rate=0.2, seed=7), 200))
+        self.assertIn("RateLimitError", first)
+        self.assertIn("ServiceUnavailableError", first)
+        self.assertGreater(first.count("ok"), 80)
+
+    def test_outcomes_do_not_depend_on_order(self):
+        # Concurrent requests reach the backend in any order
+        forward = outcomes(MockBackend(error_rate=0.3, latency=1e-4, latency_sigma=1, seed=7), 50)
+        backend = MockBackend(error_rate=0.3, latency=1e-4, latency_sigma=1, seed=7)
+        backwards = [None] * 50
+        for i in reversed(range(50)):
+            try:
+                backend.complete(f"prompt {i}", "model", 10, 0.0)
+                backwards[i] = "ok"
+            except openai.error.OpenAIError as e:
+                backwards[i] = type(e).__name__
+        self.assertEqual(forward, backwards)
+        self.assertIn("ServiceUnavailableError", forward)
+
+    def test_requests_per_minute(self):
+        backend = MockBackend(requests_per_minute=3)
+        self.assertEqual(outcomes(backend, 5), ["ok"] * 3 + ["RateLimitError"] * 2)
+        self.assertEqual(backend.stats["rate_limited"], 2)
+
+    def test_stream_matches_complete(self):
+        backend = MockBackend(chunk_size=5)
+        self.assertEqual("".join(backend.stream("hi", "model", 10, 0.0)), backend.complete("hi", "model", 10, 0.0))
+
+    def test_backends_implement_both_calls(self):
+        class CompleteOnly(LLMBackend):
+            def complete(self, prompt, model, max_tokens, temperature):
+                return ""
+
+        with self.assertRaises(TypeError):
+            CompleteOnly()
+
+    def test_openai_backend_needs_key(self):
+        config = Config()
+        with mock.patch.dict(os.environ, {"OPENAI_API_KEY": ""}), mock.patch("everything.llm_backend.load_dotenv"):
+            with self.assertRaises(ValueError):
+                make_backend(config)
+        config.LLM_BACKEND = "mock"
+        self.assertIsInstance(make_backend(config), MockBackend)
+
+    def test_openai_backend_sends_key_per_request(self):
+        before = openai.api_key
+        backend = OpenAIBackend("sk-test")
+        self.assertEqual(openai.api_key, before)  # Other clients in the process keep their key
+        with mock.patch("openai.ChatCompletion.create") as create:
+            create.return_value.choices[0].message.content = "hello"
+            self.assertEqual(backend.complete("hi", "model", 10, 0.0), "hello")
+        self.assertEqual(create.call_args.kwargs["api_key"], "sk-test")
+
+class TestMockLLMServer(unittest.TestCase):
+
+    def test_openai_client_round_trip(self):
+        backend = MockBackend(requests_per_minute=2)
+        with MockLLMServer(backend) as server:
+            client = OpenAIBackend("test", api_base=server.url)
+            self.assertEqual(client.complete("hi", "model", 10, 0.0), backend.reply("hi"))
+            self.assertEqual("".join(client.stream("hi", "model", 10, 0.0)), backend.reply("hi"))
+            with self.assertRaises(openai.error.RateLimitError):
+                client.complete("hi", "model", 10, 0.0)
+
+class TestEverythingOnMock(unittest.IsolatedAsyncioTestCase):
+
+    async def test_retries_transient_errors(self):
+        config = Config()
+        config.LLM_BACKEND = "mock"
+        config.LLM_BACKOFF_BASE = 0
+        config.LLM_CACHE_ENABLED = False
+        user = UserData(name="Dan")
+        backend = MockBackend(error_rate=0.3, seed=1)
+        ai = EVERYTHING(user, DeviceData(user), config, backend=backend)
+        await ai.simulate_day(date(2024, 5, 15))
+        self.assertGreater(ai.scheduler.stats["retries"], 0)
+        self.assertEqual(backend.stats["requests"], ai.llm_calls + ai.scheduler.stats["retries"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tempfile
+import unittest
+from everything.config import Config
+from everything.llm_cache import LLMCache, MemoryCacheTier, SQLiteCacheTier, cache_key
+
+class TestLLMCache(unittest.TestCase):
+
+    def test_key_normalizes_whitespace(self):
+        self.assertEqual(
+            cache_key("gpt-3.5-turbo", 0.7, 150, "Hello\n        Dan"),
+            cache_key("gpt-3.5-turbo", 0.7, 150, "Hello Dan"),
+        )
+        self.assertNotEqual(
+            cache_key("gpt-3.5-turbo", 0.7, 150, "Hello Dan"),
+            cache_key("gpt-3.5-turbo", 0.2, 150, "Hello Dan"),
+        )
+
+    def test_lru_eviction_and_stats(self):
+        cache = LLMCache([MemoryCacheTier(max_entries=2)])
+        cache.set("a", "1")
+        cache.set("b", "2")
+        self.assertEqual(cache.get("a"), "1")  # "b" is now least recently used
+        cache.set("c", "3")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_ttl(self):
+        cache = LLMCache([MemoryCacheTier()])
+        cache.set("a", "1", ttl=-1)
+        self.assertIsNone(cache.get("a"))
+
+    def test_disk_tier_promotes_to_memory(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "cache.sqlite")
+            disk = SQLiteCacheTier(path, max_entries=2)
+            LLMCache([MemoryCacheTier(), disk]).set("a", "1")
+            memory = MemoryCacheTier()
+            cache = LLMCache([memory, disk])
+            self.assertEqual(cache.get("a"), "1")
+            self.assertEqual(memory.get("a"), "1")
+            cache.set("b", "2")
+            cache.set("c", "3")
+            self.assertEqual(len(disk), 2)
+            cache.set("c", "4")  # Replacing an entry does not evict
+            self.assertEqual((len(disk), disk.evictions), (2, 1))
+            cache.close()
+
+    def test_promotion_keeps_the_remaining_ttl(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            disk = SQLiteCacheTier(os.path.join(tmp, "cache.sqlite"))
+            disk.set("a", "1", ttl=60)
+            memory = MemoryCacheTier()
+            cache = LLMCache([memory, disk], ttl=24 * 3600)
+            self.assertEqual(cache.get("a"), "1")
+            self.assertAlmostEqual(memory.lookup("a")[1], disk.lookup("a")[1], delta=1)  # Not a fresh day
+            cache.close()
+
+    def test_hits_do_not_write(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            disk = SQLiteCacheTier(os.path.join(tmp, "cache.sqlite"), max_entries=2)
+            disk.set("a", "1", ttl=60)
+            disk.set("b", "2", ttl=60)
+            writes = disk._conn.total_changes
+            for _ in range(10):
+                self.assertEqual(disk.get("a"), "1")
+            self.assertEqual(disk._conn.total_changes, writes)
+            disk.set("c", "3", ttl=60)  # The hits on "a" count: "b" is least recently used
+            self.assertIsNone(disk.get("b"))
+            self.assertEqual(disk.get("a"), "1")
+            disk.close()
+
+    def test_off_by_default(self):
+        self.assertIsNone(LLMCache.from_config(Config()))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,177 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import threading
+import unittest
+from datetime import date
+
+from everything.config import Config
+from everything.everything import EVERYTHING
+from everything.fake_llm import MockBackend
+from everything.llm_scheduler import LLMScheduler, Priority, TokenBucket
+from user_data.user_data import UserData
+from device_data.device_data import DeviceData
+
+class TransientError(Exception):
+    pass
+
+class TestLLMScheduler(unittest.IsolatedAsyncioTestCase):
+
+    async def test_priority_lanes(self):
+        scheduler = LLMScheduler(max_concurrency=1)
+        order = []
+        gate = asyncio.Event()
+
+        async def blocker():
+            await gate.wait()
+
+        def call(name):
+            async def run():
+                order.append(name)
+            return run
+
+        first = asyncio.create_task(scheduler.submit(blocker))
+        await asyncio.sleep(0)
+        queued = [
+            asyncio.create_task(scheduler.submit(call("background"), Priority.BACKGROUND)),
+            asyncio.create_task(scheduler.submit(call("normal"), Priority.NORMAL)),
+            asyncio.create_task(scheduler.submit(call("urgent"), Priority.URGENT)),
+        ]
+        await asyncio.sleep(0)
+        gate.set()
+        await asyncio.gather(first, *queued)
+        self.assertEqual(order, ["urgent", "normal", "background"])
+        scheduler.close()
+
+    async def test_concurrency_cap(self):
+        scheduler = LLMScheduler(max_concurrency=2)
+        running = 0
+        peak = 0
+
+        async def call():
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+        await asyncio.gather(*(scheduler.submit(call) for _ in range(6)))
+        self.assertEqual(peak, 2)
+        scheduler.close()
+
+    async def test_retry_then_success(self):
+        scheduler = LLMScheduler(max_retries=2, backoff_base=0.001, retry_on=(TransientError,))
+        attempts = []
+
+        def call():  # Blocking calls run on the scheduler's thread pool
+            attempts.append(1)
+            if len(attempts) < 3:
+                raise TransientError()
+            return "ok"
+
+        self.assertEqual(await scheduler.submit(call), "ok")
+        self.assertEqual(scheduler.stats["retries"], 2)
+        scheduler.close()
+
+    async def test_timeout_exhausts_retries(self):
+        scheduler = LLMScheduler(timeout=0.01, max_retries=1, backoff_base=0.001)
+
+        async def call():
+            await asyncio.sleep(1)
+
+        with self.assertRaises(asyncio.TimeoutError):
+            await scheduler.submit(call)
+        self.assertEqual(scheduler.stats["timeouts"], 2)
+        self.assertEqual(scheduler.stats["failures"], 1)
+        scheduler.close()
+
+    async def test_token_bucket_waits_for_refill(self):
+        bucket = TokenBucket(rate_per_minute=6000, capacity=10)  # 100 tokens/s
+        await bucket.acquire(10)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        await bucket.acquire(5)
+        self.assertGreaterEqual(loop.time() - started, 0.04)
+
+    async def test_token_bucket_serves_priority_first(self):
+        bucket = TokenBucket(rate_per_minute=600, capacity=1)  # 10 tokens/s
+        await bucket.acquire(1)
+        order = []
+
+        async def take(name, priority):
+            await bucket.acquire(1, priority)
+            order.append(name)
+
+        background = asyncio.create_task(take("background", Priority.BACKGROUND))
+        await asyncio.sleep(0)
+        await asyncio.gather(background, take("urgent", Priority.URGENT))
+        self.assertEqual(order, ["urgent", "background"])
+
+    async def test_rate_limits_are_taken_before_a_slot(self):
+        scheduler = LLMScheduler(max_concurrency=1, requests_per_minute=600)
+        scheduler.request_bucket._tokens = 0  # Empty: the next request waits ~0.1s
+
+        async def call():
+            return "ok"
+
+        waiting = asyncio.create_task(scheduler.submit(call))
+        await asyncio.sleep(0.01)
+        self.assertEqual(scheduler._active, 0)  # Not holding a slot while it waits for the bucket
+        self.assertEqual(await waiting, "ok")
+        scheduler.close()
+
+    async def test_cancelled_waiter_does_not_leak_its_slot(self):
+        scheduler = LLMScheduler(max_concurrency=1)
+        gate = asyncio.Event()
+
+        async def blocker():
+            await gate.wait()
+
+        async def call():
+            return "ok"
+
+        first = asyncio.create_task(scheduler.submit(blocker))
+        await asyncio.sleep(0)
+        queued = asyncio.create_task(scheduler.submit(call))
+        await asyncio.sleep(0)
+        waiter = scheduler._waiters[0][2]
+        gate.set()
+        while not waiter.done():  # The slot is handed to the queued call...
+            await asyncio.sleep(0)
+        queued.cancel()  # ...which is cancelled before it runs
+        await first
+        self.assertEqual(await asyncio.wait_for(scheduler.submit(call), 1), "ok")  # Hangs if the slot leaked
+        self.assertEqual(scheduler._active, 0)
+        scheduler.close()
+
+    async def test_hung_blocking_call_keeps_its_slot(self):
+        scheduler = LLMScheduler(max_concurrency=1, timeout=0.05, max_retries=0)
+        gate = threading.Event()
+
+        with self.assertRaises(asyncio.TimeoutError):
+            await scheduler.submit(gate.wait)  # The thread keeps running after the timeout
+        self.assertEqual(scheduler.stats["abandoned"], 1)
+
+        second = asyncio.create_task(scheduler.submit(lambda: "ok"))
+        await asyncio.sleep(0.1)  # Longer than the timeout: waiting for the slot is not timed
+        self.assertFalse(second.done())
+        gate.set()
+        self.assertEqual(await second, "ok")
+        self.assertEqual(scheduler.stats["timeouts"], 1)
+        scheduler.close()
+
+    async def test_everything_closes_its_own_scheduler(self):
+        config = Config()
+        config.LLM_BACKEND = "mock"
+        shared = LLMScheduler()
+        for scheduler in (None, shared):
+            user = UserData(name="Dan")
+            async with EVERYTHING(user, DeviceData(user), config, backend=MockBackend(), scheduler=scheduler) as ai:
+                await ai.simulate_day(date(2024, 5, 15))
+            self.assertEqual(ai.scheduler._executor._shutdown, scheduler is None)
+        shared.close()
+
+if __name__ == "__main__":
+    unittest.main()
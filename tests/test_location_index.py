@@ -0,0 +1,55 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import unittest
+from datetime import datetime
+from user_data.location_index import LocationIndex
+
+ROWS = [
+    {"timestamp": "2024-05-15 07:00:00", "latitude": "51.5074", "longitude": "-0.1278", "location": "Home"},
+    {"timestamp": "2024-05-15 09:00:00", "latitude": "51.5144", "longitude": "-0.0931", "location": "Work"},
+    {"timestamp": "2024-05-15 13:00:00", "latitude": "51.518", "longitude": "-0.12", "location": "Coffee Shop"},
+]
+
+class TestLocationIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = LocationIndex.from_rows(ROWS)
+
+    def test_location_at(self):
+        self.assertEqual(self.index.location_at(datetime(2024, 5, 15, 6, 59)), "Unknown")
+        self.assertEqual(self.index.location_at(datetime(2024, 5, 15, 7, 0)), "Home")
+        self.assertEqual(self.index.location_at(datetime(2024, 5, 15, 12, 59)), "Work")
+        self.assertEqual(self.index.location_at(datetime(2024, 5, 16)), "Coffee Shop")
+
+    def test_unsorted_rows(self):
+        index = LocationIndex.from_rows(reversed(ROWS))
+        self.assertEqual(index.location_at(datetime(2024, 5, 15, 10, 0)), "Work")
+
+    def test_append(self):
+        self.index.append(datetime(2024, 5, 15, 14, 0), "Work", 51.5144, -0.0931)
+        self.index.append(datetime(2024, 5, 15, 8, 0), "Gym")  # late fix
+        self.assertEqual(len(self.index), 5)
+        self.assertEqual(self.index.location_at(datetime(2024, 5, 15, 8, 30)), "Gym")
+        fix = self.index.latest_at(datetime(2024, 5, 15, 15, 0))
+        self.assertEqual(fix.location, "Work")
+        self.assertEqual(fix.timestamp, datetime(2024, 5, 15, 14, 0))
+
+    def test_first_fix_wins_ties(self):
+        # As in the original scan, which only replaced a fix with a strictly later one
+        self.index.append(datetime(2024, 5, 15, 13, 0), "Park")
+        self.assertEqual(self.index.location_at(datetime(2024, 5, 15, 14, 0)), "Coffee Shop")
+        self.assertEqual(self.index.latest_at(datetime(2024, 5, 15, 13, 0)).location, "Coffee Shop")
+        self.index.append(datetime(2024, 5, 15, 9, 0), "Gym")  # late fix at a taken time
+        self.assertEqual(self.index.location_at(datetime(2024, 5, 15, 10, 0)), "Work")
+
+    def test_window(self):
+        times, codes = self.index.window(datetime(2024, 5, 15, 10, 0), datetime(2024, 5, 15, 12, 0))
+        self.assertEqual(len(times), 1)  # Only the 09:00 fix is in effect
+        self.assertEqual(self.index.columns()[4][codes[0]], "Work")
+        times, _ = self.index.window(datetime(2024, 5, 15, 6, 0), datetime(2024, 5, 15, 9, 0))
+        self.assertEqual(len(times), 2)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,181 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+import re
+import shutil
+import tempfile
+import unittest
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+from everything.classifier import Recommendation
+from everything.config import Config
+from everything.everything import EVERYTHING
+from everything.fake_llm import MockBackend
+from everything.memory import RecommendationMemory, VectorIndex, embed
+from user_data.user_data import UserData
+from device_data.device_data import DeviceData
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+MORNING = datetime(2024, 5, 15, 9, 0)
+
+def walk(text="Take a short walk around the block"):
+    return Recommendation(text, "normal")
+
+def reply(prompt):
+    """The same walk, slightly reworded, for every recommendation slot."""
+    match = re.search(r"Current time: (\d\d:\d\d [AP]M)", prompt)
+    if match and "personalised recommendation" in prompt:
+        return json.dumps({"recommendation": f"Take a short walk around the block ({match.group(1)})", "classification": "normal"})
+    return "Sounds good."
+
+IDEAS = [
+    "Drink a glass of water", "Call your mother", "Stretch your back", "Plan tomorrow's meals",
+    "Read a chapter", "Tidy your desk", "Book a haircut",
+]
+
+def distinct(prompt):
+    """A different idea for each recommendation slot."""
+    match = re.search(r"Current time: (\d\d):\d\d ([AP])M", prompt)
+    if match and "personalised recommendation" in prompt:
+        hour = int(match.group(1)) % 12 + (12 if match.group(2) == "P" else 0)
+        return json.dumps({"recommendation": IDEAS[hour % 7], "classification": "normal"})
+    return "Sounds good."
+
+class TestEmbedding(unittest.TestCase):
+
+    def test_similarity(self):
+        self.assertAlmostEqual(float(embed("Take a walk.") @ embed("take a WALK!")), 1.0, places=5)
+        self.assertGreater(float(embed("Take a short walk around the block") @ embed("Take a short walk around the park")), 0.8)
+        self.assertLess(float(embed("Drink some water") @ embed("Call your mother")), 0.3)
+        self.assertFalse(embed("...").any())
+
+    def test_index_finds_neighbours(self):
+        rng = np.random.default_rng(1)
+        vectors = rng.standard_normal((200, 64)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        index = VectorIndex(64, 200)
+        for row, vector in enumerate(vectors):
+            index.set(row, vector)
+        for row in range(0, 200, 10):
+            self.assertEqual(index.search(vectors[row])[0][0], row)
+        index.remove(0)
+        self.assertNotIn(0, [row for row, _ in index.search(vectors[0], k=5)])
+        self.assertEqual(len(index), 199)
+
+class TestRecommendationMemory(unittest.TestCase):
+
+    def test_repeats_are_suppressed_until_the_window_passes(self):
+        memory = RecommendationMemory(repeat_hours=12)
+        self.assertTrue(memory.remember(walk(), "Work morning", MORNING))
+        self.assertFalse(memory.remember(walk("Take a short walk around the block!"), "Work afternoon", MORNING + timedelta(hours=3)))
+        self.assertTrue(memory.remember(Recommendation("Drink some water", "normal"), "Work afternoon", MORNING + timedelta(hours=3)))
+        self.assertTrue(memory.remember(walk(), "Work morning", MORNING + timedelta(days=1)))
+        self.assertEqual(len(memory), 2)
+        self.assertEqual(memory.stats["suppressed"], 1)
+        self.assertEqual(memory.stats["repeated"], 1)
+
+    def test_recall_by_context(self):
+        memory = RecommendationMemory(repeat_hours=12, reuse_limit=2)
+        memory.remember(walk(), "Work afternoon", MORNING)
+        tomorrow = MORNING + timedelta(days=1)
+        self.assertEqual(memory.recall("Work afternoon", tomorrow), walk())
+        self.assertIsNone(memory.recall("Gym evening Spin class", tomorrow))
+        # Still in the repeat window: publishing it would be suppressed, so ask the LLM
+        self.assertIsNone(memory.recall("Work afternoon", MORNING + timedelta(hours=3)))
+        # Shown reuse_limit times: time for something new
+        memory.remember(walk(), "Work afternoon", tomorrow)
+        self.assertIsNone(memory.recall("Work afternoon", MORNING + timedelta(days=2)))
+        self.assertEqual(memory.stats["recalled"], 1)
+
+    def test_evicts_least_recently_shown(self):
+        memory = RecommendationMemory(capacity=3)
+        texts = ["Drink some water", "Call your mother", "Stretch your legs", "Read a chapter"]
+        for hours, text in enumerate(texts):
+            memory.remember(Recommendation(text, "normal"), text, MORNING + timedelta(hours=hours))
+        self.assertEqual([r.text for r in memory.recent(3)], texts[1:])
+        self.assertEqual(memory.stats["evictions"], 1)
+        self.assertIsNone(memory.recall("Drink some water", MORNING + timedelta(days=1)))
+
+    def test_save_and_load(self):
+        memory = RecommendationMemory()
+        memory.remember(walk(), "Work morning", MORNING)
+        memory.remember(Recommendation("Book the dentist", "important", "14:00", 0.5), "Home evening", MORNING)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "recommendations.npz")
+            memory.save(path)
+            loaded = RecommendationMemory(capacity=1)
+            loaded.load(path)
+        self.assertEqual(loaded.recent(5), [Recommendation("Book the dentist", "important", "14:00", 0.5)])
+        self.assertFalse(loaded.remember(Recommendation("Book the dentist!", "important"), "Home", MORNING))
+
+class TestEverythingMemory(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        shutil.copytree(DATA_DIR, os.path.join(self.tmp, "dan"))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    async def simulate(self, memory, day=date(2024, 5, 15), replies=reply):
+        config = Config()
+        config.LLM_BACKEND = "mock"
+        if memory is not None:
+            config.RECOMMENDATION_MEMORY = memory
+        config.RECOMMENDATION_MEMORY_PATH = "recommendations.npz"
+        user = UserData("Dan", os.path.join(self.tmp, "dan"))
+        ai = EVERYTHING(user, DeviceData(user), config, backend=MockBackend(replies))
+        await ai.simulate_day(day)
+        await ai.close()
+        return ai
+
+    async def test_default_config_shows_every_recommendation(self):
+        ai = await self.simulate(None)  # Config's default
+        self.assertIsNone(ai.memory)
+        self.assertEqual(len(ai.recommendations), 5)  # Even the reworded walks: each one cost a call
+        ai = await self.simulate(None, replies=distinct)
+        self.assertEqual(len(set(ai.recommendations)), 5)
+
+    async def test_distinct_recommendations_get_through(self):
+        ai = await self.simulate(True, replies=distinct)
+        self.assertEqual(len(set(ai.recommendations)), 5)
+        self.assertEqual(ai.memory.stats["suppressed"], 0)
+
+    async def test_no_repeats(self):
+        ai = await self.simulate(True)
+        self.assertEqual(len(ai.recommendations), 1)  # Every other slot repeats the first walk
+        self.assertEqual(ai.memory.stats["suppressed"], 4)
+
+    async def test_recent_recommendations_in_prompt(self):
+        ai = await self.simulate(True)
+        prompt = ai._recommendation_prompt(datetime(2024, 5, 15, 16, 0))
+        self.assertIn("Do not repeat these recent recommendations", prompt)
+        self.assertIn(ai.recommendations[0], prompt)
+        self.assertNotIn("Do not repeat", ai._recommendation_prompt(datetime(2024, 5, 16, 16, 0)))
+
+    async def test_persists_across_days(self):
+        await self.simulate(True)
+        self.assertTrue(os.path.exists(os.path.join(self.tmp, "dan", "recommendations.npz")))
+        ai = await self.simulate(True, date(2024, 5, 16))
+        self.assertEqual(ai.memory.stats["new"], 0)  # Yesterday's walk is repeated, not stored again
+        self.assertEqual(ai.memory.stats["recalled"], 0)  # No slot recalls what it would then suppress
+
+    async def test_recalled_recommendations_are_shown(self):
+        await self.simulate(True)
+        path = os.path.join(self.tmp, "dan", "recommendations.npz")
+        memory = RecommendationMemory()
+        memory.load(path)
+        memory.last_shown -= timedelta(days=1).total_seconds()  # As if the day were yesterday
+        memory.save(path)
+        without = await self.simulate(False)
+        ai = await self.simulate(True)
+        self.assertEqual(ai.memory.stats["recalled"], 1)  # Only the first slot's context matches
+        self.assertEqual(ai.recommendations, [memory.recent(1)[0].text])
+        self.assertEqual(ai.llm_calls, without.llm_calls - 1)
+
+if __name__ == "__main__":
+    unittest.main()
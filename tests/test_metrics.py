@@ -0,0 +1,143 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import unittest
+import urllib.request
+from datetime import date
+
+from everything.config import Config
+from everything.everything import EVERYTHING
+from everything.fake_llm import MockBackend
+from everything.llm_scheduler import LLMScheduler
+from metrics.metrics import METRICS, MetricsRegistry, MetricsServer, _Metric
+from user_data.user_data import UserData
+from device_data.device_data import DeviceData
+
+class TestMetricsRegistry(unittest.TestCase):
+
+    def test_disabled_records_nothing(self):
+        registry = MetricsRegistry()
+        counter = registry.counter("calls", "Calls")
+        histogram = registry.histogram("latency_seconds", "Latency")
+        counter.inc()
+        histogram.observe(1.0)
+        with histogram.time(), registry.start_span("work") as span:
+            span.set_attribute("ignored", True)
+        self.assertEqual(counter.value, 0)
+        self.assertEqual(histogram.count, 0)
+        self.assertEqual(len(registry.spans), 0)
+
+    def test_exposition(self):
+        registry = MetricsRegistry(enabled=True)
+        counter = registry.counter("llm_errors", "Failed calls", ("call_type",))
+        counter.labels("event").inc()
+        counter.labels(call_type="event").inc(2)
+        histogram = registry.histogram("tick_seconds", "Tick time", buckets=(0.1, 1))
+        histogram.observe(0.05)
+        histogram.observe(0.5)
+        histogram.observe(5)
+        text = registry.exposition()
+        self.assertIn("# TYPE llm_errors counter", text)
+        self.assertIn('llm_errors_total{call_type="event"} 3', text)
+        self.assertIn('tick_seconds_bucket{le="0.1"} 1', text)
+        self.assertIn('tick_seconds_bucket{le="1.0"} 2', text)
+        self.assertIn('tick_seconds_bucket{le="+Inf"} 3', text)
+        self.assertIn("tick_seconds_count 3", text)
+        self.assertIs(registry.counter("llm_errors", "Failed calls", ("call_type",)), counter)
+        with self.assertRaises(ValueError):
+            registry.gauge("llm_errors", "Clash")
+
+    def test_metric_kinds_must_sample(self):
+        class Incomplete(_Metric):
+            kind = "untyped"
+
+        with self.assertRaises(TypeError):
+            Incomplete(MetricsRegistry(), "incomplete", "Has no samples")
+
+    def test_span_nesting_across_tasks(self):
+        registry = MetricsRegistry(enabled=True)
+
+        async def child():
+            with registry.start_span("child"):
+                pass
+
+        async def run():
+            with registry.start_span("parent") as parent:
+                await asyncio.gather(child(), child())
+            return parent
+
+        parent = asyncio.run(run())
+        children = [span for span in registry.spans if span.name == "child"]
+        self.assertEqual(len(children), 2)
+        self.assertTrue(all(span.parent_id == parent.span_id for span in children))
+        self.assertTrue(all(span.trace_id == parent.trace_id for span in children))
+        self.assertIsNotNone(parent.duration)
+
+    def test_server(self):
+        registry = MetricsRegistry(enabled=True)
+        registry.gauge("in_flight", "Calls in flight").set(4)
+        server = MetricsServer(registry, port=0).start()
+        try:
+            with urllib.request.urlopen(server.url) as response:
+                self.assertIn("in_flight 4", response.read().decode())
+        finally:
+            server.stop()
+
+class TestInstrumentation(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        METRICS.enabled = True
+
+    def tearDown(self):
+        METRICS.enabled = False
+
+    async def test_simulate_day(self):
+        ticks = METRICS.get("tick_seconds")
+        lookups = METRICS.get("user_data_lookup_seconds").labels("location")
+        requests = METRICS.get("llm_request_seconds").labels("tasks")
+        misses = METRICS.get("llm_cache_lookups").labels("miss", "none")
+        before = (ticks.count, lookups.count, requests.count, misses.value)
+
+        config = Config()
+        config.LLM_BACKEND = "mock"
+        config.LLM_CACHE_ENABLED = True
+        user = UserData(name="Dan")
+        ai = EVERYTHING(user, DeviceData(user), config, backend=MockBackend())
+        await ai.simulate_day(date(2024, 5, 15))
+
+        self.assertEqual(ticks.count - before[0], ai.ticks)
+        self.assertGreaterEqual(lookups.count - before[1], ai.ticks)
+        self.assertEqual(requests.count - before[2], 1)
+        self.assertGreater(misses.value - before[3], 0)
+        day = [span for span in METRICS.spans if span.name == "simulate_day"][-1]
+        self.assertTrue(any(span.parent_id == day.span_id and span.name == "tick" for span in METRICS.spans))
+
+    async def test_streamed_calls_are_traced(self):
+        config = Config()
+        config.LLM_BACKEND = "mock"
+        config.LLM_STREAMING = True
+        user = UserData(name="Dan")
+        ai = EVERYTHING(user, DeviceData(user), config, backend=MockBackend())
+        await ai.simulate_day(date(2024, 5, 15))
+        streamed = [span for span in METRICS.spans if span.name == "llm.query" and span.attributes.get("stream")]
+        self.assertIn("greeting", {span.attributes["call_type"] for span in streamed})
+        self.assertTrue(all(span.duration is not None for span in streamed))
+
+    async def test_retries_by_call_type(self):
+        timeouts = METRICS.get("llm_timeouts").labels("tasks")
+        retries = METRICS.get("llm_retries").labels("tasks")
+        before = (timeouts.value, retries.value)
+        scheduler = LLMScheduler(timeout=0.01, max_retries=1, backoff_base=0.001)
+
+        async def call():
+            await asyncio.sleep(1)
+
+        with self.assertRaises(asyncio.TimeoutError):
+            await scheduler.submit(call, call_type="tasks")
+        scheduler.close()
+        self.assertEqual((timeouts.value - before[0], retries.value - before[1]), (2, 1))
+
+if __name__ == "__main__":
+    unittest.main()
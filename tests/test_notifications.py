@@ -0,0 +1,158 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import json
+import logging
+import tempfile
+import threading
+import unittest
+from datetime import date, datetime
+
+from everything.config import Config
+from everything.everything import EVERYTHING
+from everything.fake_llm import MockBackend
+from everything.notifications import ConsoleSink, JSONLinesSink, Notification, NotificationSink, Notifier
+from user_data.user_data import UserData
+from device_data.device_data import DeviceData
+
+T = datetime(2024, 5, 15, 7, 30)
+
+class Collect(NotificationSink):
+    """Records batches; blocks the writer until released if gated."""
+
+    def __init__(self, gated=False):
+        self.batches = []
+        self.gate = threading.Event()
+        if not gated:
+            self.gate.set()
+
+    def write(self, batch):
+        self.gate.wait()
+        self.batches.append(list(batch))
+
+def note(i, template="Tip {i}"):
+    return Notification("Dan", T, "recommendation", template, {"i": i})
+
+class TestNotifier(unittest.TestCase):
+
+    def test_lazy_formatting(self):
+        sink = Collect()
+        notifier = Notifier([sink])
+        notifier.emit(Notification("Dan", T, "suggestion", "I suggest: {text}", {"text": "use {braces}"}))
+        notifier.close()
+        record = sink.batches[0][0]
+        self.assertIsNone(record._text)  # No sink needed the text
+        self.assertEqual(record.text, "I suggest: use {braces}")
+
+        eager = Notifier([Collect()], lazy=False)
+        eager.emit(note(1))
+        eager.close()
+        self.assertEqual(eager.sinks[0].batches[0][0]._text, "Tip 1")
+
+    def test_sinks_must_write(self):
+        class Incomplete(NotificationSink):
+            pass
+
+        with self.assertRaises(TypeError):
+            Incomplete()
+
+    def test_batches_in_order(self):
+        sink = Collect()
+        notifier = Notifier([sink], batch_size=10, flush_interval=1)
+        for i in range(25):
+            notifier.emit(note(i))
+        notifier.close()
+        self.assertEqual([len(batch) for batch in sink.batches], [10, 10, 5])
+        self.assertEqual([record.payload["i"] for batch in sink.batches for record in batch], list(range(25)))
+
+    def test_drop_policies(self):
+        for policy, kept in (("drop_newest", [0, 1, 2]), ("drop_oldest", [0, 3, 4])):
+            sink = Collect(gated=True)
+            notifier = Notifier([sink], max_queue=2, batch_size=1, drop_policy=policy)
+            notifier.emit(note(0))
+            while notifier._queue.qsize():  # The writer holds record 0 until the gate opens
+                pass
+            for i in range(1, 5):
+                notifier.emit(note(i))
+            sink.gate.set()
+            notifier.close()
+            self.assertEqual([batch[0].payload["i"] for batch in sink.batches], kept, policy)
+            self.assertEqual(notifier.dropped, 2)
+        with self.assertRaises(ValueError):
+            Notifier([], drop_policy="sometimes")
+
+    def test_console_and_json_lines(self):
+        logger = logging.getLogger("test_notifications.console")
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "notifications.jsonl")
+            notifier = Notifier([ConsoleSink(logger), JSONLinesSink(path)])
+            with self.assertLogs(logger, level="INFO") as logs:
+                notifier.emit(Notification("Dan", T, "event", "Heads up, {user}! {event}", {"event": "Gym"}, section=True))
+                notifier.emit(Notification("Dan", T, "brain", "Generated recommendation: {text}", {"text": "Walk"}))
+                notifier.close()
+            with open(path) as f:
+                lines = [json.loads(line) for line in f]
+        self.assertEqual(logs.output, [
+            "INFO:test_notifications.console:\n[07:30 AM] [NOTIFICATION] Heads up, Dan! Gym",
+            "INFO:test_notifications.console:[07:30 AM] [AI's Brain] Generated recommendation: Walk",
+        ])
+        self.assertEqual(lines[0], {
+            "user": "Dan", "timestamp": "2024-05-15T07:30:00", "kind": "event",
+            "payload": {"event": "Gym"}, "text": "Heads up, Dan! Gym",
+        })
+
+class TestEverythingNotifications(unittest.IsolatedAsyncioTestCase):
+
+    async def test_day_as_json_lines(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            config = Config()
+            config.LLM_BACKEND = "mock"
+            config.NOTIFICATION_PATH = os.path.join(tmp, "notifications.jsonl")
+            user = UserData(name="Dan")
+            ai = EVERYTHING(user, DeviceData(user), config, backend=MockBackend())
+            await ai.simulate_day(date(2024, 5, 15))
+            await ai.close()
+            with open(config.NOTIFICATION_PATH) as f:
+                records = [json.loads(line) for line in f]
+        kinds = [record["kind"] for record in records]
+        self.assertEqual(kinds[:3], ["greeting", "overview", "tasks"])
+        self.assertIn("event", kinds)
+        self.assertEqual(kinds[-1], "user_response")
+        self.assertTrue(all(record["user"] == "Dan" for record in records))
+
+    async def test_close_releases_own_notifier(self):
+        def writers():
+            return sum(1 for thread in threading.enumerate() if thread.name == "notifier")
+
+        config = Config()
+        config.LLM_BACKEND = "mock"
+        running = writers()
+        shared = Notifier([Collect()])
+        for notifier in (None, None, shared):
+            user = UserData(name="Dan")
+            async with EVERYTHING(user, DeviceData(user), config, backend=MockBackend(), notifier=notifier) as ai:
+                await ai.simulate_day(date(2024, 5, 15))
+        self.assertEqual(writers(), running + 1)  # Only the shared one, which belongs to the caller
+        self.assertIsNotNone(shared._thread)
+        shared.close()
+        self.assertEqual(Notifier([]).drop_policy, "drop_oldest")  # emit() never waits by default
+
+    async def test_shared_notifier_is_not_flushed_per_user(self):
+        config = Config()
+        config.LLM_BACKEND = "mock"
+        sink = Collect(gated=True)
+        shared = Notifier([sink])
+        shared.emit(note(1))  # Another user's batch, stuck in a slow sink for a while
+        asyncio.get_running_loop().call_later(2, sink.gate.set)
+        user = UserData(name="Dan")
+        async with EVERYTHING(user, DeviceData(user), config, backend=MockBackend(), notifier=shared) as ai:
+            await ai.simulate_day(date(2024, 5, 15))
+            self.assertFalse(sink.gate.is_set())  # The day ended without waiting for that sink
+        sink.gate.set()
+        shared.close()
+        self.assertGreater(sum(len(batch) for batch in shared.sinks[0].batches), 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+import re
+import unittest
+from datetime import date, datetime
+from types import SimpleNamespace
+from unittest import mock
+
+import openai
+from everything.config import Config
+from everything.everything import EVERYTHING
+from everything.fake_llm import MockBackend
+from everything.planner import SlotState, parse_day_plan
+from user_data.user_data import UserData
+from device_data.device_data import DeviceData
+
+NINE = datetime(2024, 5, 15, 9, 0)
+NOON = datetime(2024, 5, 15, 12, 0)
+STATES = {NINE: SlotState("Work", ()), NOON: SlotState("Work", ())}
+
+def fake_completion(**kwargs):
+    prompt = kwargs["messages"][0]["content"]
+    if prompt.startswith("Plan today"):
+        slots = re.findall(r'"time":"(\d\d:\d\d)"', prompt)
+        content = json.dumps([
+            {"time": slot, "recommendation": f"Stretch at {slot}", "classification": "normal"} for slot in slots
+        ])
+    else:
+        content = "Sounds good."
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+class TestDayPlan(unittest.TestCase):
+
+    def test_parse_day_plan(self):
+        response = 'Here you go: [{"time": "09:00", "recommendation": "Walk", "classification": "Normal"},' \
+                   ' {"time": "12:00", "recommendation": "Lunch", "classification": "whenever"},' \
+                   ' {"time": "13:00", "recommendation": "Nap", "classification": "normal"}]'
+        plan = parse_day_plan(response, STATES)
+        self.assertEqual(len(plan), 1)  # Bad classification and unknown slot are dropped
+        self.assertEqual(plan.release(NINE, STATES[NINE]).recommendation.text, "Walk")
+        self.assertIsNone(plan.release(NINE, STATES[NINE]))  # Released only once
+
+    def test_diverged_state_is_not_released(self):
+        plan = parse_day_plan('[{"time": "12:00", "recommendation": "Lunch", "classification": "normal"}]', STATES)
+        self.assertIsNone(plan.release(NOON, SlotState("Coffee Shop", ())))
+
+    def test_invalid_json(self):
+        self.assertEqual(len(parse_day_plan("Sorry, I can't do that.", STATES)), 0)
+
+class TestBatchedRecommendations(unittest.IsolatedAsyncioTestCase):
+
+    async def simulate(self, mode):
+        config = Config()
+        config.RECOMMENDATION_MODE = mode
+        config.RECOMMENDATION_TIMING = "fixed"  # The fake plan answers for the fixed hours
+        config.RECOMMENDATION_MEMORY = False  # The planned "Stretch at HH:MM" texts would count as repeats
+        user = UserData(name="Dan")
+        with mock.patch.dict(os.environ, {"OPENAI_API_KEY": "test"}), \
+                mock.patch.object(openai.ChatCompletion, "create", side_effect=fake_completion) as create:
+            ai = EVERYTHING(user, DeviceData(user), config)
+            await ai.simulate_day(date(2024, 5, 15))
+        return ai, create
+
+    async def test_one_call_for_all_slots(self):
+        ai, create = await self.simulate("batched")
+        plans = [call for call in create.call_args_list if call.kwargs["messages"][0]["content"].startswith("Plan today")]
+        self.assertEqual(len(plans), 1)
+        self.assertEqual(plans[0].kwargs["max_tokens"], Config.LLM_PLAN_MAX_TOKENS)
+        self.assertEqual(len(ai.recommendations), 5)  # Start of day + 4 recommendation hours
+        self.assertTrue(ai.recommendations[1].startswith("Stretch at 09:00"))
+
+        _, per_slot = await self.simulate("per_slot")
+        self.assertLess(create.call_count, per_slot.call_count)
+
+    async def test_mock_backend_plans_the_day(self):
+        calls = {}
+        for mode in ("per_slot", "batched"):
+            config = Config()
+            config.RECOMMENDATION_MODE = mode
+            user = UserData(name="Dan")
+            ai = EVERYTHING(user, DeviceData(user), config, backend=MockBackend())
+            await ai.simulate_day(date(2024, 5, 15))
+            await ai.close()
+            calls[mode] = ai.llm_calls
+        self.assertLess(calls["batched"], calls["per_slot"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import unittest
+from datetime import datetime
+from everything.config import Config
+from everything.prompts import PromptBuilder, project
+from user_data.user_data import UserData
+
+NOW = datetime(2024, 5, 15, 9, 0)
+
+class TestPromptBuilder(unittest.TestCase):
+
+    def setUp(self):
+        self.user = UserData(name="Dan")
+        self.config = Config()
+        self.builder = PromptBuilder(self.user, self.config)
+
+    def test_project(self):
+        profile = self.user.profile
+        self.assertEqual(project(profile, "fitness_data.sleep.last_night"), "7h 45m")
+        self.assertEqual(project(profile, "purchases.*.item")[0], "Running Shoes")
+        self.assertIsNone(project(profile, "missing.path"))
+
+    def test_projection_and_savings(self):
+        prompt = self.builder.recommendation("Work", NOW)
+        self.assertIn('"playlists":{"name":["Morning Motivation"', prompt)
+        self.assertNotIn("justdan@gmail.com", prompt)  # Not needed for recommendations
+        savings = self.builder.savings()["recommendation"]
+        self.assertEqual(savings["calls"], 1)
+        self.assertGreater(savings["avg_tokens_saved"], 0)
+
+    def test_context_memoized_until_profile_changes(self):
+        self.builder.event("Team Meeting", "Home", NOW)
+        block = self.builder._contexts[("event", len(self.builder.projections["event"]))]
+        self.builder.event("Team Meeting", "Home", NOW)
+        self.assertIs(self.builder._contexts[("event", len(self.builder.projections["event"]))], block)
+        self.user.profile["profession"] = "architect"  # Edited in place
+        self.assertIn("architect", self.builder.event("Team Meeting", "Home", NOW))
+        self.user.profile["fitness_data"]["last_workout"]["type"] = "Cycling"
+        self.assertIn("Cycling", self.builder.event("Team Meeting", "Home", NOW))
+
+    def test_tasks_savings_count_the_calendar(self):
+        def saved(calendar):
+            builder = PromptBuilder(self.user, self.config)
+            builder.tasks(calendar, NOW)
+            return builder.savings()["tasks"]["avg_tokens_saved"]
+
+        # The compact calendar is shorter than its str() in the baseline prompt
+        self.assertGreater(saved(self.user.get_upcoming_events(hours=24, current_time=NOW)), saved([]))
+
+    def test_token_budget_drops_fields(self):
+        self.config.LLM_CONTEXT_TOKENS = self.config.LLM_MAX_TOKENS + 200
+        prompt = self.builder.recommendation("Work", NOW)
+        self.assertLessEqual(len(prompt) // 4 + 1, 200)
+        self.assertIn('"name":"Dan"', prompt)  # The most important field survives
+        self.assertNotIn("TOTO - Africa", prompt)
+
+if __name__ == "__main__":
+    unittest.main()
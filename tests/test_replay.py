@@ -0,0 +1,107 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+import shutil
+import tempfile
+import unittest
+from datetime import date, datetime, time
+
+from everything.config import Config
+from everything.everything import EVERYTHING
+from everything.fake_llm import MockBackend
+from everything.fleet import run_fleet
+from everything.replay import DateRange, dates, replay, stored_dates
+from everything.state_store import StateStore
+from user_data.manifest import load_manifest
+from user_data.user_data import UserData
+from device_data.device_data import DeviceData
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+WEEK = DateRange(date(2024, 5, 14), date(2024, 5, 20))
+
+class Replies:
+    """An important run for every recommendation; counts the requests."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, prompt):
+        self.calls += 1
+        if "personalised recommendation" in prompt:
+            return json.dumps({
+                "recommendation": "Go for a run", "classification": "important",
+                "suggested_time": "18:30", "duration_hours": 1,
+            })
+        return "Sounds good."
+
+class TestReplay(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.config = Config()
+        self.config.LLM_BACKEND = "mock"
+        self.config.SIMULATION_MODE = "event"
+        self.config.RECOMMENDATION_MEMORY = False  # Every day's run is published
+        self.config.NOTIFICATION_PATH = os.path.join(self.tmp, "notifications.jsonl")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def everything(self, replies, store=None):
+        user = UserData(name="Dan")
+        return EVERYTHING(user, DeviceData(user), self.config, backend=MockBackend(replies), store=store)
+
+    def test_dates(self):
+        self.assertEqual(list(dates(date(2024, 5, 30), date(2024, 6, 1))), [date(2024, 5, 30), date(2024, 5, 31), date(2024, 6, 1)])
+        self.assertEqual(list(dates(date(2024, 6, 1), date(2024, 5, 30))), [])
+        self.assertEqual(stored_dates(UserData(name="Dan")), (date(2024, 5, 15), date(2024, 5, 15)))
+
+    async def test_week(self):
+        ai = self.everything(Replies())
+        result = await replay(ai, WEEK)
+        ai.notifier.close()
+        self.assertEqual(result.days, 7)
+        self.assertEqual(result.ticks, ai.ticks)
+        self.assertGreater(result.days_per_s, 0)
+
+        # Calendar additions stay in the calendar from one day to the next
+        runs = [event for event in ai.user.calendar_index if event.title == "Go for a run"]
+        self.assertEqual({event.start for event in runs}, {datetime.combine(day, time(18, 30)) for day in dates(*WEEK)})
+        self.assertEqual(result.recommendations, len(ai.recommendations))
+        self.assertEqual(len(runs), len(ai.recommendations))
+
+        # Every notification carries simulated time, including the user's response
+        with open(self.config.NOTIFICATION_PATH) as f:
+            records = [json.loads(line) for line in f]
+        responses = [record["timestamp"] for record in records if record["kind"] == "user_response"]
+        self.assertEqual(responses, [f"{day}T22:00:00" for day in dates(*WEEK)])
+
+    async def test_stored_range_by_default(self):
+        result = await replay(self.everything(Replies()))
+        self.assertEqual(result.days, 1)
+
+    async def test_resume_carries_state(self):
+        store = StateStore(os.path.join(self.tmp, "state.sqlite"))
+        first = self.everything(Replies(), store)
+        before = await replay(first, WEEK)
+
+        replies = Replies()
+        again = self.everything(replies, store)  # As if after a restart
+        after = await replay(again, WEEK)
+        self.assertEqual(replies.calls, 0)  # Every day was finished
+        self.assertEqual((after.ticks, after.llm_calls), (before.ticks, before.llm_calls))
+        self.assertEqual(again.recommendations, first.recommendations)
+        await store.close()
+
+    async def test_fleet(self):
+        for name in ("dan", "eve"):
+            shutil.copytree(DATA_DIR, os.path.join(self.tmp, "users", name))
+        report = await run_fleet(load_manifest(os.path.join(self.tmp, "users")), self.config, days=WEEK)
+        self.assertEqual(report.summary()["failed_users"], 0)
+        self.assertEqual(report.days, 14)
+        self.assertGreater(report.summary()["days_per_s"], 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+from user_data.snapshot import Snapshot, write_snapshot
+from user_data.user_data import UserData
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+
+class TestSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.data_dir = os.path.join(self.tmp, "dan")
+        shutil.copytree(DATA_DIR, self.data_dir)
+        self.source = UserData("Dan", self.data_dir)
+        write_snapshot(self.source, self.source.paths["snapshot"])
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_same_answers_as_csv(self):
+        user = UserData.for_user("dan", self.tmp, name="Dan")
+        self.assertIsInstance(user.snapshot, Snapshot)
+        self.assertEqual(user.profile, self.source.profile)
+        self.assertEqual(user.spotify_playlists, self.source.spotify_playlists)
+        self.assertEqual(user.calendar, self.source.calendar)
+        t = datetime(2024, 5, 15, 6, 0)
+        while t < datetime(2024, 5, 16):
+            self.assertEqual(user.get_current_location(t), self.source.get_current_location(t))
+            self.assertEqual(user.get_upcoming_events(2, t), self.source.get_upcoming_events(2, t))
+            self.assertEqual(user.calendar_index.overlapping(t), self.source.calendar_index.overlapping(t))
+            t += timedelta(minutes=15)
+
+    def test_updates_after_loading_from_snapshot(self):
+        user = UserData("Dan", self.data_dir)
+        user.add_location({"timestamp": "2024-05-15 23:30:00", "latitude": "1", "longitude": "2", "location": "Airport"})
+        user.add_event({"date": "2024-05-15", "time": "21:00", "event": "Flight", "duration": "3"})
+        self.assertEqual(user.get_current_location(datetime(2024, 5, 15, 23, 45)), "Airport")
+        self.assertEqual(user.get_upcoming_events(2, datetime(2024, 5, 15, 20, 0))[-1]["event"], "Flight")
+
+    def test_close_unmaps(self):
+        with Snapshot(self.source.paths["snapshot"]) as snapshot:
+            index = snapshot.location_index()
+            self.assertEqual(len(index), len(self.source.location_index))
+        self.assertTrue(snapshot._mmap.closed)  # Even with the index's columns still referenced
+        with self.assertRaises(ValueError):
+            index.location_at(datetime(2024, 5, 15, 12, 0))
+
+    def test_user_closes_its_snapshot(self):
+        t = datetime(2024, 5, 15, 12, 0)
+        with UserData("Dan", self.data_dir) as user:
+            expected = user.get_current_location(t)
+            user.calendar_index
+            snapshot = user.snapshot
+        self.assertTrue(snapshot._mmap.closed)
+        self.assertEqual(user.get_current_location(t), expected)  # Reopened on use
+        self.assertIsNot(user.snapshot, snapshot)
+        user.close()
+
+    def test_stale_snapshot_is_ignored(self):
+        calendar = os.path.join(self.data_dir, "device_data", "calendar.csv")
+        later = os.path.getmtime(self.source.paths["snapshot"]) + 10
+        os.utime(calendar, (later, later))
+        self.assertIsNone(UserData("Dan", self.data_dir).snapshot)
+
+    def test_sources_load_lazily(self):
+        user = UserData("Nobody", os.path.join(self.tmp, "missing"), paths={"profile": self.source.paths["profile"]})
+        self.assertEqual(user.profile["name"], "Dan")  # Only the profile is read
+        with self.assertRaises(FileNotFoundError):
+            user.location_index
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,177 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+import shutil
+import tempfile
+import unittest
+from datetime import date, datetime, timedelta
+
+from everything.classifier import Recommendation
+from everything.config import Config
+from everything.everything import EVERYTHING
+from everything.fake_llm import MockBackend, default_reply
+from everything.state_store import StateStore
+from user_data.calendar_index import CalendarEvent
+from user_data.user_data import UserData
+from device_data.device_data import DeviceData
+
+DAY = date(2024, 5, 15)
+
+class Crash(Exception):
+    pass
+
+IDEAS = ["Stretch your legs", "Drink a glass of water", "Call your sister", "Read a chapter of your novel",
+         "Plan tomorrow's run", "Listen to a new album", "Tidy your desk", "Cook something new"]
+
+def varied(prompt):
+    """A different recommendation for each time of day."""
+    if "personalised recommendation" in prompt:
+        hour = int(prompt.split("Current time: ")[1][:2])
+        return json.dumps({"recommendation": IDEAS[hour % len(IDEAS)], "classification": "normal"})
+    return "Sounds good."
+
+class TestStateStore(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, "state.sqlite")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    async def test_round_trip(self):
+        store = StateStore(self.path)
+        run = CalendarEvent.from_row({"date": "2024-05-15", "time": "18:30", "event": "Run", "duration": "1"})
+        store.add_event("Dan", run)
+        store.set_tasks("Dan", DAY, ["Old task"])
+        store.set_tasks("Dan", DAY, ["Email Sam", "Book dentist"])
+        store.add_recommendation("Dan", Recommendation("Stretch", "normal", "10:00", 0.5), datetime(2024, 5, 15, 9, 0))
+        store.save_checkpoint("Dan", DAY, datetime(2024, 5, 15, 9, 0), {"ticks": 5})
+        self.assertEqual(await store.tasks("Dan", DAY), [])  # Queued, not committed yet
+        await store.flush()
+
+        # Another store on the same file (as in another worker process) sees the writes
+        other = StateStore(self.path)
+        events = await other.events("Dan", datetime(2024, 5, 15), datetime(2024, 5, 16))
+        self.assertEqual([(event.start, event.end, event.title) for event in events], [(run.start, run.end, "Run")])
+        self.assertEqual(await other.tasks("Dan", DAY), ["Email Sam", "Book dentist"])
+        self.assertEqual(
+            await other.recommendations("Dan"),
+            [(datetime(2024, 5, 15, 9, 0), Recommendation("Stretch", "normal", "10:00", 0.5))],
+        )
+        self.assertEqual(await other.load_checkpoint("Dan", DAY), (datetime(2024, 5, 15, 9, 0), {"ticks": 5}))
+        self.assertIsNone(await other.load_checkpoint("Eve", DAY))
+        await other.close()
+        await store.close()
+
+    async def test_group_commit(self):
+        store = StateStore(self.path, batch_size=100)
+        for i in range(250):
+            store.add_recommendation("Dan", Recommendation(f"Tip {i}", "normal"), datetime(2024, 5, 15, 9) + timedelta(minutes=i))
+        await store.flush()
+        self.assertEqual(store.stats["writes"], 250)
+        self.assertEqual(store.stats["commits"], 3)
+        self.assertEqual(len(await store.recommendations("Dan")), 250)
+        await store.close()
+
+    async def test_recommendations_are_unique_per_time(self):
+        store = StateStore(self.path)
+        at = datetime(2024, 5, 15, 9, 0)
+        store.add_recommendation("Dan", Recommendation("Stretch", "normal"), at)
+        store.save_checkpoint("Dan", DAY, at, {"ticks": 1}, [(at, Recommendation("Drink water", "normal"))])
+        await store.flush()
+        self.assertEqual(await store.recommendations("Dan"), [(at, Recommendation("Drink water", "normal"))])
+        await store.close()
+
+class TestResume(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.config = Config()
+        self.config.LLM_BACKEND = "mock"
+        self.config.STATE_DB_PATH = os.path.join(self.tmp, "state.sqlite")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def everything(self, store=None, reply=default_reply):
+        user = UserData(name="Dan")
+        return EVERYTHING(user, DeviceData(user), self.config, backend=MockBackend(reply), store=store)
+
+    async def test_resume_mid_day(self):
+        await self.resume_mid_day()
+
+    async def test_resume_adaptive_day(self):
+        self.config.RECOMMENDATION_TIMING = "adaptive"
+        uninterrupted, resumed = await self.resume_mid_day()
+        self.assertEqual(resumed.recommendation_times, uninterrupted.recommendation_times)  # 07:00 still counts
+        self.assertEqual(len(resumed.recommendation_times), 2)
+
+    async def resume_mid_day(self):
+        uninterrupted = self.everything()
+        await uninterrupted.simulate_day(DAY, resume=False)
+
+        store = StateStore(os.path.join(self.tmp, "resumed.sqlite"))
+        crashing = self.everything(store)
+        process_time = crashing.process_time
+
+        async def crash_at_one(current_time):
+            if current_time.hour == 13:
+                raise Crash()
+            await process_time(current_time)
+
+        crashing.process_time = crash_at_one
+        with self.assertRaises(Crash):
+            await crashing.simulate_day(DAY)
+        await store.flush()
+        at, state = await store.load_checkpoint("Dan", DAY)
+        self.assertEqual(at, datetime(2024, 5, 15, 12, 30))
+        # The checkpoint counts the recommendations; their texts are only stored once
+        self.assertEqual(state["recommendations_shown"], len(crashing.recommendations))
+        self.assertNotIn("recommendations", state)
+
+        resumed = self.everything(store)  # As if after a restart
+        await resumed.simulate_day(DAY)
+        self.assertEqual(resumed.ticks, uninterrupted.ticks)
+        self.assertEqual(resumed.tasks, uninterrupted.tasks)
+        self.assertEqual(resumed.recommendations, uninterrupted.recommendations)
+        self.assertEqual(resumed.llm_calls, uninterrupted.llm_calls)  # Nothing before 13:00 is asked again
+
+        finished = self.everything(store)
+        await finished.simulate_day(DAY)
+        self.assertEqual(finished.ticks, resumed.ticks)  # Nothing left to do; the day's state is carried over
+        self.assertEqual(finished.recommendations, resumed.recommendations)
+        await store.close()
+        return uninterrupted, resumed
+
+    async def test_replayed_ticks_do_not_duplicate_recommendations(self):
+        self.config.STATE_CHECKPOINT_TICKS = 1000  # Only the start and end of the day are checkpointed
+        async with self.everything(reply=varied) as uninterrupted:
+            await uninterrupted.simulate_day(DAY, resume=False)
+        self.assertTrue(uninterrupted.store._executor._shutdown)  # Closed with its owner
+
+        store = StateStore(os.path.join(self.tmp, "resumed.sqlite"))
+        crashing = self.everything(store, varied)
+        process_time = crashing.process_time
+
+        async def crash_at_one(current_time):
+            if current_time.hour == 13:
+                raise Crash()
+            await process_time(current_time)
+
+        crashing.process_time = crash_at_one
+        with self.assertRaises(Crash):
+            await crashing.simulate_day(DAY)
+        self.assertGreater(len(crashing.recommendations), 1)  # Some made after the start-of-day checkpoint
+
+        resumed = self.everything(store, varied)  # Replays every tick since the start of the day
+        await resumed.simulate_day(DAY)
+        self.assertEqual(resumed.recommendations, uninterrupted.recommendations)
+        stored = [recommendation.text for _, recommendation in await store.recommendations("Dan")]
+        self.assertEqual(stored, uninterrupted.recommendations)
+        await store.close()
+
+if __name__ == "__main__":
+    unittest.main()
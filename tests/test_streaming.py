@@ -0,0 +1,148 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import re
+import unittest
+from datetime import date, datetime
+from unittest import mock
+
+from everything.config import Config
+from everything.everything import EVERYTHING
+from everything.fake_llm import MockBackend
+from everything.llm_scheduler import LLMScheduler
+from everything.streaming import LINE_END, PrefetchedStream, split_stream
+from user_data.user_data import UserData
+from device_data.device_data import DeviceData
+
+async def deltas(*parts):
+    for part in parts:
+        yield part
+
+class TransientError(Exception):
+    pass
+
+class TestSplitStream(unittest.IsolatedAsyncioTestCase):
+
+    async def test_sentences(self):
+        segments = [s async for s in split_stream(deltas("Good mor", "ning, Dan! Tod", "ay is busy.", " Enjoy"))]
+        self.assertEqual(segments, ["Good morning, Dan!", "Today is busy.", "Enjoy"])
+
+    async def test_lines(self):
+        segments = [s async for s in split_stream(deltas("1. Email Bob.\n2", ". Gym\n\n", "3. Read"), LINE_END)]
+        self.assertEqual(segments, ["1. Email Bob.", "2. Gym", "3. Read"])
+
+    async def test_prefetched_stream_starts_immediately(self):
+        consumed = []
+
+        async def source():
+            for i in range(3):
+                consumed.append(i)
+                yield i
+
+        stream = PrefetchedStream(source())
+        await asyncio.sleep(0.01)
+        self.assertEqual(consumed, [0, 1, 2])  # Pulled before anyone iterated
+        self.assertEqual([item async for item in stream], [0, 1, 2])
+
+class TestSchedulerStream(unittest.IsolatedAsyncioTestCase):
+
+    async def test_retries_before_first_item(self):
+        scheduler = LLMScheduler(max_retries=2, backoff_base=0, retry_on=(TransientError,))
+        attempts = []
+
+        def open_call():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise TransientError()
+            return iter(["a", "b"])
+
+        self.assertEqual([item async for item in scheduler.stream(open_call)], ["a", "b"])
+        self.assertEqual(len(attempts), 2)
+        self.assertEqual(scheduler._active, 0)  # Slot released once the stream ends
+        scheduler.close()
+
+class TestStreamingDay(unittest.IsolatedAsyncioTestCase):
+
+    async def simulate(self, streaming, backend):
+        config = Config()
+        config.LLM_STREAMING = streaming
+        user = UserData(name="Dan")
+        ai = EVERYTHING(user, DeviceData(user), config, backend=backend)
+        with self.assertLogs(ai.logger, level="INFO") as logs:
+            await ai.simulate_day(date(2024, 5, 15))
+        await ai.close()
+        return ai, logs.output
+
+    async def test_streamed_notifications(self):
+        backend = MockBackend(latency=0.002)
+        with mock.patch.object(backend, "stream", wraps=backend.stream) as stream:
+            ai, output = await self.simulate(True, backend)
+        self.assertTrue(stream.called)
+        # The first greeting sentence is a notification of its own
+        self.assertTrue(any(re.search(r"\[NOTIFICATION\] This is a simulated answer \(\w+\)\.$", line) for line in output))
+        self.assertEqual(len(ai.tasks), 2)
+        self.assertTrue(any("I suggest: This is a simulated answer" in line for line in output))
+
+        for call_type in ("greeting", "tasks", "event"):
+            samples = ai.latencies[call_type]
+            self.assertTrue(all(ttft <= total for ttft, total in samples))
+        summary = ai.latency_summary()
+        self.assertIn("recommendation", summary)
+        self.assertEqual(summary["greeting"]["calls"], 1)
+
+    async def test_same_calls_as_blocking_mode(self):
+        streamed, _ = await self.simulate(True, MockBackend())
+        blocking, _ = await self.simulate(False, MockBackend())
+        self.assertEqual(streamed.llm_calls, blocking.llm_calls)
+        self.assertEqual(len(streamed.recommendations), len(blocking.recommendations))
+
+    async def test_failed_greeting_cancels_the_other_requests(self):
+        config = Config()
+        config.LLM_BACKEND = "mock"
+        config.LLM_STREAMING = True
+        user = UserData(name="Dan")
+        ai = EVERYTHING(user, DeviceData(user), config)
+        never = asyncio.Event()
+
+        async def stream(prompt, call_type="other", **kwargs):
+            if call_type == "greeting":
+                raise RuntimeError("greeting failed")
+            await never.wait()
+            yield ""
+
+        async def recommendation(current_time):
+            await never.wait()
+
+        ai.query_llm_stream, ai._query_recommendation = stream, recommendation
+        with self.assertRaises(RuntimeError):
+            await ai.start_day(datetime(2024, 5, 15, 7, 0))
+        await asyncio.sleep(0)  # Let the cancellations run
+        self.assertEqual(asyncio.all_tasks() - {asyncio.current_task()}, set())
+        await ai.close()
+
+    async def test_failed_greeting_cancels_the_other_requests_without_streaming(self):
+        config = Config()
+        config.LLM_BACKEND = "mock"
+        user = UserData(name="Dan")
+        ai = EVERYTHING(user, DeviceData(user), config)
+        never = asyncio.Event()
+
+        async def query(prompt, call_type="other", **kwargs):
+            if call_type == "greeting":
+                raise RuntimeError("greeting failed")
+            await never.wait()
+
+        async def recommendation(current_time):
+            await never.wait()
+
+        ai.query_llm, ai._query_recommendation = query, recommendation
+        with self.assertRaises(RuntimeError):
+            await ai.start_day(datetime(2024, 5, 15, 7, 0))
+        await asyncio.sleep(0)  # Let the cancellations run
+        self.assertEqual(asyncio.all_tasks() - {asyncio.current_task()}, set())
+        await ai.close()
+
+if __name__ == "__main__":
+    unittest.main()
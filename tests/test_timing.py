@@ -0,0 +1,122 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import unittest
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+from everything.config import Config
+from everything.everything import EVERYTHING
+from everything.fake_llm import MockBackend
+from everything.timing import RecommendationTimer, activity_need, parse_hours, score_slots, slot_features
+from user_data.user_data import UserData
+from device_data.device_data import DeviceData
+
+START = datetime(2024, 5, 15, 7, 0)
+END = datetime(2024, 5, 15, 22, 0)
+STEP = timedelta(minutes=30)
+
+def at(hour, minute=0):
+    return datetime(2024, 5, 15, hour, minute)
+
+class TestScoring(unittest.TestCase):
+
+    def test_activity_need(self):
+        self.assertEqual(parse_hours("7h 45m"), 7.75)
+        self.assertIsNone(parse_hours("a while"))
+        fitness = {"steps_today": 4500, "average_daily_steps": 9000, "sleep": {"last_night": "6h", "average": "8h"}}
+        self.assertAlmostEqual(activity_need(fitness), 0.75)
+        self.assertEqual(activity_need({"steps_today": 12000, "average_daily_steps": 9000}), 0)
+        self.assertEqual(activity_need({}), 0)
+
+    def test_scores_broadcast(self):
+        free = np.array([[0, 30, 60], [90, 60, 0]])
+        transitions = np.array([[1, 0, 1], [0, 0, 1]])
+        activity = np.array([[0.5], [0.0]])  # One value per row
+        scores = score_slots(free, transitions, activity)
+        self.assertEqual(scores.shape, (2, 3))
+        np.testing.assert_allclose(scores, [[0, 0.3, 0.875], [0.35, 0.35, 0]], atol=1e-6)  # Busy scores 0
+
+    def test_transitions_only_look_back(self):
+        user = UserData(name="Dan")
+        _, transitions = slot_features(user, [at(12, 30), at(13), at(13, 30)], STEP, timedelta(hours=1))
+        np.testing.assert_array_equal(transitions, [0, 1, 0])  # The 13:00 move to the Coffee Shop
+        user.add_location({"timestamp": "2024-05-15 12:45:00", "location": "Park"})  # Later fixes do not count
+        _, transitions = slot_features(user, [at(12, 30)], STEP, timedelta(hours=1))
+        np.testing.assert_array_equal(transitions, [0])
+
+    def test_candidates_sample_day(self):
+        # The calendar is full 09:00-10:00, 11:00-13:00, 14:00-15:00 and 16:00-17:30
+        candidates = RecommendationTimer().candidates(UserData(name="Dan"), START, END, STEP)
+        self.assertEqual(candidates[:5], [at(10), at(10, 30), at(13), at(13, 30), at(15)])
+        self.assertNotIn(at(16), candidates)
+        self.assertEqual(candidates[-1], at(21, 30))
+
+    def test_should_recommend(self):
+        user = UserData(name="Dan")
+        timer = RecommendationTimer()
+        self.assertTrue(timer.should_recommend(user, at(13), STEP, [START]))
+        self.assertFalse(timer.should_recommend(user, at(13), STEP, [START, at(12)]))  # Too close
+        self.assertFalse(timer.should_recommend(user, at(12), STEP, [START]))  # Busy
+        self.assertFalse(RecommendationTimer(budget=1).should_recommend(user, at(13), STEP, [START, at(10)]))
+        # 10:00 is free but nothing else speaks for it; 13:00 follows a move
+        self.assertFalse(timer.should_recommend(user, at(10), STEP, [START]))
+        self.assertFalse(RecommendationTimer(min_score=0.8).should_recommend(user, at(13), STEP, [START]))
+
+    def test_free_time_alone_is_not_enough(self):
+        timer = RecommendationTimer()
+        moved = UserData(name="Dan")
+        moved.add_location({"timestamp": "2024-05-15 18:45:00", "location": "Gym"})
+        self.assertFalse(timer.should_recommend(UserData(name="Dan"), at(19), STEP, [START]))  # A free evening
+        self.assertTrue(timer.should_recommend(moved, at(19), STEP, [START]))  # Same free time, just arrived
+        restless = UserData(name="Dan")
+        restless.profile["fitness_data"] = {"steps_today": 1000, "average_daily_steps": 10000}
+        self.assertTrue(timer.should_recommend(restless, at(19), STEP, [START]))
+
+    def test_from_config(self):
+        config = Config()
+        self.assertIsNone(RecommendationTimer.from_config(config))  # RECOMMENDATION_HOURS by default
+        config.RECOMMENDATION_TIMING = "adaptive"
+        self.assertIsInstance(RecommendationTimer.from_config(config), RecommendationTimer)
+        config.RECOMMENDATION_TIMING = "hourly"
+        with self.assertRaises(ValueError):
+            RecommendationTimer.from_config(config)
+
+class TestAdaptiveDay(unittest.IsolatedAsyncioTestCase):
+
+    async def simulate(self, busy_at=None):
+        config = Config()
+        config.LLM_BACKEND = "mock"
+        config.RECOMMENDATION_MEMORY = False
+        config.RECOMMENDATION_TIMING = "adaptive"
+        user = UserData(name="Dan")
+        ai = EVERYTHING(user, DeviceData(user), config, backend=MockBackend())
+        fired = []
+        generate, start_day = ai.generate_recommendations, ai.start_day
+
+        async def record(current_time):
+            fired.append(current_time)
+            await generate(current_time)
+
+        async def start_then_book(current_time):
+            await start_day(current_time)
+            if busy_at is not None:  # Booked after the slots were chosen
+                await ai.add_event({"date": "2024-05-15", "time": busy_at, "event": "Dentist", "duration": "1"})
+
+        ai.generate_recommendations, ai.start_day = record, start_then_book
+        await ai.simulate_day(date(2024, 5, 15))
+        return ai, fired
+
+    async def test_recommends_at_chosen_slots(self):
+        ai, fired = await self.simulate()
+        self.assertEqual(fired, [at(13)])  # The only free slot right after a move
+        self.assertEqual(ai.recommendation_times, [START] + fired)
+
+    async def test_skips_slots_that_became_busy(self):
+        _, fired = await self.simulate(busy_at="12:30")
+        self.assertEqual(fired, [])
+
+if __name__ == "__main__":
+    unittest.main()
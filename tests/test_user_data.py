@@ -3,6 +3,7 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import unittest
+from datetime import datetime
 from user_data.user_data import UserData
 
 class TestUserData(unittest.TestCase):
@@ -23,5 +24,26 @@ class TestUserData(unittest.TestCase):
         events = self.user_data.load_calendar()
         self.assertIsInstance(events, list)
 
+    def test_calendar_changes_go_through_the_index(self):
+        self.assertIsInstance(self.user_data.calendar, tuple)
+        with self.assertRaises(AttributeError):
+            self.user_data.calendar.append({"date": "2024-05-15", "time": "20:00", "event": "Dinner", "duration": "1"})
+        self.user_data.calendar[0]["event"] = "Renamed"  # A copy; the calendar is unchanged
+        self.assertNotEqual(self.user_data.calendar[0]["event"], "Renamed")
+        self.user_data.add_event({"date": "2024-05-15", "time": "20:00", "event": "Dinner", "duration": "1"})
+        self.assertEqual(self.user_data.calendar[-1]["event"], "Dinner")
+
+    def test_upcoming_events_are_copies(self):
+        at = datetime(2024, 5, 15, 8, 30)
+        self.user_data.get_upcoming_events(2, at)[0]["event"] = "Renamed"
+        self.assertNotEqual(self.user_data.get_upcoming_events(2, at)[0]["event"], "Renamed")
+
+    def test_only_the_location_index_is_kept(self):
+        self.user_data.get_current_location()
+        self.assertNotIn("location_data", self.user_data.__dict__)
+        self.user_data.add_location({"timestamp": "2024-05-15 23:30:00", "latitude": "1", "longitude": "2", "location": "Airport"})
+        self.assertEqual(self.user_data.location_data[-1]["location"], "Airport")  # Rebuilt from the index
+        self.assertEqual(len(self.user_data.location_data), len(self.user_data.load_location_data()) + 1)
+
 if __name__ == "__main__":
     unittest.main()
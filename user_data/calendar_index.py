@@ -0,0 +1,188 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+from .timestamps import from_seconds, parse_timestamp, to_seconds
+
+
+class CalendarEvent(NamedTuple):
+    """A calendar entry parsed once into typed fields."""
+
+    start: datetime
+    end: datetime
+    title: str
+    raw: Dict[str, str]  # The original calendar.csv-style row
+
+    @classmethod
+    def from_row(cls, row: Dict[str, str]) -> "CalendarEvent":
+        """Parses a calendar.csv row (date, time, event, duration in hours)."""
+        start = parse_timestamp(f"{row['date']} {row['time']}")
+        try:
+            hours = float(row.get("duration") or 0)
+        except ValueError:
+            hours = 0.0
+        return cls(start, start + timedelta(hours=hours), row["event"], row)
+
+    @classmethod
+    def from_fields(cls, start: datetime, end: datetime, title: str) -> "CalendarEvent":
+        """Builds an event, and a calendar.csv-style row for it, from parsed fields."""
+        hours = (end - start).total_seconds() / 3600
+        row = {"date": start.strftime("%Y-%m-%d"), "time": start.strftime("%H:%M"), "event": title, "duration": f"{hours:g}"}
+        return cls(start, end, title, row)
+
+
+class _ColumnEvents:
+    """Read-only list of CalendarEvents backed by start/end/title columns.
+
+    Events are only built for the positions actually read, and kept once built.
+    """
+
+    def __init__(self, starts: Sequence[float], ends: Sequence[float], codes: Sequence[int], titles: List[str]):
+        self._starts = starts
+        self._ends = ends
+        self._codes = codes
+        self._titles = titles
+        self._built: Dict[int, CalendarEvent] = {}
+
+    def __len__(self) -> int:
+        return len(self._starts)
+
+    def __getitem__(self, item: Union[int, slice]):
+        if isinstance(item, slice):
+            return [self._event(i) for i in range(*item.indices(len(self)))]
+        return self._event(range(len(self))[item])
+
+    def __iter__(self) -> Iterator[CalendarEvent]:
+        return (self._event(i) for i in range(len(self)))
+
+    def _event(self, i: int) -> CalendarEvent:
+        event = self._built.get(i)
+        if event is None:
+            event = CalendarEvent.from_fields(
+                from_seconds(self._starts[i]), from_seconds(self._ends[i]), self._titles[self._codes[i]]
+            )
+            self._built[i] = event
+        return event
+
+
+class CalendarIndex:
+    """Calendar events kept sorted by start time.
+
+    Start times live in an ``array('d')`` column so range queries are a pair of
+    bisects. Overlap queries only look back as far as the longest event seen,
+    which keeps them logarithmic plus the number of candidates. An index
+    built from columns (e.g. a memory-mapped snapshot) creates events on
+    demand and is copied into lists on the first add.
+    """
+
+    def __init__(self):
+        self._starts = array("d")
+        self._events: Union[List[CalendarEvent], _ColumnEvents] = []
+        self._max_duration = 0.0  # seconds
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Dict[str, str]]) -> "CalendarIndex":
+        """Builds an index from calendar.csv rows."""
+        index = cls()
+        events = sorted((CalendarEvent.from_row(row) for row in rows), key=lambda event: event.start)
+        index._events = events
+        index._starts = array("d", (to_seconds(event.start) for event in events))
+        index._max_duration = max(
+            ((event.end - event.start).total_seconds() for event in events), default=0.0
+        )
+        return index
+
+    @classmethod
+    def from_columns(
+        cls,
+        starts: Sequence[float],
+        ends: Sequence[float],
+        codes: Sequence[int],
+        titles: List[str],
+        max_duration: Optional[float] = None,
+    ) -> "CalendarIndex":
+        """Wraps start-sorted columns (arrays or memoryviews) without copying them.
+
+        Pass max_duration (seconds) if known to avoid a pass over the columns.
+        """
+        index = cls()
+        index._starts = starts
+        index._events = _ColumnEvents(starts, ends, codes, titles)
+        if max_duration is None:
+            max_duration = max((end - start for start, end in zip(starts, ends)), default=0.0)
+        index._max_duration = max_duration
+        return index
+
+    @property
+    def max_duration(self) -> float:
+        """Longest event seen, in seconds."""
+        return self._max_duration
+
+    def columns(self) -> Tuple[array, array, array, List[str]]:
+        """(starts, ends, title codes, titles) in start order, e.g. for writing a snapshot."""
+        titles: Dict[str, int] = {}
+        codes = array("I", (titles.setdefault(event.title, len(titles)) for event in self._events))
+        ends = array("d", (to_seconds(event.end) for event in self._events))
+        return array("d", self._starts), ends, codes, list(titles)
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    def __iter__(self) -> Iterator[CalendarEvent]:
+        return iter(self._events)
+
+    def add(self, row: Dict[str, str]) -> CalendarEvent:
+        """Parses a calendar row and inserts it at its sorted position."""
+        event = CalendarEvent.from_row(row)
+        if not isinstance(self._events, list):
+            self._starts = array("d", self._starts)
+            self._events = list(self._events)
+        seconds = to_seconds(event.start)
+        # Insert after any events with the same start so file order is kept
+        position = bisect_right(self._starts, seconds)
+        self._starts.insert(position, seconds)
+        self._events.insert(position, event)
+        self._max_duration = max(self._max_duration, (event.end - event.start).total_seconds())
+        return event
+
+    def remove(self, start: datetime, title: str) -> Optional[CalendarEvent]:
+        """Removes the event with this start and title (the first one added, if several); None if absent."""
+        if not isinstance(self._events, list):
+            self._starts = array("d", self._starts)
+            self._events = list(self._events)
+        seconds = to_seconds(start)
+        for position in range(bisect_left(self._starts, seconds), bisect_right(self._starts, seconds)):
+            if self._events[position].title == title:
+                del self._starts[position]
+                return self._events.pop(position)
+        return None
+
+    def starting_between(self, start: datetime, end: datetime) -> List[CalendarEvent]:
+        """Returns events whose start lies in [start, end], in start order."""
+        low = bisect_left(self._starts, to_seconds(start))
+        high = bisect_right(self._starts, to_seconds(end))
+        return self._events[low:high]
+
+    def overlapping(self, current_time: datetime) -> List[CalendarEvent]:
+        """Returns events in progress at current_time (start <= t < end)."""
+        seconds = to_seconds(current_time)
+        low = bisect_left(self._starts, seconds - self._max_duration)
+        high = bisect_right(self._starts, seconds)
+        return [event for event in self._events[low:high] if event.end > current_time]
+
+    def free_slots(
+        self, start: datetime, end: datetime, min_duration: timedelta = timedelta(0)
+    ) -> List[Tuple[datetime, datetime]]:
+        """Returns the gaps between events in [start, end] that are at least min_duration long."""
+        slots = []
+        cursor = start
+        for event in self.overlapping(start) + self.starting_between(start, end):
+            if event.start > cursor and event.start - cursor >= min_duration:
+                slots.append((cursor, min(event.start, end)))
+            cursor = max(cursor, event.end)
+            if cursor >= end:
+                return slots
+        if end - cursor >= min_duration and end > cursor:
+            slots.append((cursor, end))
+        return slots
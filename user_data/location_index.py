@@ -0,0 +1,184 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from .timestamps import from_seconds, parse_timestamp, to_seconds
+
+
+class LocationFix(NamedTuple):
+    """A single location fix."""
+
+    timestamp: datetime
+    latitude: float
+    longitude: float
+    location: str
+
+
+class LocationIndex:
+    """Time-sorted, array-backed store of location fixes.
+
+    Timestamps are parsed once and kept as float seconds in an ``array('d')``
+    column, so "latest fix at or before t" is a bisect instead of a scan that
+    re-parses every row. Location names are interned into an integer column.
+    The columns may also be read-only views (e.g. into a memory-mapped
+    snapshot); they are copied into arrays on the first append.
+    """
+
+    def __init__(self):
+        self._times = array("d")
+        self._latitudes = array("d")
+        self._longitudes = array("d")
+        self._codes = array("I")
+        self._names: List[str] = []
+        self._name_codes: Dict[str, int] = {}
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Dict[str, str]]) -> "LocationIndex":
+        """Builds an index from location.csv rows (timestamp, latitude, longitude, location)."""
+        index = cls()
+        in_order = True
+        last = float("-inf")
+        for row in rows:
+            seconds = to_seconds(parse_timestamp(row["timestamp"]))
+            in_order = in_order and seconds >= last
+            last = seconds
+            index._times.append(seconds)
+            index._latitudes.append(_to_float(row.get("latitude")))
+            index._longitudes.append(_to_float(row.get("longitude")))
+            index._codes.append(index._intern(row["location"]))
+        if not in_order:
+            index._sort()
+        return index
+
+    @classmethod
+    def from_columns(
+        cls,
+        times: Sequence[float],
+        latitudes: Sequence[float],
+        longitudes: Sequence[float],
+        codes: Sequence[int],
+        names: List[str],
+    ) -> "LocationIndex":
+        """Wraps existing time-sorted columns (arrays or memoryviews) without copying them."""
+        index = cls()
+        index._times, index._latitudes, index._longitudes, index._codes = times, latitudes, longitudes, codes
+        index._names = list(names)
+        index._name_codes = {name: code for code, name in enumerate(index._names)}
+        return index
+
+    def columns(self) -> Tuple[Sequence[float], Sequence[float], Sequence[float], Sequence[int], List[str]]:
+        """(times, latitudes, longitudes, location codes, names), as stored."""
+        return self._times, self._latitudes, self._longitudes, self._codes, self._names
+
+    def __len__(self) -> int:
+        return len(self._times)
+
+    def __iter__(self):
+        for i in range(len(self._times)):
+            yield self._fix(i)
+
+    def append(
+        self,
+        timestamp: datetime,
+        location: str,
+        latitude: float = float("nan"),
+        longitude: float = float("nan"),
+    ) -> None:
+        """Adds a fix without rebuilding the index.
+
+        Fixes normally arrive in time order and are appended in O(1); a late
+        fix is inserted at its sorted position.
+        """
+        seconds = to_seconds(timestamp)
+        code = self._intern(location)
+        if not isinstance(self._times, array):
+            self._make_mutable()
+        if not self._times or seconds >= self._times[-1]:
+            self._times.append(seconds)
+            self._latitudes.append(latitude)
+            self._longitudes.append(longitude)
+            self._codes.append(code)
+            return
+        position = bisect_right(self._times, seconds)
+        self._times.insert(position, seconds)
+        self._latitudes.insert(position, latitude)
+        self._longitudes.insert(position, longitude)
+        self._codes.insert(position, code)
+
+    def latest_at(self, current_time: datetime) -> Optional[LocationFix]:
+        """Returns the latest fix at or before current_time, or None.
+
+        If several fixes share that timestamp, the first one added wins.
+        """
+        position = self._latest(to_seconds(current_time))
+        if position < 0:
+            return None
+        return self._fix(position)
+
+    def between(self, start: datetime, end: datetime) -> List[LocationFix]:
+        """Returns the fixes with start <= timestamp <= end, in time order."""
+        low = bisect_left(self._times, to_seconds(start))
+        high = bisect_right(self._times, to_seconds(end))
+        return [self._fix(i) for i in range(low, high)]
+
+    def window(self, start: datetime, end: datetime) -> Tuple[Sequence[float], Sequence[int]]:
+        """(times, location codes) of the fixes from the one in effect at start up to end.
+
+        Enough to answer location_at for any time in [start, end] without
+        touching the rest of the history.
+        """
+        low = max(self._latest(to_seconds(start)), 0)
+        high = bisect_right(self._times, to_seconds(end))
+        return self._times[low:high], self._codes[low:high]
+
+    def location_at(self, current_time: datetime, default: str = "Unknown") -> str:
+        """Returns the location name at current_time, or default if there is no earlier fix."""
+        position = self._latest(to_seconds(current_time))
+        if position < 0:
+            return default
+        return self._names[self._codes[position]]
+
+    def _latest(self, seconds: float) -> int:
+        """Position of the first fix at the latest timestamp <= seconds, or -1."""
+        position = bisect_right(self._times, seconds)
+        if position == 0:
+            return -1
+        return bisect_left(self._times, self._times[position - 1], 0, position)
+
+    def _fix(self, i: int) -> LocationFix:
+        return LocationFix(
+            from_seconds(self._times[i]),
+            self._latitudes[i],
+            self._longitudes[i],
+            self._names[self._codes[i]],
+        )
+
+    def _intern(self, name: str) -> int:
+        code = self._name_codes.get(name)
+        if code is None:
+            code = len(self._names)
+            self._names.append(name)
+            self._name_codes[name] = code
+        return code
+
+    def _make_mutable(self) -> None:
+        self._times = array("d", self._times)
+        self._latitudes = array("d", self._latitudes)
+        self._longitudes = array("d", self._longitudes)
+        self._codes = array("I", self._codes)
+
+    def _sort(self) -> None:
+        # Stable sort keeps file order for fixes that share a timestamp
+        order = sorted(range(len(self._times)), key=self._times.__getitem__)
+        self._times = array("d", (self._times[i] for i in order))
+        self._latitudes = array("d", (self._latitudes[i] for i in order))
+        self._longitudes = array("d", (self._longitudes[i] for i in order))
+        self._codes = array("I", (self._codes[i] for i in order))
+
+
+def _to_float(value: Optional[str]) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float("nan")
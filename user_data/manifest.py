@@ -0,0 +1,38 @@
+import json
+import os
+from typing import List, NamedTuple
+
+
+class UserSpec(NamedTuple):
+    """Where to find one user's data."""
+
+    name: str
+    data_dir: str  # Directory holding user_data/ and device_data/
+
+
+def _is_data_dir(path: str) -> bool:
+    return os.path.isfile(os.path.join(path, "user_data", "user_profile.json"))
+
+
+def load_manifest(path: str) -> List[UserSpec]:
+    """Reads the users to simulate.
+
+    path is either a JSON manifest (a list of {"name", "data_dir"} objects,
+    data_dir relative to the manifest), a single user's data directory, or a
+    directory whose subdirectories are user data directories.
+    """
+    if os.path.isfile(path):
+        with open(path, "r") as f:
+            entries = json.load(f)
+        base = os.path.dirname(os.path.abspath(path))
+        return [UserSpec(entry["name"], os.path.join(base, entry["data_dir"])) for entry in entries]
+
+    if _is_data_dir(path):
+        with open(os.path.join(path, "user_data", "user_profile.json"), "r") as f:
+            return [UserSpec(json.load(f)["name"], path)]
+
+    return [
+        UserSpec(entry, os.path.join(path, entry))
+        for entry in sorted(os.listdir(path))
+        if _is_data_dir(os.path.join(path, entry))
+    ]
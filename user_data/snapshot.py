@@ -0,0 +1,157 @@
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from typing import Any, Dict, List
+
+from .calendar_index import CalendarIndex
+from .location_index import LocationIndex
+
+# File layout: MAGIC, the header length (u64 little-endian), a JSON header,
+# then the sections it lists, each at an 8-byte aligned offset. Numeric
+# sections are little-endian columns; the JSON sources are stored verbatim.
+MAGIC = b"EVSNAP\x00\x01"
+_LENGTH = struct.Struct("<Q")
+_ALIGN = 8
+
+
+class Snapshot:
+    """Read-only, memory-mapped view of a user snapshot.
+
+    Opening one only reads the header. Location and calendar indexes wrap
+    the mapped columns without copying them, so many users can be attached
+    cheaply and pages are only loaded as lookups touch them. The JSON
+    sources are decoded on request. Close it (or use it as a context
+    manager) to unmap the file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[: len(MAGIC)] != MAGIC:
+            self._mmap.close()
+            raise ValueError(f"{path} is not a user snapshot")
+        (length,) = _LENGTH.unpack_from(self._mmap, len(MAGIC))
+        start = len(MAGIC) + _LENGTH.size
+        self.header: Dict[str, Any] = json.loads(self._mmap[start : start + length])
+        self._view = memoryview(self._mmap)
+        self._columns: List[memoryview] = []  # Released on close, so the map can be closed
+
+    def column(self, name: str):
+        """A section as a read-only sequence of numbers (a memoryview on little-endian machines)."""
+        offset, size, typecode = self.header["sections"][name]
+        view = self._view[offset : offset + size].cast(typecode)
+        if sys.byteorder != "little":
+            swapped = array(typecode, view.tobytes())
+            swapped.byteswap()
+            return swapped
+        self._columns.append(view)
+        return view
+
+    def json(self, name: str) -> Any:
+        offset, size, _ = self.header["sections"][name]
+        return json.loads(self._view[offset : offset + size].tobytes())
+
+    def location_index(self) -> LocationIndex:
+        return LocationIndex.from_columns(
+            self.column("location.times"),
+            self.column("location.latitudes"),
+            self.column("location.longitudes"),
+            self.column("location.codes"),
+            self.header["location_names"],
+        )
+
+    def calendar_index(self) -> CalendarIndex:
+        return CalendarIndex.from_columns(
+            self.column("calendar.starts"),
+            self.column("calendar.ends"),
+            self.column("calendar.codes"),
+            self.header["calendar_titles"],
+            self.header["calendar_max_duration"],
+        )
+
+    def close(self) -> None:
+        """Unmaps the file; indexes built from it must not be used afterwards."""
+        for view in self._columns:
+            view.release()
+        self._columns.clear()
+        self._view.release()
+        self._mmap.close()
+
+    def __enter__(self) -> "Snapshot":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def write_snapshot(user, path: str) -> None:
+    """Writes a snapshot of a UserData (however it was loaded) to path, atomically."""
+    times, latitudes, longitudes, codes, names = user.location_index.columns()
+    starts, ends, title_codes, titles = user.calendar_index.columns()
+    sections = {
+        "location.times": array("d", times),
+        "location.latitudes": array("d", latitudes),
+        "location.longitudes": array("d", longitudes),
+        "location.codes": array("I", codes),
+        "calendar.starts": starts,
+        "calendar.ends": ends,
+        "calendar.codes": title_codes,
+        "profile": json.dumps(user.profile).encode("utf-8"),
+        "social_media": json.dumps(user.social_media).encode("utf-8"),
+        "spotify": json.dumps(user.spotify_playlists).encode("utf-8"),
+    }
+    blobs = {}
+    for name, data in sections.items():
+        if isinstance(data, array):
+            if sys.byteorder != "little":
+                data = array(data.typecode, data)
+                data.byteswap()
+            blobs[name] = (data.tobytes(), data.typecode)
+        else:
+            blobs[name] = (data, "B")
+
+    header = {
+        "version": 1,
+        "name": user.name,
+        "location_names": list(names),
+        "calendar_titles": titles,
+        "calendar_max_duration": user.calendar_index.max_duration,
+        "sections": {},
+    }
+    # Offsets depend on the header size, which depends on the offsets
+    header["sections"] = {name: [0, len(blob), typecode] for name, (blob, typecode) in blobs.items()}
+    encoded = _encode_header(header, blobs)
+
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC)
+        f.write(_LENGTH.pack(len(encoded)))
+        f.write(encoded)
+        for name, (blob, _) in blobs.items():
+            f.seek(header["sections"][name][0])
+            f.write(blob)
+    os.replace(tmp, path)
+
+
+def _encode_header(header: Dict[str, Any], blobs: Dict[str, Any]) -> bytes:
+    """Assigns aligned section offsets and returns the encoded header."""
+    while True:
+        encoded = json.dumps(header, separators=(",", ":")).encode("utf-8")
+        offset = _aligned(len(MAGIC) + _LENGTH.size + len(encoded))
+        changed = False
+        for name, (blob, _) in blobs.items():
+            if header["sections"][name][0] != offset:
+                header["sections"][name][0] = offset
+                changed = True
+            offset = _aligned(offset + len(blob))
+        if not changed:
+            return encoded
+
+
+def _aligned(offset: int) -> int:
+    return (offset + _ALIGN - 1) // _ALIGN * _ALIGN
+
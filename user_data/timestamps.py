@@ -0,0 +1,25 @@
+from datetime import datetime, timedelta
+
+# Naive epoch used for the float columns of the indexes. Timestamps in the
+# data files are naive local times, so we avoid datetime.timestamp() (which
+# would apply the machine's timezone) and measure from a naive epoch instead.
+EPOCH = datetime(1970, 1, 1)
+
+
+def to_seconds(value: datetime) -> float:
+    """Converts a naive datetime to seconds since the naive epoch."""
+    return (value - EPOCH).total_seconds()
+
+
+def from_seconds(seconds: float) -> datetime:
+    """Converts seconds since the naive epoch back to a naive datetime."""
+    return EPOCH + timedelta(seconds=seconds)
+
+
+def parse_timestamp(value: str) -> datetime:
+    """Parses a 'YYYY-MM-DD HH:MM[:SS]' string.
+
+    fromisoformat is several times faster than strptime and accepts both the
+    location ('%Y-%m-%d %H:%M:%S') and calendar ('%Y-%m-%d %H:%M') layouts.
+    """
+    return datetime.fromisoformat(value)
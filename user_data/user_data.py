@@ -1,30 +1,144 @@
 import json
 import csv
-from typing import List, Dict, Any
+import os
+from functools import cached_property
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime, timedelta
 
+from metrics.metrics import METRICS
 
-class UserData:
-    """Manages user-related data and provides methods to access and manipulate it."""
+from .calendar_index import CalendarEvent, CalendarIndex
+from .location_index import LocationIndex
+from .snapshot import Snapshot
+
+# Where each source lives, relative to the user's data directory
+SOURCES = {
+    "profile": os.path.join("user_data", "user_profile.json"),
+    "location": os.path.join("device_data", "location.csv"),
+    "calendar": os.path.join("device_data", "calendar.csv"),
+    "social_media": os.path.join("user_data", "social_media.json"),
+    "spotify": os.path.join("user_data", "spotify_playlists.json"),
+    "snapshot": "user.snapshot",  # Written by scripts/convert_snapshot.py
+}
+
+LOAD_SECONDS = METRICS.histogram("user_data_load_seconds", "Time to load one of a user's data sources", ("source",))
+LOOKUP_SECONDS = METRICS.histogram("user_data_lookup_seconds", "UserData location and calendar lookups", ("lookup",))
+_LOCATION_LOOKUPS = LOOKUP_SECONDS.labels("location")
+_CALENDAR_LOOKUPS = LOOKUP_SECONDS.labels("calendar")
 
-    def __init__(self, name: str):
+
+class UserData:
+    """Manages user-related data and provides methods to access and manipulate it.
+
+    Each source (profile, location, calendar, social media, playlists) is
+    loaded on first access. If the data directory holds a snapshot that is
+    newer than the CSV/JSON files, sources are read from it instead; its
+    location and calendar columns are memory-mapped rather than parsed, and
+    close() unmaps them.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        data_dir: str = "data",
+        paths: Optional[Dict[str, str]] = None,
+        use_snapshot: bool = True,
+    ):
         self.name = name
-        # Load user profile and data from various sources
-        self.profile: Dict[str, Any] = self.load_profile()
-        self.location_data: List[Dict[str, str]] = self.load_location_data()
-        self.calendar: List[Dict[str, str]] = self.load_calendar()
-        self.social_media: Dict[str, Any] = self.load_social_media()
-        self.spotify_playlists: Dict[str, Any] = self.load_spotify_playlists()
+        self.data_dir = data_dir  # Holds user_data/ and device_data/ for this user
+        # Source name (see SOURCES) -> file; paths overrides individual sources
+        self.paths: Dict[str, str] = {source: os.path.join(data_dir, path) for source, path in SOURCES.items()}
+        self.paths.update(paths or {})
+        self.use_snapshot = use_snapshot
+
+    @classmethod
+    def for_user(cls, user_id: str, root: str = "users", name: Optional[str] = None) -> "UserData":
+        """The user whose data lives in root/<user_id>/."""
+        return cls(name or user_id, os.path.join(root, user_id))
+
+    @cached_property
+    def snapshot(self) -> Optional[Snapshot]:
+        """The user's snapshot, if there is one at least as new as every source file."""
+        path = self.paths["snapshot"]
+        if not self.use_snapshot or not os.path.exists(path):
+            return None
+        written = os.path.getmtime(path)
+        for source, source_path in self.paths.items():
+            if source != "snapshot" and os.path.exists(source_path) and os.path.getmtime(source_path) > written:
+                return None  # Stale: a source changed after the snapshot was taken
+        return Snapshot(path)
+
+    @cached_property
+    def profile(self) -> Dict[str, Any]:
+        with LOAD_SECONDS.labels("profile").time():
+            return self.snapshot.json("profile") if self.snapshot else self.load_profile()
+
+    @property
+    def location_data(self) -> List[Dict[str, str]]:
+        """location.csv-style rows rebuilt from location_index (only the index is kept in memory)."""
+        return [
+            {
+                "timestamp": fix.timestamp.strftime("%Y-%m-%d %H:%M:%S"),
+                "latitude": repr(fix.latitude),
+                "longitude": repr(fix.longitude),
+                "location": fix.location,
+            }
+            for fix in self.location_index
+        ]
+
+    @cached_property
+    def location_index(self) -> LocationIndex:
+        with LOAD_SECONDS.labels("location").time():
+            if self.snapshot is not None:
+                return self.snapshot.location_index()
+            with open(self.paths["location"], "r") as f:
+                return LocationIndex.from_rows(csv.DictReader(f))  # Rows are parsed as they are read
+
+    @cached_property
+    def calendar_index(self) -> CalendarIndex:
+        with LOAD_SECONDS.labels("calendar").time():
+            if self.snapshot is not None:
+                return self.snapshot.calendar_index()
+            return CalendarIndex.from_rows(self.load_calendar())
+
+    @cached_property
+    def social_media(self) -> Dict[str, Any]:
+        with LOAD_SECONDS.labels("social_media").time():
+            return self.snapshot.json("social_media") if self.snapshot else self.load_social_media()
+
+    @cached_property
+    def spotify_playlists(self) -> Dict[str, Any]:
+        with LOAD_SECONDS.labels("spotify").time():
+            return self.snapshot.json("spotify") if self.snapshot else self.load_spotify_playlists()
+
+    def close(self) -> None:
+        """Unmaps the snapshot, if one was opened.
+
+        The sources read from it are dropped too (including changes made
+        since) and are loaded again if used.
+        """
+        snapshot = self.__dict__.pop("snapshot", None)
+        if snapshot is None:
+            return
+        for source in ("location_index", "calendar_index"):
+            self.__dict__.pop(source, None)
+        snapshot.close()
+
+    def __enter__(self) -> "UserData":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
 
     def load_profile(self) -> Dict[str, Any]:
         """Loads user profile from JSON file."""
-        with open(f"data/user_data/user_profile.json", "r") as f:
+        with open(self.paths["profile"], "r") as f:
             return json.load(f)
 
     def load_location_data(self) -> List[Dict[str, str]]:
         """Loads location data from CSV file."""
         locations = []
-        with open(f"data/device_data/location.csv", "r") as f:
+        with open(self.paths["location"], "r") as f:
             reader = csv.DictReader(f)
             for row in reader:
                 locations.append(row)  # Append each location row to the list
@@ -33,20 +147,29 @@ class UserData:
     def load_calendar(self) -> List[Dict[str, str]]:
         """Loads calendar data from CSV file."""
         events = []
-        with open(f"data/device_data/calendar.csv", "r") as f:
+        with open(self.paths["calendar"], "r") as f:
             reader = csv.DictReader(f)
             for row in reader:
                 events.append(row)  # Append each event row to the list
         return events
 
+    @property
+    def calendar(self) -> Tuple[Dict[str, str], ...]:
+        """Copies of the calendar rows in start-time order, as in calendar.csv.
+
+        Read-only: change the calendar with add_event and remove_event, which
+        keep calendar_index up to date.
+        """
+        return tuple(dict(event.raw) for event in self.calendar_index)
+
     def load_social_media(self) -> Dict[str, Any]:
         """Loads social media data from JSON file."""
-        with open(f"data/user_data/social_media.json", "r") as f:
+        with open(self.paths["social_media"], "r") as f:
             return json.load(f)
 
     def load_spotify_playlists(self) -> Dict[str, Any]:
         """Loads Spotify playlists data from JSON file."""
-        with open(f"data/user_data/spotify_playlists.json", "r") as f:
+        with open(self.paths["spotify"], "r") as f:
             return json.load(f)
 
     def get_current_location(self, current_time: datetime = None) -> str:
@@ -54,18 +177,20 @@ class UserData:
         if current_time is None:
             current_time = datetime.now()  # Use current time if not provided
 
-        current_location = "Unknown"  # Default location
-        latest_time = datetime.min  # Initialize latest time
-
-        # Iterate through location data to find the most recent location
-        for location in self.location_data:
-            loc_time = datetime.strptime(location["timestamp"], "%Y-%m-%d %H:%M:%S")
-
-            if loc_time <= current_time and loc_time > latest_time:
-                latest_time = loc_time
-                current_location = location["location"]  # Update current location
-
-        return current_location
+        # O(log n) lookup on the pre-parsed, time-sorted index
+        if not METRICS.enabled:  # Skip the timer entirely; this is the hottest call
+            return self.location_index.location_at(current_time)
+        with _LOCATION_LOOKUPS.time():
+            return self.location_index.location_at(current_time)
+
+    def add_location(self, row: Dict[str, str]) -> None:
+        """Records a new location fix (a location.csv-style row) without rebuilding the index."""
+        self.location_index.append(
+            datetime.fromisoformat(row["timestamp"]),
+            row["location"],
+            float(row.get("latitude") or "nan"),
+            float(row.get("longitude") or "nan"),
+        )
 
     def get_upcoming_events(
         self, hours: int = 2, current_time: datetime = None
@@ -79,12 +204,25 @@ class UserData:
         if current_time is None:
             current_time = datetime.now()  # Use current time if not provided
 
-        upcoming = []  # List to hold upcoming events
+        return [dict(event.raw) for event in self.get_upcoming_calendar_events(hours, current_time)]
+
+    def get_upcoming_calendar_events(
+        self, hours: float = 2, current_time: datetime = None
+    ) -> List[CalendarEvent]:
+        """Same as get_upcoming_events, but returns parsed CalendarEvent records."""
+        if current_time is None:
+            current_time = datetime.now()  # Use current time if not provided
+
+        end_time = current_time + timedelta(hours=hours)
+        if not METRICS.enabled:
+            return self.calendar_index.starting_between(current_time, end_time)
+        with _CALENDAR_LOOKUPS.time():
+            return self.calendar_index.starting_between(current_time, end_time)
+
+    def add_event(self, event: Dict[str, str]) -> CalendarEvent:
+        """Inserts a calendar row (date, time, event, duration) into the calendar index."""
+        return self.calendar_index.add(event)
 
-        for event in self.calendar:
-            event_time = datetime.strptime(
-                f"{event['date']} {event['time']}", "%Y-%m-%d %H:%M"
-            )
-            if current_time <= event_time and event_time <= current_time + timedelta(hours=hours):
-                upcoming.append(event)  # Add event to upcoming list if within range
-        return upcoming
+    def remove_event(self, start: datetime, title: str) -> Optional[CalendarEvent]:
+        """Removes the calendar event with this start and title; None if there is none."""
+        return self.calendar_index.remove(start, title)